@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class ApiConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'api'
+
+    def ready(self):
+        # Connect signal receivers (knowledge index sync, ...)
+        from . import signals  # noqa: F401
+        # Register background job handlers
+        from .services import business_validation, conversation_titles, greetings  # noqa: F401
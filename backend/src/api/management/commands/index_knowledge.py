@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from api.services.knowledge_indexer import KnowledgeIndexer
+
+
+class Command(BaseCommand):
+    help = 'Incrementally embeds new or changed knowledge documents and published articles into the pgvector index'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Re-embed every source even if its content hash is unchanged',
+        )
+
+    def handle(self, *args, **options):
+        indexer = KnowledgeIndexer()
+        model_name = indexer.store.get_embeddings().model_name
+        self.stdout.write(f'Syncing knowledge index with {model_name} embeddings...')
+        stats = indexer.sync(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Added {stats['added']}, updated {stats['updated']}, "
+            f"removed {stats['removed']}, unchanged {stats['unchanged']}."
+        ))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from api.services.conversation_stats import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Backfills and repairs the denormalized message count and last-message snapshot of conversations'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'conversation_ids',
+            nargs='*',
+            help='Only reconcile these conversations (default: all)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Conversations read and updated per query',
+        )
+
+    def handle(self, *args, **options):
+        fixed = reconcile(options['conversation_ids'] or None, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Reconciled {fixed} out-of-date conversation(s).'))
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from api.services import jobs
+
+
+class Command(BaseCommand):
+    help = 'Runs queued background jobs (business validation precomputation, ...)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run the jobs that are runnable now and exit',
+        )
+
+    def handle(self, *args, **options):
+        worker = jobs.worker_id()
+        poll = float(jobs.get_job_settings()['POLL_SECONDS'])
+        self.stdout.write(f'Job worker {worker} started')
+        while True:
+            count = jobs.run_pending(worker)
+            if count:
+                self.stdout.write(f'Ran {count} job(s)')
+            if options['once']:
+                return
+            connection.close()
+            time.sleep(poll)
@@ -1,18 +1,40 @@
 import logging
 
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
 
 class RequestResponseLoggingMiddleware:
     """Middleware that logs requests and responses, with special attention to 406 responses.
 
     Place early in the middleware stack so it sees requests before DRF content negotiation
     rejects them. Logs path, method, headers, user (if available) and a short body preview.
+    Supports both sync and async stacks, so it doesn't force async views (the ASGI
+    chat stream) onto a thread.
     """
+    sync_capable = True
+    async_capable = True
 
     def __init__(self, get_response):
         self.get_response = get_response
         self.logger = logging.getLogger(__name__)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        user = self._log_request(request)
+        response = self.get_response(request)
+        self._log_response(request, user, response)
+        return response
+
+    async def __acall__(self, request):
+        user = self._log_request(request)
+        response = await self.get_response(request)
+        self._log_response(request, user, response)
+        return response
+
+    def _log_request(self, request):
         try:
             user = getattr(request, 'user', None)
         except Exception:
@@ -33,9 +55,9 @@ class RequestResponseLoggingMiddleware:
             'headers': dict(getattr(request, 'headers', {})),
             'body_preview': body_preview,
         })
+        return user
 
-        response = self.get_response(request)
-
+    def _log_response(self, request, user, response):
         # Log 406 specifically and other client/server errors
         try:
             status_code = getattr(response, 'status_code', None)
@@ -56,5 +78,3 @@ class RequestResponseLoggingMiddleware:
                 })
         except Exception:
             self.logger.exception('Failed to log response status')
-
-        return response
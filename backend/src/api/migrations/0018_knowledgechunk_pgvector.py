@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:16
+
+import api.models.fields
+import uuid
+from django.db import migrations, models
+
+
+def create_vector_extension(apps, schema_editor):
+    # The compose stack runs pgvector/pgvector:pg16; other databases keep vectors as text.
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS vector')
+
+
+def create_hnsw_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS knowledge_chunks_embedding_hnsw '
+            'ON knowledge_chunks USING hnsw (embedding vector_cosine_ops)'
+        )
+
+
+def drop_hnsw_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS knowledge_chunks_embedding_hnsw')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_alter_userassessment_preferred_language'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_vector_extension, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='KnowledgeChunk',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('source_type', models.CharField(choices=[('knowledge_document', 'Документ бази знань'), ('article', 'Стаття')], max_length=50)),
+                ('source_id', models.UUIDField()),
+                ('title', models.CharField(max_length=500)),
+                ('source_url', models.CharField(blank=True, default='', max_length=1000)),
+                ('content', models.TextField()),
+                ('embedding', api.models.fields.VectorField(blank=True, dimensions=768, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'knowledge_chunks',
+                'indexes': [models.Index(fields=['source_type', 'source_id'], name='knowledge_chunk_source_idx')],
+            },
+        ),
+        migrations.RunPython(create_hnsw_index, drop_hnsw_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_knowledgechunk_pgvector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='knowledgechunk',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
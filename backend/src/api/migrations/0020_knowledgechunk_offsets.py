@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_knowledgechunk_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='knowledgechunk',
+            name='chunk_index',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='knowledgechunk',
+            name='end_offset',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='knowledgechunk',
+            name='start_offset',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+
+def add_search_vector(apps, schema_editor):
+    # Stored full-text vector for hybrid retrieval. 'simple' keeps Ukrainian and
+    # English words unstemmed, which is what the BM25 fallback does as well.
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            "ALTER TABLE knowledge_chunks ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            "GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(content, '')), 'B')"
+            ") STORED"
+        )
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS knowledge_chunks_search_vector_gin '
+            'ON knowledge_chunks USING gin (search_vector)'
+        )
+
+
+def drop_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS knowledge_chunks_search_vector_gin')
+        schema_editor.execute('ALTER TABLE knowledge_chunks DROP COLUMN IF EXISTS search_vector')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_knowledgechunk_offsets'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_search_vector, drop_search_vector),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:57
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_existing_messages(apps, schema_editor):
+    Conversation = apps.get_model('api', 'Conversation')
+    Message = apps.get_model('api', 'Message')
+    counts = (
+        Message.objects.filter(conversation=OuterRef('pk'))
+        .order_by()
+        .values('conversation')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    Conversation.objects.update(message_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_backgroundjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='message_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_existing_messages, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:02
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_conversation_message_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Greeting',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('conv_type', models.CharField(max_length=50)),
+                ('language', models.CharField(max_length=10)),
+                ('profile_bucket', models.CharField(max_length=50)),
+                ('content', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'greetings',
+                'indexes': [models.Index(fields=['conv_type', 'language', 'profile_bucket', 'created_at'], name='greeting_pool_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0024_greeting_pool'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['user', '-last_active_at', '-id'], name='conversation_user_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations
+
+
+def add_search_vectors(apps, schema_editor):
+    # Stored full-text vectors for conversation search (api/services/conversation_search.py).
+    # 'simple' matches the knowledge index: Ukrainian and English words unstemmed.
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            "ALTER TABLE conversations ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            "GENERATED ALWAYS AS (setweight(to_tsvector('simple', coalesce(title, '')), 'A')) STORED"
+        )
+        schema_editor.execute(
+            "ALTER TABLE messages ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            "GENERATED ALWAYS AS (setweight(to_tsvector('simple', coalesce(content, '')), 'B')) STORED"
+        )
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS conversations_search_vector_gin '
+            'ON conversations USING gin (search_vector)'
+        )
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS messages_search_vector_gin '
+            'ON messages USING gin (search_vector)'
+        )
+
+
+def drop_search_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS messages_search_vector_gin')
+        schema_editor.execute('DROP INDEX IF EXISTS conversations_search_vector_gin')
+        schema_editor.execute('ALTER TABLE messages DROP COLUMN IF EXISTS search_vector')
+        schema_editor.execute('ALTER TABLE conversations DROP COLUMN IF EXISTS search_vector')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0026_message_history_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_search_vectors, drop_search_vectors),
+    ]
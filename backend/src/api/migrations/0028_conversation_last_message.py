@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:18
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Substr
+
+
+def snapshot_last_messages(apps, schema_editor):
+    Conversation = apps.get_model('api', 'Conversation')
+    Message = apps.get_model('api', 'Message')
+    latest = Message.objects.filter(conversation=OuterRef('pk')).order_by('-created_at', '-id')
+    Conversation.objects.update(
+        last_message_preview=Coalesce(Substr(Subquery(latest.values('content')[:1]), 1, 120), Value('')),
+        last_message_at=Subquery(latest.values('created_at')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0027_conversation_message_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_preview',
+            field=models.CharField(blank=True, default='', max_length=120),
+        ),
+        migrations.RunPython(snapshot_last_messages, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:29
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def keep_latest_assessment(apps, schema_editor):
+    # Callers used the most recently updated row when a user had several
+    UserAssessment = apps.get_model('api', 'UserAssessment')
+    users = UserAssessment.objects.values('user').annotate(n=Count('id')).filter(n__gt=1).values_list('user', flat=True)
+    for user_id in users:
+        rows = UserAssessment.objects.filter(user_id=user_id).order_by('-updated_at', '-created_at')
+        UserAssessment.objects.filter(pk__in=list(rows.values_list('pk', flat=True)[1:])).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0028_conversation_last_message'),
+    ]
+
+    operations = [
+        migrations.RunPython(keep_latest_assessment, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='userassessment',
+            constraint=models.UniqueConstraint(fields=('user',), name='user_assessment_one_per_user'),
+        ),
+    ]
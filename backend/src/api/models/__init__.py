@@ -12,4 +12,6 @@ from .resume import (
 	LanguageEntry,
 )
 from .business import BusinessIdea, ActionStep
-from .knowledge import KnowledgeCategory, KnowledgeDocument
+from .knowledge import KnowledgeCategory, KnowledgeDocument, KnowledgeChunk
+from .job import BackgroundJob, BackgroundJobStatus
+from .greeting import Greeting
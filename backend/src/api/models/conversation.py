@@ -11,6 +11,10 @@ class ConversationType(models.TextChoices):
     EDUCATION = 'EDUCATION', 'Навчання'
 
 
+# Length of the last-message snapshot shown in conversation lists
+LAST_MESSAGE_PREVIEW_CHARS = 120
+
+
 class Conversation(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='conversations')
@@ -22,11 +26,20 @@ class Conversation(models.Model):
         blank=True,
         default=''
     )
+    # Maintained by the Message signals in api/signals/conversation.py
+    # (`manage.py reconcile_conversations` repairs drift)
+    message_count = models.IntegerField(default=0)
+    last_message_preview = models.CharField(max_length=LAST_MESSAGE_PREVIEW_CHARS, blank=True, default='')
+    last_message_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     last_active_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = 'conversations'
+        indexes = [
+            # Keyset pagination of a user's conversation list
+            models.Index(fields=['user', '-last_active_at', '-id'], name='conversation_user_recent_idx'),
+        ]
 
     def __str__(self):
         return self.title or str(self.id)
@@ -0,0 +1,55 @@
+from django.db import models
+
+
+class VectorField(models.Field):
+    """A pgvector `vector(n)` column.
+
+    Values are plain lists of floats on the Python side. On databases without
+    pgvector (e.g. SQLite in local test runs) the vector is stored as its text
+    literal, so the model still works, just without the SQL distance operators.
+    """
+
+    description = "Fixed-size float vector (pgvector)"
+
+    def __init__(self, *args, dimensions=None, **kwargs):
+        self.dimensions = dimensions
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.dimensions is not None:
+            kwargs['dimensions'] = self.dimensions
+        return name, path, args, kwargs
+
+    def db_type(self, connection):
+        if connection.vendor == 'postgresql':
+            if self.dimensions:
+                return f'vector({self.dimensions})'
+            return 'vector'
+        return 'text'
+
+    @staticmethod
+    def to_literal(value):
+        return '[' + ','.join(repr(float(v)) for v in value) + ']'
+
+    @staticmethod
+    def parse_literal(value):
+        value = value.strip()[1:-1]
+        if not value:
+            return []
+        return [float(v) for v in value.split(',')]
+
+    def get_prep_value(self, value):
+        if value is None or isinstance(value, str):
+            return value
+        return self.to_literal(value)
+
+    def from_db_value(self, value, expression, connection):
+        if value is None or isinstance(value, list):
+            return value
+        return self.parse_literal(value)
+
+    def to_python(self, value):
+        if isinstance(value, str):
+            return self.parse_literal(value)
+        return value
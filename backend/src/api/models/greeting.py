@@ -0,0 +1,25 @@
+from django.db import models
+import uuid
+
+
+class Greeting(models.Model):
+    """A pre-generated conversation starter waiting in the greeting pool (see api/services/greetings.py).
+
+    Greetings are generic per (conv_type, language, profile_bucket), never per
+    user, and each one is used once: taking it from the pool deletes the row.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    conv_type = models.CharField(max_length=50)
+    language = models.CharField(max_length=10)
+    profile_bucket = models.CharField(max_length=50)
+    content = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'greetings'
+        indexes = [
+            models.Index(fields=['conv_type', 'language', 'profile_bucket', 'created_at'], name='greeting_pool_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.conv_type}/{self.language}/{self.profile_bucket}"
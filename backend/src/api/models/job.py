@@ -0,0 +1,46 @@
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+import uuid
+
+
+class BackgroundJobStatus(models.TextChoices):
+    PENDING = 'pending', 'Очікує'
+    RUNNING = 'running', 'Виконується'
+    DONE = 'done', 'Завершено'
+    FAILED = 'failed', 'Помилка'
+
+
+class BackgroundJob(models.Model):
+    """A unit of work for the database-backed job queue (see api/services/jobs.py).
+
+    `output` grows while a job runs, so callers can stream partial results, and
+    holds the final result once the job is done. Jobs with the same non-empty
+    `key` are deduplicated.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=100)
+    key = models.CharField(max_length=255, blank=True, default='')
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=BackgroundJobStatus.choices, default=BackgroundJobStatus.PENDING)
+    output = models.TextField(blank=True, default='')
+    error = models.TextField(blank=True, default='')
+    attempts = models.IntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'background_jobs'
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='background_job_queue_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['key'], condition=~Q(key=''), name='background_job_unique_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} ({self.status})"
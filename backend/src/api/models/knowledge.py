@@ -2,6 +2,11 @@ from django.db import models
 from django.conf import settings
 import uuid
 
+from .fields import VectorField
+
+# Output size of Google's `models/embedding-001`; the pgvector column is fixed to it.
+EMBEDDING_DIMENSIONS = 768
+
 
 class KnowledgeCategory(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -29,3 +34,42 @@ class KnowledgeDocument(models.Model):
 
     def __str__(self):
         return self.title
+
+
+class KnowledgeSourceType(models.TextChoices):
+    DOCUMENT = 'knowledge_document', 'Документ бази знань'
+    ARTICLE = 'article', 'Стаття'
+
+
+class KnowledgeChunk(models.Model):
+    """An embedded passage of a KnowledgeDocument or published Article used for retrieval.
+
+    Embeddings live in a pgvector column with an HNSW index (see migration 0018),
+    so top-k search is a single SQL query shared by every worker. On Postgres the
+    table also has a generated, GIN-indexed `search_vector` tsvector column
+    (migration 0021) for the full-text half of hybrid retrieval; it is not
+    mapped on the model because it is only read in raw SQL.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    source_type = models.CharField(max_length=50, choices=KnowledgeSourceType.choices)
+    source_id = models.UUIDField()
+    title = models.CharField(max_length=500)
+    source_url = models.CharField(max_length=1000, blank=True, default='')
+    # Position of this chunk inside the source text (see api/services/chunking.py)
+    chunk_index = models.IntegerField(default=0)
+    start_offset = models.IntegerField(default=0)
+    end_offset = models.IntegerField(default=0)
+    content = models.TextField()
+    # sha256 of the source's title/url/content; unchanged sources are never re-embedded
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+    embedding = VectorField(dimensions=EMBEDDING_DIMENSIONS, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'knowledge_chunks'
+        indexes = [
+            models.Index(fields=['source_type', 'source_id'], name='knowledge_chunk_source_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.title} ({self.source_type})"
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 import uuid
 
 
@@ -13,6 +13,16 @@ class Message(models.Model):
 
     class Meta:
         db_table = 'messages'
+        indexes = [
+            # Recent history on every chat turn and keyset pagination of a conversation's messages
+            models.Index(fields=['conversation', 'created_at', 'id'], name='message_conversation_time_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # The post_save receivers update the conversation's counters; keep
+        # them in the same transaction as the insert
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Message {self.id} in {self.conversation_id}"
@@ -96,6 +96,9 @@ class UserAssessment(models.Model):
 
 	class Meta:
 		db_table = 'user_assessments'
+		constraints = [
+			models.UniqueConstraint(fields=['user'], name='user_assessment_one_per_user'),
+		]
 
 	def __str__(self):
 		return f"Assessment {self.id} for {self.user}"
@@ -156,8 +159,14 @@ class UserAssessment(models.Model):
 
 		This method intentionally produces a short plain-text summary highlighting
 		experience, skills, goals, and the user's work preference. Keep the output
-		compact because it will be appended to LLM prompts.
+		compact because it will be appended to LLM prompts. The text is reused
+		until the assessment is saved again.
 		"""
+		from api.services.assessments import memoized_context
+
+		return memoized_context(self, 'llm_context', self._build_llm_context)
+
+	def _build_llm_context(self) -> str:
 		parts = []
 		if self.experience_level:
 			parts.append(f"Experience level: {self.experience_level}.")
@@ -1,6 +1,6 @@
 from .auth import UserRegistrationSerializer, UserLoginSerializer, UserSerializer
 from .message import MessageSerializer
-from .conversation import ConversationSerializer
+from .conversation import ConversationSerializer, ConversationListSerializer
 from .business import BusinessIdeaSerializer, ActionStepSerializer
 from .knowledge import KnowledgeCategorySerializer, KnowledgeDocumentSerializer
 from .user_assessment import UserAssessmentSerializer
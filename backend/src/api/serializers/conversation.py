@@ -11,3 +11,25 @@ class ConversationSerializer(serializers.ModelSerializer):
         model = Conversation
         fields = ('id', 'user', 'title', 'summary_data', 'conv_type', 'created_at', 'last_active_at', 'messages')
         read_only_fields = ('id', 'created_at', 'last_active_at')
+
+
+class ConversationListSerializer(serializers.ModelSerializer):
+    """Lightweight list representation: no messages, only the denormalized last-message snapshot.
+
+    For search results, `search_headline` is the highlighted matching fragment
+    passed in the `headlines` context (None outside of a search).
+    """
+    user = serializers.PrimaryKeyRelatedField(read_only=True)
+    search_headline = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Conversation
+        fields = ('id', 'user', 'title', 'conv_type', 'created_at', 'last_active_at',
+                  'message_count', 'last_message_preview', 'last_message_at', 'search_headline')
+        read_only_fields = fields
+
+    def get_search_headline(self, obj):
+        headlines = self.context.get('headlines')
+        if headlines is None:
+            return None
+        return headlines.get(str(obj.id), '')
@@ -1,12 +1,10 @@
 import json
 import re
-import os
 import logging
-import google.generativeai as genai
-from django.conf import settings
-from django.core.exceptions import MultipleObjectsReturned
-from api.models.user_assesment import UserAssessment, ASSESSMENT_QUESTIONS, DEFAULT_LANGUAGE
+from api.models.user_assesment import ASSESSMENT_QUESTIONS, DEFAULT_LANGUAGE
 from api.models.conversation import ConversationType
+from api.services import assessments, history, llm_client, response_cache, single_flight, unit_of_work
+from api.services.async_utils import iterate_in_thread, run_in_thread
 
 class AdvisorService:
     """Service to handle AI advisor logic, including prompt engineering and response processing."""
@@ -115,36 +113,39 @@ class AdvisorService:
 """
     }
 
+    # Replies for business validation steps, keyed by BusinessIdea field
+    BUSINESS_STEP_MESSAGES = {
+        'market_analysis': "💡 **Крок 1: Аналіз Ринку**\n\n{analysis}\n\n🤔 **Що скажете?** Переходимо до фінансового аналізу?",
+        'financial_analysis': "💰 **Крок 2: Фінансовий Аналіз**\n\n{analysis}\n\n🤔 **Як вам цифри?** Переходимо до оцінки навичок?",
+        'skills_match': "🛠 **Крок 3: Відповідність Навичок**\n\n{analysis}\n\n🤔 **Чи згодні ви з оцінкою?** Переходимо до ризиків?",
+        'risk_assessment': "⚠️ **Крок 4: Оцінка Ризиків**\n\n{analysis}\n\n🤔 **Чи готові почути фінальний вердикт?**",
+        'final_verdict': "✅ **Фінальний Вердикт**\n\n{analysis}\n\n🎉 **Валідацію завершено!**",
+    }
+
     @staticmethod
     def get_ai_response(user, conversation, user_content, file_content=None):
         """
         Generates a response from the AI advisor.
         Returns the text response.
         """
-        api_key = getattr(settings, 'GOOGLE_API_KEY', None) or os.environ.get('GOOGLE_API_KEY')
+        api_key = llm_client.get_api_key()
         if not api_key:
             return f"(LLM не налаштовано) Ехо: {user_content}"
 
         try:
-            genai.configure(api_key=api_key)
-            model_name = getattr(settings, 'GOOGLE_LLM_MODEL', 'models/gemini-2.5-flash.5-flash')
-            
-            # Get or create assessment for the user
-            try:
-                assessment, _ = UserAssessment.objects.get_or_create(user=user)
-            except MultipleObjectsReturned:
-                assessments = UserAssessment.objects.filter(user=user).order_by('-updated_at')
-                assessment = assessments.first()
             
-            # Fetch conversation history
-            from api.models.message import Message
-            recent_messages = conversation.messages.order_by('-created_at')[:10]
-            recent_messages = reversed(recent_messages)
+            # Get or create assessment for the user (at most one query per request)
+            assessment = assessments.get_assessment(user)
+
+            # Serve near-identical questions from the response cache
+            cache_key = AdvisorService._response_cache_key(conversation, assessment, user_content, file_content)
+            if cache_key:
+                cached_text = response_cache.get_response_cache().get(cache_key)
+                if cached_text is not None:
+                    return cached_text
             
-            history_text = ""
-            for msg in recent_messages:
-                role = "Користувач" if msg.is_user else "Радник"
-                history_text += f"{role}: {msg.content}\n"
+            # Fetch conversation history (recent turns within the token budget + rolling summary)
+            history_text = history.build_history_text(conversation)
 
             # Build the prompt
             build_result = AdvisorService._build_prompt(
@@ -160,22 +161,29 @@ class AdvisorService:
             if isinstance(build_result, tuple):
                 full_prompt, direct_response = build_result
                 if direct_response:
+                    # Business validation steps come back as a token stream
+                    if not isinstance(direct_response, str):
+                        direct_response = ''.join(direct_response)
                     return direct_response
             else:
                 full_prompt = build_result
             
-            # Call LLM
-            model = genai.GenerativeModel(model_name)
-            response = model.generate_content(full_prompt)
+            # Call LLM (an identical prompt already in flight is awaited instead)
+            raw_ai_text = ''.join(single_flight.get_flights().stream(
+                AdvisorService._prompt_key(full_prompt),
+                lambda: AdvisorService._generate_text(full_prompt),
+            ))
 
-            if not response.parts:
+            if not raw_ai_text:
                 return "(Немає відповіді — ймовірно, заблоковано фільтрами безпеки)"
 
-            raw_ai_text = response.text
-
             # Process response - ALWAYS extract JSON updates if present
             final_text = AdvisorService._process_response(assessment, raw_ai_text)
 
+            # Replies carrying profile updates are user-specific and never cached
+            if cache_key and final_text == raw_ai_text:
+                response_cache.get_response_cache().set(cache_key, final_text)
+
             return final_text
 
         except Exception as e:
@@ -190,65 +198,167 @@ class AdvisorService:
         Generates a streaming response from the AI advisor.
         Yields chunks of text.
         """
-        api_key = getattr(settings, 'GOOGLE_API_KEY', None) or os.environ.get('GOOGLE_API_KEY')
+        api_key = llm_client.get_api_key()
         if not api_key:
             sample = user_content[:1000]
             yield f"(LLM не налаштовано) Ехо: {sample}"
             return
 
         try:
-            genai.configure(api_key=api_key)
-            model_name = getattr(settings, 'GOOGLE_LLM_MODEL', 'models/gemin-2.5-flash')
-            
-            # Get or create assessment for the user
-            try:
-                assessment, _ = UserAssessment.objects.get_or_create(user=user)
-            except MultipleObjectsReturned:
-                assessments = UserAssessment.objects.filter(user=user).order_by('-updated_at')
-                assessment = assessments.first()
-            
-            # Fetch conversation history
-            from api.models.message import Message
-            recent_messages = conversation.messages.order_by('-created_at')[:10]
-            recent_messages = reversed(recent_messages)
-            
-            history_text = ""
-            for msg in recent_messages:
-                role = "Користувач" if msg.is_user else "Радник"
-                history_text += f"{role}: {msg.content}\n"
-
-            # Build the prompt
-            build_result = AdvisorService._build_prompt(
-                user, 
-                assessment, 
-                conversation, 
-                history_text, 
-                user_content,
-                file_content
+            cache_key, ready, full_prompt = AdvisorService._prepare_stream(
+                user, conversation, user_content, file_content
             )
+            if ready is not None:
+                if isinstance(ready, str):
+                    yield ready
+                else:
+                    yield from ready
+                return
             
-            # Handle different return types
-            if isinstance(build_result, tuple):
-                full_prompt, direct_response = build_result
-                if direct_response:
-                    yield direct_response
-                    return
-            else:
-                full_prompt = build_result
-            
-            # Call LLM with streaming
-            model = genai.GenerativeModel(model_name)
-            response = model.generate_content(full_prompt, stream=True)
+            # Call LLM with streaming, attaching to an identical in-flight stream if there is one
+            response = single_flight.get_flights().stream(
+                AdvisorService._prompt_key(full_prompt),
+                lambda: AdvisorService._stream_text(full_prompt),
+            )
+
+            streamed_parts = []
+            for text in response:
+                streamed_parts.append(text)
+                yield text
 
-            for chunk in response:
-                if chunk.text:
-                    yield chunk.text
+            AdvisorService._cache_streamed_reply(cache_key, ''.join(streamed_parts))
 
         except Exception as e:
             logger = logging.getLogger(__name__)
             logger.exception('Error in AdvisorService.get_ai_response_stream')
             yield f"(Помилка LLM) {str(e)}"
 
+    @staticmethod
+    async def aget_ai_response_stream(user, conversation, user_content, file_content=None):
+        """
+        Async variant of `get_ai_response_stream` for the ASGI chat endpoint.
+
+        Prompt building (ORM, knowledge search) runs in a worker thread; the LLM
+        stream itself is awaited, so no thread is held while tokens arrive.
+        """
+        api_key = llm_client.get_api_key()
+        if not api_key:
+            sample = user_content[:1000]
+            yield f"(LLM не налаштовано) Ехо: {sample}"
+            return
+
+        try:
+            cache_key, ready, full_prompt = await run_in_thread(
+                AdvisorService._prepare_stream, user, conversation, user_content, file_content
+            )
+            if ready is not None:
+                if isinstance(ready, str):
+                    yield ready
+                else:
+                    # Business validation steps are sync generators (ORM + LangChain)
+                    async for chunk in iterate_in_thread(ready):
+                        yield chunk
+                return
+
+            response = single_flight.get_flights().astream(
+                AdvisorService._prompt_key(full_prompt),
+                lambda: AdvisorService._astream_text(full_prompt),
+            )
+
+            streamed_parts = []
+            async for text in response:
+                streamed_parts.append(text)
+                yield text
+
+            AdvisorService._cache_streamed_reply(cache_key, ''.join(streamed_parts))
+
+        except Exception as e:
+            logger = logging.getLogger(__name__)
+            logger.exception('Error in AdvisorService.aget_ai_response_stream')
+            yield f"(Помилка LLM) {str(e)}"
+
+    @staticmethod
+    def _prompt_key(full_prompt):
+        return single_flight.prompt_key(full_prompt, llm_client.resolve_model_name())
+
+    @staticmethod
+    def _generate_text(full_prompt):
+        response = llm_client.generate_content(full_prompt, operation='advisor.chat')
+        if response.parts:
+            yield response.text
+
+    @staticmethod
+    def _stream_text(full_prompt):
+        for chunk in llm_client.stream_content(full_prompt, operation='advisor.chat_stream'):
+            if chunk.text:
+                yield chunk.text
+
+    @staticmethod
+    async def _astream_text(full_prompt):
+        async for chunk in llm_client.astream_content(full_prompt, operation='advisor.chat_stream'):
+            if chunk.text:
+                yield chunk.text
+
+    @staticmethod
+    def _prepare_stream(user, conversation, user_content, file_content=None):
+        """
+        Everything the streaming paths do before the LLM call.
+
+        Returns (cache_key, ready, full_prompt). `ready` is a reply that needs no
+        LLM call (a cached reply or a business validation step, as a string or an
+        iterator of chunks); otherwise `full_prompt` is the prompt to stream.
+        """
+        # Get or create assessment for the user (at most one query per request)
+        assessment = assessments.get_assessment(user)
+
+        # Replay cached replies as a stream so the SSE contract stays the same
+        cache_key = AdvisorService._response_cache_key(conversation, assessment, user_content, file_content)
+        if cache_key:
+            cached_text = response_cache.get_response_cache().get(cache_key)
+            if cached_text is not None:
+                return cache_key, response_cache.iter_chunks(cached_text), None
+        
+        # Fetch conversation history (recent turns within the token budget + rolling summary)
+        history_text = history.build_history_text(conversation)
+
+        # Build the prompt
+        build_result = AdvisorService._build_prompt(
+            user, 
+            assessment, 
+            conversation, 
+            history_text, 
+            user_content,
+            file_content
+        )
+        
+        # Handle different return types
+        if isinstance(build_result, tuple):
+            full_prompt, direct_response = build_result
+            if direct_response:
+                return cache_key, direct_response, None
+        else:
+            full_prompt = build_result
+        return cache_key, None, full_prompt
+
+    @staticmethod
+    def _cache_streamed_reply(cache_key, streamed_text):
+        # Replies carrying profile updates are user-specific and never cached
+        if cache_key and streamed_text and '```json' not in streamed_text:
+            response_cache.get_response_cache().set(cache_key, streamed_text)
+
+    @staticmethod
+    def _response_cache_key(conversation, assessment, user_content, file_content=None):
+        """Return the response cache key for a chat prompt, or None if it must not be cached."""
+        if not response_cache.is_cacheable(conversation.conv_type, user_content, file_content):
+            return None
+        language = (assessment.preferred_language if assessment else None) or DEFAULT_LANGUAGE
+        return response_cache.build_fingerprint(
+            conversation.conv_type,
+            language,
+            AdvisorService._format_assessment_context(assessment),
+            user_content
+        )
+
     @staticmethod
     def _build_prompt(user, assessment, conversation, history_text, user_content, file_content=None):
         """Build prompt based on conversation type or assessment state."""
@@ -392,6 +502,34 @@ locality, civilian_certifications, education_level, disabilities_or_limits, supp
 """
         return prompt
 
+    @staticmethod
+    def _save_business_step(idea, field, analysis, user_context):
+        """Store a revealed validation step and queue the one after it."""
+        from api.services import business_validation
+        
+        setattr(idea, field, analysis)
+        if field == 'final_verdict':
+            idea.status = 'VALIDATED'
+            idea.save()
+            business_validation.forget_steps(idea)
+        else:
+            idea.save()
+            business_validation.schedule_next_steps(idea, user_context)
+
+    @staticmethod
+    def _stream_business_step(idea, chain, field, user_context):
+        """Stream a validation step as it is generated, then store it and queue the next one."""
+        from api.services import business_validation
+        
+        header, footer = AdvisorService.BUSINESS_STEP_MESSAGES[field].split('{analysis}')
+        yield header
+        parts = []
+        for chunk in business_validation.stream_step(idea, chain, field, user_context):
+            parts.append(chunk)
+            yield chunk
+        AdvisorService._save_business_step(idea, field, ''.join(parts), user_context)
+        yield footer
+
     @staticmethod
     def _build_business_prompt(user, system_prompt, assessment, history_text, user_content):
         """Build enhanced prompt for business validation with multi-step chain support."""
@@ -400,6 +538,7 @@ locality, civilian_certifications, education_level, disabilities_or_limits, supp
         
         try:
             from api.models.business import BusinessIdea
+            from api.services import business_validation
             from api.services.langchain_service import BusinessValidationChain
             
             # 1. Find active business idea
@@ -424,66 +563,26 @@ locality, civilian_certifications, education_level, disabilities_or_limits, supp
                     status='IN_PROGRESS',
                     business_canvas={'raw_idea': user_content}
                 )
-                # Run Step 1: Market
-                analysis = chain.validate_market(user_content)
-                active_idea.market_analysis = analysis
-                active_idea.save()
-                
-                response = f"💡 **Крок 1: Аналіз Ринку**\n\n{analysis}\n\n🤔 **Що скажете?** Переходимо до фінансового аналізу?"
-                return None, response
+                # Queue the independent skills match so it runs alongside market analysis
+                business_validation.schedule_next_steps(active_idea, user_context)
+                # Run Step 1: Market, streamed; Step 2 is queued once it is saved
+                return None, AdvisorService._stream_business_step(
+                    active_idea, chain, 'market_analysis', user_context
+                )
 
             # CASE B: Continue validation
             if active_idea:
                 # Check for "next step" intent
                 next_keywords = ['так', 'далі', 'продовжуй', 'фінанс', 'наступн', 'ok', 'добре', 'yes', 'next', 'ага', 'плюс', '+']
                 wants_next = any(k in user_content_lower for k in next_keywords)
-                
-                raw_idea = active_idea.business_canvas.get('raw_idea', active_idea.title)
-
-                # Step 2: Financials
-                if not active_idea.financial_analysis:
-                    if wants_next:
-                        analysis = chain.validate_financials(raw_idea, active_idea.market_analysis)
-                        active_idea.financial_analysis = analysis
-                        active_idea.save()
-                        return None, f"💰 **Крок 2: Фінансовий Аналіз**\n\n{analysis}\n\n🤔 **Як вам цифри?** Переходимо до оцінки навичок?"
-                    # Else: fall through to discuss market analysis
-
-                # Step 3: Skills
-                elif not active_idea.skills_match:
-                    if wants_next:
-                        analysis = chain.validate_skills(raw_idea, user_context)
-                        active_idea.skills_match = analysis
-                        active_idea.save()
-                        return None, f"🛠 **Крок 3: Відповідність Навичок**\n\n{analysis}\n\n🤔 **Чи згодні ви з оцінкою?** Переходимо до ризиків?"
-
-                # Step 4: Risks
-                elif not active_idea.risk_assessment:
-                    if wants_next:
-                        analysis = chain.validate_risks(
-                            raw_idea,
-                            active_idea.market_analysis,
-                            active_idea.financial_analysis,
-                            active_idea.skills_match
-                        )
-                        active_idea.risk_assessment = analysis
-                        active_idea.save()
-                        return None, f"⚠️ **Крок 4: Оцінка Ризиків**\n\n{analysis}\n\n🤔 **Чи готові почути фінальний вердикт?**"
-
-                # Step 5: Verdict
-                elif not active_idea.final_verdict:
-                    if wants_next:
-                        analysis = chain.validate_verdict(
-                            raw_idea,
-                            active_idea.market_analysis,
-                            active_idea.financial_analysis,
-                            active_idea.skills_match,
-                            active_idea.risk_assessment
-                        )
-                        active_idea.final_verdict = analysis
-                        active_idea.status = 'VALIDATED'
-                        active_idea.save()
-                        return None, f"✅ **Фінальний Вердикт**\n\n{analysis}\n\n🎉 **Валідацію завершено!**"
+                step = business_validation.next_step(active_idea)
+
+                # Steps 2-5: reveal the next one (usually already precomputed in the background)
+                if wants_next and step is not None:
+                    return None, AdvisorService._stream_business_step(
+                        active_idea, chain, step.field, user_context
+                    )
+                # Else: fall through to discuss the current step
 
             # Inject context if we are in a validation flow but not advancing
             context_injection = ""
@@ -575,39 +674,16 @@ locality, civilian_certifications, education_level, disabilities_or_limits, supp
 
     @staticmethod
     def _build_education_prompt(system_prompt, assessment, history_text, user_content):
-        """Build prompt for education/learning mode with RAG (vector or keyword)."""
+        """Build prompt for education/learning mode with hybrid (vector + full-text) RAG."""
         
-        # Try vector RAG first (OPTIONAL - falls back to keyword if unavailable)
-        relevant_docs = None
-        knowledge_context = "" # Initialize knowledge_context
+        # Hybrid (vector + full-text) retrieval from the shared knowledge store
+        knowledge_context = ""
         try:
-            from api.services.langchain_service import VectorRAG
-            
-            vector_rag = VectorRAG()
-            vector_rag.initialize_vectorstore()
-            results = vector_rag.search(user_content, k=3)
-            
-            if results:
-                # Format vector search results
-                knowledge_context = vector_rag.format_rag_context(results)
-            else:
-                # No results from vector search, try keyword
-                relevant_docs = AdvisorService._search_knowledge_base(user_content)
-        except Exception as e:
-            logger = logging.getLogger(__name__)
-            logger.exception('Vector RAG initialization/search failed; falling back to keyword search')
-            # Vector RAG not available, use keyword search
-            relevant_docs = AdvisorService._search_knowledge_base(user_content)
-        
-        # If using keyword search (fallback)
-        if relevant_docs:
-            knowledge_context = "\n\nРЕЛЕВАНТНІ МАТЕРІАЛИ З БАЗИ ЗНАНЬ:\n"
-            for doc in relevant_docs:
-                knowledge_context += f"\n[{doc['type'].upper()}] {doc['title']}\n"
-                knowledge_context += f"Зміст: {doc['summary']}\n"
-                if doc['url']:
-                    knowledge_context += f"URL: {doc['url']}\n"
-        elif not knowledge_context: # Only if vector RAG also didn't find anything
+            from api.services.retrieval import format_rag_context
+            knowledge_context = format_rag_context(AdvisorService._search_knowledge_base(user_content))
+        except Exception:
+            logging.getLogger(__name__).exception('Knowledge retrieval failed')
+        if not knowledge_context:
             knowledge_context = "\n\nМатеріали з бази знань не знайдено по цьому запиту.\n"
         
         user_context = AdvisorService._format_assessment_context(assessment)
@@ -641,7 +717,13 @@ locality, civilian_certifications, education_level, disabilities_or_limits, supp
 
     @staticmethod
     def _format_assessment_context(assessment):
-        """Format assessment data for LLM context."""
+        """Format assessment data for LLM context (reused until the assessment is saved again)."""
+        return assessments.memoized_context(
+            assessment, 'advisor_context', lambda: AdvisorService._build_assessment_context(assessment)
+        )
+
+    @staticmethod
+    def _build_assessment_context(assessment):
         if not assessment or not assessment.answers:
             return "\n\nПРОФІЛЬ КОРИСТУВАЧА: Дані ще не заповнені.\n"
         
@@ -683,50 +765,10 @@ locality, civilian_certifications, education_level, disabilities_or_limits, supp
     def _search_knowledge_base(query, max_results=3):
         """Search for relevant documents and articles in the knowledge base."""
         try:
-            from api.models.knowledge import KnowledgeDocument
-            from api.models.article import Article
-            from django.db.models import Q
-            
-            # Simple keyword search
-            search_terms = query.lower().split()[:3]
-            
-            results = []
-            
-            # Search in KnowledgeDocuments
-            q_objects = Q()
-            for term in search_terms:
-                q_objects |= Q(title__icontains=term) | Q(raw_text_content__icontains=term)
-            
-            docs = KnowledgeDocument.objects.filter(q_objects).distinct()[:max_results]
-            
-            for doc in docs:
-                content_snippet = doc.raw_text_content[:300] + "..." if len(doc.raw_text_content) > 300 else doc.raw_text_content
-                results.append({
-                    'title': doc.title,
-                    'summary': content_snippet,
-                    'url': doc.source_url or '',
-                    'type': 'document'
-                })
-            
-            # Also search in published Articles
-            if len(results) < max_results:
-                remaining = max_results - len(results)
-                q_articles = Q(is_published=True)
-                for term in search_terms:
-                    q_articles &= Q(title__icontains=term) | Q(content__icontains=term)
-                
-                articles = Article.objects.filter(q_articles).distinct()[:remaining]
-                
-                for article in articles:
-                    content_snippet = article.content[:300] + "..." if len(article.content) > 300 else article.content
-                    results.append({
-                        'title': article.title,
-                        'summary': content_snippet,
-                        'url': f'/articles/{article.slug}',
-                        'type': 'article'
-                    })
+            from api.services.retrieval import get_knowledge_store
             
-            return results
+            # One ranked lookup (vector + full-text fused) instead of icontains scans
+            return get_knowledge_store().search(query, k=max_results)
         except Exception as e:
             logger = logging.getLogger(__name__)
             logger.exception('Error searching knowledge base')
@@ -755,7 +797,7 @@ locality, civilian_certifications, education_level, disabilities_or_limits, supp
                 if not assessment.answers:
                     assessment.answers = {}
                 assessment.answers.update(updates)
-                assessment.save()
+                unit_of_work.save(assessment)
 
             return clean_text
         except Exception as e:
@@ -764,25 +806,31 @@ locality, civilian_certifications, education_level, disabilities_or_limits, supp
             # Even if saving fails, return the clean text without the JSON block
             return clean_text
 
+    @staticmethod
+    def update_history_summary(conversation):
+        """
+        Fold turns that no longer fit the history budget into the rolling summary.
+        Called after each assistant reply is saved.
+        """
+        try:
+            history.update_rolling_summary(conversation)
+        except Exception:
+            logger = logging.getLogger(__name__)
+            logger.exception('Error updating conversation history summary')
+
     @staticmethod
     def generate_initial_message(user, conversation):
         """
         Generate an initial assistant message for a newly created conversation.
         """
-        api_key = getattr(settings, 'GOOGLE_API_KEY', None) or os.environ.get('GOOGLE_API_KEY')
+        api_key = llm_client.get_api_key()
         if not api_key:
             return "Вітаю! Я ваш кар'єрний радник. Радий(а), що ви тут. Чим можу допомогти?"
 
         try:
-            genai.configure(api_key=api_key)
-            model_name = getattr(settings, 'GOOGLE_LLM_MODEL', 'models/gemin-2.5-flash')
 
-            # Get or create assessment
-            try:
-                assessment, _ = UserAssessment.objects.get_or_create(user=user)
-            except MultipleObjectsReturned:
-                assessments = UserAssessment.objects.filter(user=user).order_by('-updated_at')
-                assessment = assessments.first()
+            # Get or create assessment for the user (at most one query per request)
+            assessment = assessments.get_assessment(user)
 
             # Get the appropriate system prompt based on conversation type
             conv_type = conversation.conv_type
@@ -800,8 +848,7 @@ locality, civilian_certifications, education_level, disabilities_or_limits, supp
 Коротко представтесь і поставте лаконічне вступне питання відповідно до вашої ролі та профілю користувача.
 """
 
-            model = genai.GenerativeModel(model_name)
-            response = model.generate_content(prompt)
+            response = llm_client.generate_content(prompt, operation='advisor.initial_message')
 
             if not response.parts:
                 return "(Немає відповіді від LLM)"
@@ -812,41 +859,88 @@ locality, civilian_certifications, education_level, disabilities_or_limits, supp
             logger.exception('Error generating initial message from LLM; returning fallback greeting')
             return "Вітаю! Я ваш кар'єрний радник. Радий(а), що ви тут. Чим можу допомогти?"
 
+    @staticmethod
+    def generate_greetings(conv_type, language, profile_description, count):
+        """
+        Generate `count` different starter messages for the greeting pool with one LLM request.
+
+        The greetings are not tied to a user, only to the conversation type, the
+        language and a generic profile description. Returns a list of strings
+        (possibly shorter than `count`, empty on errors).
+        """
+        api_key = llm_client.get_api_key()
+        if not api_key or count <= 0:
+            return []
+
+        try:
+            system_prompt = AdvisorService.SYSTEM_PROMPTS.get(conv_type, AdvisorService.SYSTEM_PROMPTS['assessment'])
+            lang_instruction = AdvisorService.LANGUAGE_INSTRUCTIONS.get(
+                language, AdvisorService.LANGUAGE_INSTRUCTIONS[DEFAULT_LANGUAGE]
+            )
+            prompt = f"""{system_prompt}
+
+ПРОФІЛЬ КОРИСТУВАЧА: {profile_description}
+
+Напишіть {count} різних варіантів першого повідомлення в новій розмові: коротко представтесь і поставте лаконічне вступне питання відповідно до вашої ролі.
+Не звертайтесь до користувача на ім'я і не вигадуйте деталей його профілю.
+{lang_instruction}
+
+Поверніть ЛИШЕ JSON-масив рядків, наприклад: ["Привітання 1", "Привітання 2"]"""
+
+            response = llm_client.generate_content(prompt, operation='advisor.greetings')
+            if not (response.parts and response.text):
+                return []
+
+            match = re.search(r'\[.*\]', response.text, re.DOTALL)
+            greetings = json.loads(match.group(0)) if match else []
+            return [text.strip() for text in greetings if isinstance(text, str) and text.strip()][:count]
+        except Exception:
+            logger = logging.getLogger(__name__)
+            logger.exception('Error generating greetings for the greeting pool')
+            return []
+
+    @staticmethod
+    def _title_excerpt(conversation):
+        """The first 6 messages (3 user + 3 AI) and the type label used by the title prompts."""
+        conversation_text = ""
+        for msg in conversation.messages.order_by('created_at')[:6]:
+            role = "Користувач" if msg.is_user else "Радник"
+            # Truncate long messages
+            content = msg.content[:200] if len(msg.content) > 200 else msg.content
+            conversation_text += f"{role}: {content}\n"
+        
+        # Get conversation type label
+        conv_type_label = ""
+        if conversation.conv_type:
+            conv_type_label = dict(ConversationType.choices).get(conversation.conv_type, "")
+        return conv_type_label or 'Загальна консультація', conversation_text
+
+    @staticmethod
+    def _clean_title(text):
+        # Remove quotes if present
+        title = text.strip().strip('"').strip("'").strip()
+        # Limit length
+        if len(title) > 60:
+            title = title[:57] + "..."
+        return title
+
     @staticmethod
     def generate_conversation_title(conversation):
         """
         Generate a short, descriptive title for the conversation based on the first 3 exchanges.
-        Called after the 3rd user message.
+        Runs as a background job (api/services/conversation_titles.py).
         """
-        api_key = getattr(settings, 'GOOGLE_API_KEY', None) or os.environ.get('GOOGLE_API_KEY')
+        api_key = llm_client.get_api_key()
         if not api_key:
             return  # Skip if no LLM configured
         
         try:
-            genai.configure(api_key=api_key)
-            model_name = getattr(settings, 'GOOGLE_LLM_MODEL', 'models/gemin-2.5-flash')
-            
-            # Get the first 6 messages (3 user + 3 AI)
-            from api.models.message import Message
-            messages = conversation.messages.order_by('created_at')[:6]
-            
-            # Build conversation summary
-            conversation_text = ""
-            for msg in messages:
-                role = "Користувач" if msg.is_user else "Радник"
-                # Truncate long messages
-                content = msg.content[:200] if len(msg.content) > 200 else msg.content
-                conversation_text += f"{role}: {content}\n"
-            
-            # Get conversation type label
-            conv_type_label = ""
-            if conversation.conv_type:
-                conv_type_label = dict(ConversationType.choices).get(conversation.conv_type, "")
+            conv_type_label, conversation_text = AdvisorService._title_excerpt(conversation)
             
             prompt = f"""На основі цієї розмови створіть ДУЖЕ КОРОТКУ назву (максимум 2-3 слова).
 Назва має відображати ОСНОВНУ ТЕМУ розмови.
 
-Тип розмови: {conv_type_label or 'Загальна консультація'}
+Тип розмови: {conv_type_label}
 
 Розмова:
 {conversation_text}
@@ -859,48 +953,81 @@ locality, civilian_certifications, education_level, disabilities_or_limits, supp
 
 Назва:"""
 
-            model = genai.GenerativeModel(model_name)
-            response = model.generate_content(prompt)
+            response = llm_client.generate_content(prompt, operation='advisor.conversation_title')
             
             if response.parts and response.text:
-                # Clean up the response
-                title = response.text.strip()
-                # Remove quotes if present
-                title = title.strip('"').strip("'").strip()
-                # Limit length
-                if len(title) > 60:
-                    title = title[:57] + "..."
-                
                 # Update conversation
-                conversation.title = title
+                conversation.title = AdvisorService._clean_title(response.text)
                 conversation.save(update_fields=['title'])
                 
         except Exception as e:
             logger = logging.getLogger(__name__)
             logger.exception('Error generating conversation title')
 
+    @staticmethod
+    def generate_conversation_titles(conversations):
+        """
+        Generate titles for several conversations with a single LLM request.
+
+        Conversations missing from the reply keep their current title.
+        """
+        api_key = llm_client.get_api_key()
+        if not api_key or not conversations:
+            return
+        
+        try:
+            blocks = []
+            for number, conversation in enumerate(conversations, 1):
+                conv_type_label, conversation_text = AdvisorService._title_excerpt(conversation)
+                blocks.append(f"### Розмова {number} (тип: {conv_type_label})\n{conversation_text}")
+            
+            prompt = f"""Для кожної з розмов нижче створіть ДУЖЕ КОРОТКУ назву, що відображає ОСНОВНУ ТЕМУ розмови.
+
+{chr(10).join(blocks)}
+ВИМОГИ:
+- Максимум 4-5 слів
+- Українською мовою
+- БЕЗ лапок, БЕЗ префіксів типу "Назва:", просто текст
+- Описує СУТЬ розмови (наприклад: "Пошук роботи Python developer", "Валідація ідеї ресторану", "Навчання веб-розробці")
+
+Поверніть ЛИШЕ JSON-об'єкт з назвами за номерами розмов, наприклад: {{"1": "Назва", "2": "Назва"}}"""
+
+            response = llm_client.generate_content(prompt, operation='advisor.conversation_titles')
+            if not (response.parts and response.text):
+                return
+            
+            match = re.search(r'\{.*\}', response.text, re.DOTALL)
+            titles = json.loads(match.group(0)) if match else {}
+            for number, conversation in enumerate(conversations, 1):
+                title = titles.get(str(number))
+                if isinstance(title, str) and title.strip():
+                    conversation.title = AdvisorService._clean_title(title)
+                    conversation.save(update_fields=['title'])
+                
+        except Exception as e:
+            logger = logging.getLogger(__name__)
+            logger.exception('Error generating conversation titles')
+
     @staticmethod
     def generate_resume_content(user, resume, field, context=None):
         """
         Generates content for a specific resume field using AI.
         """
-        api_key = getattr(settings, 'GOOGLE_API_KEY', None) or os.environ.get('GOOGLE_API_KEY')
+        api_key = llm_client.get_api_key()
         if not api_key:
             return "AI configuration missing."
 
         try:
-            genai.configure(api_key=api_key)
-            model_name = getattr(settings, 'GOOGLE_LLM_MODEL', 'models/gemin-2.5-flash')
             
             # Get user assessment
-            try:
-                assessment = UserAssessment.objects.get(user=user)
+            assessment = assessments.get_assessment(user, create=False)
+            if assessment:
                 assessment_text = f"""
                 Skills: {assessment.primary_skills}
                 Experience: {assessment.experience_years} years
                 Preferences: {assessment.work_preferences}
                 """
-            except UserAssessment.DoesNotExist:
+            else:
                 assessment_text = "No assessment data available."
 
             # Build prompt based on field
@@ -927,8 +1054,7 @@ locality, civilian_certifications, education_level, disabilities_or_limits, supp
             
             prompt += "\nReturn ONLY the content for the field, no explanations or markdown formatting unless requested."
 
-            model = genai.GenerativeModel(model_name)
-            response = model.generate_content(prompt)
+            response = llm_client.generate_content(prompt, operation='advisor.resume_content')
             
             return response.text.strip()
 
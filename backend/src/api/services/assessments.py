@@ -0,0 +1,150 @@
+"""
+Cached access to a user's `UserAssessment`.
+
+Every LLM entry point needs the user's assessment, and used to load it itself
+(`get_or_create`, with a `MultipleObjectsReturned` fallback, `.latest()` or
+`.get()` depending on the caller). Users now have at most one assessment
+(unique constraint, migration 0029) and `get_assessment()` loads it at most
+once per request:
+
+* the instance is memoized on the user object (`request.user` lives for one
+  request), so later lookups in the same request are free;
+* below that, the shared Django cache keeps it for ASSESSMENT_CACHE
+  ['TTL_SECONDS'] so consecutive chat turns skip the query. This only pays off
+  with a cache that is cheaper than the query (Redis); the default of 0 turns
+  it off otherwise.
+
+Saving or deleting an assessment drops both (api/signals/assessment.py).
+
+`memoized_context()` keeps formatted prompt context (`to_llm_context()`,
+the advisor's profile block) per assessment version, so a turn reuses the text
+of the previous one until the assessment is saved again.
+"""
+from __future__ import annotations
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from api.models.user_assesment import UserAssessment
+
+# Attribute on the user object holding the request-scoped assessment
+_USER_ATTR = '_cached_assessment'
+
+
+def get_assessment_cache_settings() -> Dict[str, Any]:
+    options = {
+        'TTL_SECONDS': 0,
+        'CONTEXT_MAX_ENTRIES': 1024,
+    }
+    options.update(getattr(settings, 'ASSESSMENT_CACHE', {}) or {})
+    return options
+
+
+def cache_key(user_id) -> str:
+    return f'assessment:user:{user_id}'
+
+
+def get_assessment(user, create: bool = True) -> Optional[UserAssessment]:
+    """
+    The user's assessment, created with defaults when missing if `create`.
+
+    Returns None for a user without an assessment when `create` is False.
+    """
+    assessment = getattr(user, _USER_ATTR, None)
+    if assessment is not None:
+        return assessment
+
+    ttl = int(get_assessment_cache_settings()['TTL_SECONDS'])
+    assessment = cache.get(cache_key(user.pk)) if ttl > 0 else None
+    if assessment is None:
+        if create:
+            assessment, _ = UserAssessment.objects.get_or_create(user_id=user.pk)
+        else:
+            assessment = UserAssessment.objects.filter(user_id=user.pk).first()
+            if assessment is None:
+                return None
+        # Cached before the user is attached, so the user is not pickled with it
+        if ttl > 0:
+            cache.set(cache_key(user.pk), assessment, ttl)
+
+    assessment.user = user
+    setattr(user, _USER_ATTR, assessment)
+    return assessment
+
+
+def invalidate(assessment: UserAssessment):
+    """Forget the cached copies of `assessment` after it was saved or deleted."""
+    if int(get_assessment_cache_settings()['TTL_SECONDS']) > 0:
+        cache.delete(cache_key(assessment.user_id))
+    if UserAssessment.user.is_cached(assessment):
+        user = assessment.user
+        if getattr(user, _USER_ATTR, None) is not assessment:
+            user.__dict__.pop(_USER_ATTR, None)
+    get_context_memo().forget(assessment.pk)
+
+
+class ContextMemo:
+    """Thread-safe LRU of formatted context per (assessment, kind), tagged with the assessment version."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[tuple, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple, version) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: tuple, version, text: str):
+        with self._lock:
+            self._entries[key] = (version, text)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def forget(self, assessment_id):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == assessment_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_memo: Optional[ContextMemo] = None
+_memo_lock = threading.Lock()
+
+
+def get_context_memo() -> ContextMemo:
+    """Return the per-worker context memo, creating it on first use."""
+    global _memo
+    if _memo is None:
+        with _memo_lock:
+            if _memo is None:
+                _memo = ContextMemo(int(get_assessment_cache_settings()['CONTEXT_MAX_ENTRIES']))
+    return _memo
+
+
+def memoized_context(assessment: Optional[UserAssessment], kind: str, build: Callable[[], str]) -> str:
+    """
+    `build()`, reused while `assessment` keeps the same `updated_at`.
+
+    Unsaved assessments are formatted every time.
+    """
+    if assessment is None or assessment.pk is None or assessment.updated_at is None:
+        return build()
+    memo = get_context_memo()
+    key = (assessment.pk, kind)
+    text = memo.get(key, assessment.updated_at)
+    if text is None:
+        text = build()
+        memo.set(key, assessment.updated_at, text)
+    return text
@@ -0,0 +1,72 @@
+"""
+Helpers for calling the synchronous service layer from async views.
+
+Prompt building and business validation touch the ORM and block on LangChain,
+so the ASGI chat endpoint runs them in the default thread pool. Unlike
+`sync_to_async(thread_sensitive=True)`, which funnels every call through one
+shared thread, each call here gets its own pool thread, so one slow request
+does not queue the others behind it. Database connections opened in that
+thread are released when the call finishes.
+"""
+from __future__ import annotations
+import asyncio
+from typing import Any, AsyncIterator, Callable, Iterator
+
+from django.db import close_old_connections
+
+_DONE = object()
+
+
+def _release_connections(func: Callable, *args) -> Any:
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
+
+
+async def run_in_thread(func: Callable, *args) -> Any:
+    """Run a blocking call in the thread pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, _release_connections, func, *args)
+
+
+async def iterate_in_thread(iterator: Iterator[Any]) -> AsyncIterator[Any]:
+    """
+    Drain a blocking iterator in one pool thread, yielding its items as they arrive.
+
+    Exceptions raised by the iterator are re-raised in the consumer. If the
+    consumer stops early, the producer stops at its next item.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stopped = False
+
+    def produce():
+        try:
+            for item in iterator:
+                if stopped:
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, (item, None))
+        except BaseException as exc:  # handed to the consumer
+            loop.call_soon_threadsafe(queue.put_nowait, (_DONE, exc))
+            return
+        finally:
+            close = getattr(iterator, 'close', None)
+            if stopped and close is not None:
+                close()
+        loop.call_soon_threadsafe(queue.put_nowait, (_DONE, None))
+
+    producer = loop.run_in_executor(None, _release_connections, produce)
+    try:
+        while True:
+            item, exc = await queue.get()
+            if item is _DONE:
+                if exc is not None:
+                    raise exc
+                break
+            yield item
+    finally:
+        stopped = True
+        if not producer.done():
+            # Don't block the event loop on the producer finishing its current item
+            producer.add_done_callback(lambda future: future.exception())
@@ -0,0 +1,302 @@
+"""
+Dependency-aware execution of the business-validation steps.
+
+The five `BusinessValidationChain` steps form a small DAG: market analysis and
+skills match only need the idea (and the user profile), financials need the
+market analysis, risks need the first three and the verdict needs everything.
+`ValidationDAG` starts every step as soon as its inputs are ready, so
+independent steps run concurrently on a shared thread pool.
+
+The interactive BUSINESS flow reveals one step per turn. `schedule_next_steps()`
+queues the next step (and any independent step) as background jobs
+(`api.services.jobs`) as soon as the current one is saved, so the following
+"далі" turn reads a stored result instead of waiting for a fresh LLM call.
+`stream_step` streams a step token by token, whether it is still running in
+the background or generated for the current request.
+"""
+from __future__ import annotations
+import threading
+import time
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+
+from api.services import jobs
+
+logger = logging.getLogger(__name__)
+
+
+class ValidationStep(NamedTuple):
+    field: str                 # BusinessIdea field and chain output key
+    method: str                # BusinessValidationChain method
+    deps: Tuple[str, ...]      # fields this step needs as inputs
+    uses_user_context: bool = False
+
+
+# In the order steps are revealed to the user
+VALIDATION_STEPS = (
+    ValidationStep('market_analysis', 'validate_market', ()),
+    ValidationStep('financial_analysis', 'validate_financials', ('market_analysis',)),
+    ValidationStep('skills_match', 'validate_skills', (), uses_user_context=True),
+    ValidationStep('risk_assessment', 'validate_risks', ('market_analysis', 'financial_analysis', 'skills_match')),
+    ValidationStep('final_verdict', 'validate_verdict',
+                   ('market_analysis', 'financial_analysis', 'skills_match', 'risk_assessment')),
+)
+STEPS_BY_FIELD = {step.field: step for step in VALIDATION_STEPS}
+
+
+def get_validation_settings() -> Dict[str, Any]:
+    options = {
+        'MAX_WORKERS': 4,
+        'SPECULATE': True,
+        'STEP_TIMEOUT': 120,
+    }
+    options.update(getattr(settings, 'BUSINESS_VALIDATION', {}) or {})
+    return options
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Return the process-wide pool that runs validation steps."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=int(get_validation_settings()['MAX_WORKERS']),
+                    thread_name_prefix='business-validation',
+                )
+    return _executor
+
+
+def _required_steps(targets: Iterable[str], known: Dict[str, Any]) -> List[str]:
+    """Targets plus their unknown transitive dependencies, in VALIDATION_STEPS order."""
+    needed = set()
+    stack = [t for t in targets if t not in known]
+    while stack:
+        field = stack.pop()
+        if field in needed:
+            continue
+        needed.add(field)
+        stack.extend(dep for dep in STEPS_BY_FIELD[field].deps if dep not in known)
+    return [step.field for step in VALIDATION_STEPS if step.field in needed]
+
+
+def _as_future(value) -> Future:
+    if isinstance(value, Future):
+        return value
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+class ValidationDAG:
+    """Run validation steps on a thread pool as soon as their inputs are ready."""
+
+    def __init__(self, chain, executor: Optional[ThreadPoolExecutor] = None):
+        self.chain = chain
+        self.executor = executor or get_executor()
+
+    def submit(self, business_idea: str, user_context: str,
+               known: Optional[Dict[str, Any]] = None,
+               targets: Optional[Iterable[str]] = None) -> Dict[str, Future]:
+        """
+        Start the steps needed for `targets` (default: all) and return a future per step.
+
+        `known` maps fields to finished results or to futures of steps already
+        running elsewhere; those are reused rather than recomputed.
+        """
+        known = {field: value for field, value in (known or {}).items() if value}
+        targets = list(targets or STEPS_BY_FIELD)
+        pending = _required_steps(targets, known)
+
+        futures: Dict[str, Future] = {field: _as_future(value) for field, value in known.items()}
+        for field in pending:
+            futures[field] = Future()
+
+        for field in pending:
+            step = STEPS_BY_FIELD[field]
+            deps = [futures[dep] for dep in step.deps]
+            self._when_done(deps, lambda step=step, deps=deps: self._start(step, deps, futures, business_idea, user_context))
+        return {field: futures[field] for field in set(targets) | set(pending)}
+
+    @staticmethod
+    def _when_done(deps: List[Future], callback):
+        if not deps:
+            callback()
+            return
+        remaining = [len(deps)]
+        lock = threading.Lock()
+
+        def on_done(_):
+            with lock:
+                remaining[0] -= 1
+                ready = remaining[0] == 0
+            if ready:
+                callback()
+
+        for dep in deps:
+            dep.add_done_callback(on_done)
+
+    def _start(self, step: ValidationStep, deps: List[Future], futures: Dict[str, Future],
+               business_idea: str, user_context: str):
+        target = futures[step.field]
+        failed = next((dep.exception() for dep in deps if dep.exception() is not None), None)
+        if failed is not None:
+            target.set_exception(failed)
+            return
+
+        args = [business_idea]
+        if step.uses_user_context:
+            args.append(user_context)
+        args.extend(dep.result() for dep in deps)
+
+        def run():
+            started = time.monotonic()
+            result = getattr(self.chain, step.method)(*args)
+            logger.info(
+                'Validation step %s finished', step.field,
+                extra={'step': step.field, 'duration_ms': round((time.monotonic() - started) * 1000)},
+            )
+            return result
+
+        self.executor.submit(run).add_done_callback(lambda done: _copy_outcome(done, target))
+
+    def run(self, business_idea: str, user_context: str,
+            known: Optional[Dict[str, Any]] = None,
+            targets: Optional[Iterable[str]] = None) -> Dict[str, str]:
+        """Blocking variant of `submit`; returns the results of every step it touched."""
+        futures = self.submit(business_idea, user_context, known=known, targets=targets)
+        return {field: future.result() for field, future in futures.items()}
+
+
+def _copy_outcome(source: Future, target: Future):
+    if source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
+
+
+def next_step(idea) -> Optional[ValidationStep]:
+    """The first step (in reveal order) not yet stored on the idea."""
+    return next((step for step in VALIDATION_STEPS if not getattr(idea, step.field)), None)
+
+
+STEP_JOB = 'business.validation_step'
+
+
+def _stored_results(idea) -> Dict[str, str]:
+    return {step.field: getattr(idea, step.field) for step in VALIDATION_STEPS if getattr(idea, step.field)}
+
+
+def _raw_idea(idea) -> str:
+    return (idea.business_canvas or {}).get('raw_idea', idea.title)
+
+
+def step_job_key(idea_id, field: str) -> str:
+    return f'business-step:{idea_id}:{field}'
+
+
+def step_inputs(idea, field: str, user_context: str) -> Dict[str, str]:
+    """Prompt variables of one step, taken from the idea's stored results."""
+    step = STEPS_BY_FIELD[field]
+    inputs = {'business_idea': _raw_idea(idea)}
+    if step.uses_user_context:
+        inputs['user_context'] = user_context
+    for dep in step.deps:
+        inputs[dep] = getattr(idea, dep)
+    return inputs
+
+
+@jobs.register(STEP_JOB)
+def _run_step_job(job, report) -> str:
+    """Compute one step from the idea's stored results (its inputs are revealed before it is queued)."""
+    from api.models.business import BusinessIdea
+    from api.services.langchain_service import BusinessValidationChain
+
+    idea = BusinessIdea.objects.get(id=job.payload['idea_id'])
+    field = job.payload['field']
+    stored = getattr(idea, field)
+    if stored:
+        return stored
+    # Report tokens as they arrive so a reader can stream the step while it runs
+    parts = []
+    for chunk in BusinessValidationChain().stream_step(
+        field, **step_inputs(idea, field, job.payload.get('user_context', ''))
+    ):
+        parts.append(chunk)
+        report(chunk)
+    return ''.join(parts)
+
+
+def schedule_next_steps(idea, user_context: str) -> list:
+    """
+    Queue background jobs for the idea's next unrevealed step.
+
+    Steps without dependencies that are still missing (skills match) are queued
+    too, so they overlap with the rest of the flow. Already-queued steps are
+    not duplicated. Returns the queued jobs.
+    """
+    if not get_validation_settings()['SPECULATE']:
+        return []
+    stored = _stored_results(idea)
+    unrevealed = [step for step in VALIDATION_STEPS if step.field not in stored]
+    targets = unrevealed[:1] + [step for step in unrevealed[1:] if not step.deps]
+    return [
+        jobs.enqueue(
+            STEP_JOB,
+            {'idea_id': str(idea.id), 'field': step.field, 'user_context': user_context},
+            key=step_job_key(idea.id, step.field),
+        )
+        for step in targets
+        if all(dep in stored for dep in step.deps)
+    ]
+
+
+def find_step_job(idea, field: str):
+    """The queued/running/finished job for one step, or None."""
+    return jobs.find(step_job_key(idea.id, field))
+
+
+def stream_step(idea, chain, field: str, user_context: str) -> Iterator[str]:
+    """
+    Stream the text of one step as soon as it is available.
+
+    A finished background job is returned at once and a running one is
+    followed as it grows. Otherwise (no job, or one still waiting in the
+    queue, which is withdrawn) the step is generated here token by token.
+    """
+    from api.models.job import BackgroundJobStatus
+
+    job = find_step_job(idea, field)
+    if job is not None and job.status == BackgroundJobStatus.DONE:
+        yield job.output
+        return
+
+    sent = False
+    if job is not None and not jobs.cancel(job) and job.status != BackgroundJobStatus.FAILED:
+        try:
+            for chunk in jobs.stream_output(job, timeout=float(get_validation_settings()['STEP_TIMEOUT'])):
+                sent = True
+                yield chunk
+            return
+        except Exception:
+            logger.exception('Background validation step %s failed; generating inline', field)
+
+    if sent:
+        yield "\n\n"
+    yield from chain.stream_step(field, **step_inputs(idea, field, user_context))
+
+
+def forget_steps(idea):
+    """Drop the step jobs of an idea (e.g. once its validation is complete)."""
+    from api.models.job import BackgroundJob, BackgroundJobStatus
+
+    BackgroundJob.objects.filter(key__startswith=step_job_key(idea.id, '')).exclude(
+        status=BackgroundJobStatus.RUNNING
+    ).delete()
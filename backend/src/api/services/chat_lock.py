@@ -0,0 +1,148 @@
+"""
+Per-conversation chat lock shared by every worker.
+
+Only one reply per conversation is generated at a time. The lock is a lease in
+the shared Django cache (CACHES['default']: Redis when REDIS_URL is set,
+otherwise a table in the main database), so it holds across processes and
+hosts:
+
+* `acquire()` is a single `cache.add()`, which only succeeds if the key is
+  absent; there is no check-then-set window;
+* the holder renews the lease (`renew_if_due()`, called for every streamed
+  event) every CHAT_LOCK['RENEW_SECONDS'], so long streams keep it;
+* a worker that dies mid-stream stops renewing, and the lease expires after
+  CHAT_LOCK['TTL_SECONDS'].
+
+Each lease carries a random token, so a holder whose lease expired and was
+taken over never renews or releases the new owner's lock. Contention and lost
+leases are counted per process (`get_lock_stats()`) and logged.
+"""
+from __future__ import annotations
+import threading
+import time
+import uuid
+import logging
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from api.services.async_utils import run_in_thread
+
+logger = logging.getLogger(__name__)
+
+
+def get_lock_settings() -> Dict[str, Any]:
+    options = {
+        'TTL_SECONDS': 60,
+        'RENEW_SECONDS': 20,
+    }
+    options.update(getattr(settings, 'CHAT_LOCK', {}) or {})
+    return options
+
+
+class LockStats:
+    """Thread-safe per-process counters for chat lock usage."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.acquired = 0
+            self.contended = 0
+            self.renewed = 0
+            self.lost = 0
+            self.released = 0
+            self.held_seconds = 0.0
+            self.max_held_seconds = 0.0
+
+    def record(self, name: str, held_seconds: Optional[float] = None):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+            if held_seconds is not None:
+                self.held_seconds += held_seconds
+                self.max_held_seconds = max(self.max_held_seconds, held_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            attempts = self.acquired + self.contended
+            return {
+                'acquired': self.acquired,
+                'contended': self.contended,
+                'renewed': self.renewed,
+                'lost': self.lost,
+                'released': self.released,
+                'contention_rate': (self.contended / attempts) if attempts else 0.0,
+                'avg_held_seconds': (self.held_seconds / self.released) if self.released else 0.0,
+                'max_held_seconds': self.max_held_seconds,
+            }
+
+
+_stats = LockStats()
+
+
+def get_lock_stats() -> LockStats:
+    return _stats
+
+
+class ChatLock:
+    """A renewable lease on one conversation."""
+
+    def __init__(self, conversation_id):
+        options = get_lock_settings()
+        self.conversation_id = str(conversation_id)
+        self.key = f'chat_lock_{conversation_id}'
+        self.token = uuid.uuid4().hex
+        self.ttl = int(options['TTL_SECONDS'])
+        self.renew_seconds = float(options['RENEW_SECONDS'])
+        self.acquired_at: Optional[float] = None
+        self.renewed_at = 0.0
+
+    def acquire(self) -> bool:
+        """Take the lease; returns False if another request holds it."""
+        if cache.add(self.key, self.token, timeout=self.ttl):
+            self.acquired_at = self.renewed_at = time.monotonic()
+            _stats.record('acquired')
+            return True
+        _stats.record('contended')
+        logger.info('Chat lock contended', extra={'conversation_id': self.conversation_id})
+        return False
+
+    def renew(self) -> bool:
+        """Extend the lease; returns False if it expired and is no longer ours."""
+        self.renewed_at = time.monotonic()
+        if cache.get(self.key) != self.token or not cache.touch(self.key, timeout=self.ttl):
+            _stats.record('lost')
+            logger.warning('Chat lock lease lost', extra={'conversation_id': self.conversation_id})
+            return False
+        _stats.record('renewed')
+        return True
+
+    def renew_if_due(self) -> bool:
+        if self.acquired_at is None or time.monotonic() - self.renewed_at < self.renew_seconds:
+            return True
+        return self.renew()
+
+    def release(self):
+        """Drop the lease if it is still ours."""
+        if self.acquired_at is None:
+            return
+        if cache.get(self.key) == self.token:
+            cache.delete(self.key)
+        _stats.record('released', held_seconds=time.monotonic() - self.acquired_at)
+        self.acquired_at = None
+
+    # Async variants for the ASGI chat endpoint
+
+    async def aacquire(self) -> bool:
+        return await run_in_thread(self.acquire)
+
+    async def arenew_if_due(self) -> bool:
+        if self.acquired_at is None or time.monotonic() - self.renewed_at < self.renew_seconds:
+            return True
+        return await run_in_thread(self.renew)
+
+    async def arelease(self):
+        await run_in_thread(self.release)
@@ -0,0 +1,74 @@
+"""
+Split long knowledge texts into overlapping chunks before embedding.
+
+Chunks prefer to end on a paragraph, sentence or word boundary and carry their
+character offsets into the source text, so retrieval can return the exact
+passage that matched.
+"""
+from __future__ import annotations
+from typing import List, NamedTuple
+
+from django.conf import settings
+
+# Boundaries tried in order when looking for a place to cut a chunk
+_SEPARATORS = ('\n\n', '\n', '. ', '! ', '? ', '; ', ', ', ' ')
+
+
+class TextChunk(NamedTuple):
+    index: int
+    start: int
+    end: int
+    text: str
+
+
+def get_chunk_settings():
+    options = getattr(settings, 'KNOWLEDGE_INDEX', {}) or {}
+    size = int(options.get('CHUNK_SIZE', 1000))
+    overlap = int(options.get('CHUNK_OVERLAP', 150))
+    return size, min(overlap, size // 2)
+
+
+def _find_cut(text: str, start: int, hard_end: int) -> int:
+    # Don't accept a boundary in the first half of the window, or chunks get tiny
+    floor = start + (hard_end - start) // 2
+    for separator in _SEPARATORS:
+        pos = text.rfind(separator, floor, hard_end)
+        if pos != -1:
+            return pos + len(separator)
+    return hard_end
+
+
+def split_text(text: str, chunk_size: int = None, chunk_overlap: int = None) -> List[TextChunk]:
+    """Split `text` into chunks of at most `chunk_size` characters with `chunk_overlap` overlap."""
+    default_size, default_overlap = get_chunk_settings()
+    chunk_size = chunk_size or default_size
+    chunk_overlap = default_overlap if chunk_overlap is None else chunk_overlap
+    if not text:
+        return []
+
+    chunks = []
+    start = 0
+    length = len(text)
+    while start < length:
+        hard_end = min(start + chunk_size, length)
+        end = hard_end if hard_end == length else _find_cut(text, start, hard_end)
+
+        # Trim surrounding whitespace but keep offsets pointing into the source text
+        chunk_start, chunk_end = start, end
+        while chunk_start < chunk_end and text[chunk_start].isspace():
+            chunk_start += 1
+        while chunk_end > chunk_start and text[chunk_end - 1].isspace():
+            chunk_end -= 1
+        if chunk_end > chunk_start:
+            chunks.append(TextChunk(len(chunks), chunk_start, chunk_end, text[chunk_start:chunk_end]))
+
+        if end >= length:
+            break
+        next_start = end - chunk_overlap
+        if next_start > start and chunk_overlap:
+            # Start the overlap on a word boundary
+            space = text.find(' ', next_start, end)
+            if space != -1:
+                next_start = space + 1
+        start = max(next_start, start + 1)
+    return chunks
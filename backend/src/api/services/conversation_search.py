@@ -0,0 +1,93 @@
+"""
+Full-text search over a user's conversations and their messages.
+
+On Postgres, `conversations` and `messages` have generated, GIN-indexed
+`search_vector` tsvector columns (migration 0027; not mapped on the models,
+like `knowledge_chunks.search_vector`). A conversation matches when its title
+or any of its messages matches the query. Matching messages are tested with a
+correlated EXISTS rather than a JOIN, so every conversation appears once. The
+rank is the better of the title rank and the best message rank (`ts_rank_cd`;
+titles are weighted A, messages B). Query words are matched as prefixes, so
+search-as-you-type keeps working.
+
+`headlines()` runs `ts_headline` on the best-matching message of each result.
+Only the conversations on the current page are highlighted, since ts_headline
+re-parses the text.
+
+Other databases (the SQLite test settings) fall back to case-insensitive
+substring matching with a constant rank.
+"""
+from __future__ import annotations
+from typing import Dict, Iterable
+
+from django.db import connection
+from django.db.models import BooleanField, Exists, FloatField, OuterRef, Q, Value
+from django.db.models.expressions import RawSQL
+
+from api.services.text_search import build_prefix_tsquery
+
+HEADLINE_OPTIONS = 'StartSel=<mark>, StopSel=</mark>, MaxWords=25, MinWords=10, MaxFragments=1'
+
+_TSQUERY = "to_tsquery('simple', %s)"
+
+_MATCHES = f"""(
+    conversations.search_vector @@ {_TSQUERY}
+    OR EXISTS (
+        SELECT 1 FROM messages m
+        WHERE m.conversation_id = conversations.id AND m.search_vector @@ {_TSQUERY}
+    )
+)"""
+
+_RANK = f"""GREATEST(
+    ts_rank_cd(conversations.search_vector, {_TSQUERY}),
+    COALESCE((
+        SELECT MAX(ts_rank_cd(m.search_vector, {_TSQUERY})) FROM messages m
+        WHERE m.conversation_id = conversations.id AND m.search_vector @@ {_TSQUERY}
+    ), 0)
+)"""
+
+
+def is_full_text() -> bool:
+    return connection.vendor == 'postgresql'
+
+
+def search(queryset, query: str):
+    """Conversations of `queryset` matching `query`, annotated with `search_rank` (higher is better)."""
+    tsquery = build_prefix_tsquery(query)
+    if not tsquery:
+        return queryset.none()
+
+    if is_full_text():
+        return queryset.alias(
+            search_match=RawSQL(_MATCHES, (tsquery, tsquery), output_field=BooleanField()),
+        ).filter(search_match=True).annotate(
+            search_rank=RawSQL(_RANK, (tsquery,) * 3, output_field=FloatField()),
+        )
+
+    from api.models.message import Message
+
+    in_messages = Message.objects.filter(conversation=OuterRef('pk'), content__icontains=query)
+    return queryset.filter(Q(title__icontains=query) | Exists(in_messages)).annotate(
+        search_rank=Value(1.0, output_field=FloatField()),
+    )
+
+
+def headlines(conversation_ids: Iterable, query: str) -> Dict[str, str]:
+    """Highlighted fragment of the best-matching message per conversation id (Postgres only)."""
+    ids = [str(conversation_id) for conversation_id in conversation_ids]
+    tsquery = build_prefix_tsquery(query)
+    if not ids or not tsquery or not is_full_text():
+        return {}
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT DISTINCT ON (m.conversation_id)
+                   m.conversation_id, ts_headline('simple', m.content, q, %s)
+            FROM messages m, {_TSQUERY} q
+            WHERE m.conversation_id = ANY(%s::uuid[]) AND m.search_vector @@ q
+            ORDER BY m.conversation_id, ts_rank_cd(m.search_vector, q) DESC
+            """,
+            [HEADLINE_OPTIONS, tsquery, ids],
+        )
+        return {str(conversation_id): headline for conversation_id, headline in cursor.fetchall()}
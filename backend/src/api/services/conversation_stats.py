@@ -0,0 +1,67 @@
+"""
+Denormalized message statistics on `Conversation`.
+
+`message_count`, `last_message_preview` and `last_message_at` let the
+conversation list render without touching the messages table. The Message
+signals (api/signals/conversation.py) keep them current with single UPDATEs
+(F() for the count, so concurrent inserts don't lose increments) inside the
+transaction that writes the message. `reconcile()` (`manage.py
+reconcile_conversations`) recomputes them from the messages table to backfill
+or repair drift, e.g. after raw SQL or bulk operations that skip signals.
+"""
+from __future__ import annotations
+from typing import Dict, Iterable, List, Optional
+
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Substr
+
+from api.models.conversation import Conversation, LAST_MESSAGE_PREVIEW_CHARS
+from api.models.message import Message
+
+
+def preview(content: str) -> str:
+    return (content or '')[:LAST_MESSAGE_PREVIEW_CHARS]
+
+
+def snapshot_expressions(count: bool = True) -> Dict:
+    """Subquery expressions recomputing the denormalized fields of each updated conversation."""
+    latest = Message.objects.filter(conversation=OuterRef('pk')).order_by('-created_at', '-id')
+    fields = {
+        'last_message_preview': Coalesce(
+            Substr(Subquery(latest.values('content')[:1]), 1, LAST_MESSAGE_PREVIEW_CHARS), Value('')
+        ),
+        'last_message_at': Subquery(latest.values('created_at')[:1]),
+    }
+    if count:
+        totals = (
+            Message.objects.filter(conversation=OuterRef('pk'))
+            .order_by().values('conversation').annotate(total=Count('id')).values('total')
+        )
+        fields['message_count'] = Coalesce(Subquery(totals, output_field=IntegerField()), 0)
+    return fields
+
+
+def reconcile(conversation_ids: Optional[Iterable] = None, batch_size: int = 500) -> int:
+    """
+    Recompute the denormalized fields from the messages table.
+
+    Only conversations whose stored values differ are updated. Returns how many
+    were out of date.
+    """
+    queryset = Conversation.objects.all()
+    if conversation_ids is not None:
+        queryset = queryset.filter(pk__in=list(conversation_ids))
+    expected = {f'expected_{name}': expression for name, expression in snapshot_expressions().items()}
+    rows = queryset.order_by().annotate(**expected).values_list(
+        'id', 'message_count', 'last_message_preview', 'last_message_at',
+        'expected_message_count', 'expected_last_message_preview', 'expected_last_message_at',
+    )
+
+    stale: List = []
+    for conv_id, count, text, at, expected_count, expected_text, expected_at in rows.iterator(chunk_size=batch_size):
+        if (count, text, at) != (expected_count, expected_text, expected_at):
+            stale.append(conv_id)
+
+    for start in range(0, len(stale), batch_size):
+        Conversation.objects.filter(pk__in=stale[start:start + batch_size]).update(**snapshot_expressions())
+    return len(stale)
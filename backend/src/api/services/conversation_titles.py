@@ -0,0 +1,69 @@
+"""
+Background generation of conversation titles.
+
+A new conversation keeps its default title ("<type> - новий чат") until it has
+CONVERSATION_TITLES['AFTER_MESSAGES'] messages. The chat view then queues one
+title job per conversation (deduplicated by key), reading the denormalized
+`Conversation.message_count` instead of counting messages. The job is delayed
+by DELAY_SECONDS, and title jobs are a batch kind, so conversations that
+became due around the same time are titled with a single LLM request.
+"""
+from __future__ import annotations
+import logging
+from typing import Any, Dict
+
+from django.conf import settings
+
+from api.services import jobs
+
+logger = logging.getLogger(__name__)
+
+TITLE_JOB = 'conversation.title'
+
+
+def get_title_settings() -> Dict[str, Any]:
+    options = {
+        'AFTER_MESSAGES': 4,
+        'DELAY_SECONDS': 5,
+    }
+    options.update(getattr(settings, 'CONVERSATION_TITLES', {}) or {})
+    return options
+
+
+def is_default_title(title: str) -> bool:
+    return not title or title == 'Нова розмова' or title.endswith(' - новий чат')
+
+
+def title_job_key(conversation_id) -> str:
+    return f'conversation-title:{conversation_id}'
+
+
+def schedule_title(conv):
+    """Queue title generation once the conversation is long enough and still has a default title."""
+    conv.refresh_from_db(fields=['message_count', 'title'])
+    options = get_title_settings()
+    if conv.message_count < int(options['AFTER_MESSAGES']) or not is_default_title(conv.title):
+        return None
+    return jobs.enqueue(
+        TITLE_JOB, {'conversation_id': str(conv.id)},
+        key=title_job_key(conv.id), delay=float(options['DELAY_SECONDS']),
+    )
+
+
+@jobs.register(TITLE_JOB, batch=True)
+def _run_title_jobs(batch, report) -> Dict[Any, str]:
+    """Title every conversation of the batch that still has a default title."""
+    from api.models.conversation import Conversation
+    from api.services.advisor import AdvisorService
+
+    found = Conversation.objects.in_bulk([job.payload['conversation_id'] for job in batch])
+    # In queue order, so the numbering in the batched prompt is deterministic
+    conversations = {str(conv_id): conv for conv_id, conv in found.items()}
+    ordered = [conversations[job.payload['conversation_id']] for job in batch if job.payload['conversation_id'] in conversations]
+    due = [conv for conv in ordered if is_default_title(conv.title)]
+    if len(due) == 1:
+        AdvisorService.generate_conversation_title(due[0])
+    elif due:
+        AdvisorService.generate_conversation_titles(due)
+
+    return {job.id: getattr(conversations.get(job.payload['conversation_id']), 'title', '') for job in batch}
@@ -0,0 +1,180 @@
+"""
+Embedding computation for the knowledge base.
+
+`EmbeddingService` wraps an embeddings client: document texts are sent in
+batches of KNOWLEDGE_INDEX['EMBEDDING_BATCH_SIZE'], and query embeddings are
+kept in an LRU keyed by the normalized query text, so repeated questions cost
+no API call. Without an API key a deterministic `HashingEmbeddings` stand-in is
+used, which lets indexing run (and be benchmarked) offline.
+
+Document-level vectors are stored in `KnowledgeDocument.embedding` as compact
+blobs, see `to_blob` / `from_blob`.
+"""
+from __future__ import annotations
+import hashlib
+import re
+import struct
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from django.conf import settings
+
+from api.services import llm_client
+from api.services.response_cache import normalize_message
+
+logger = logging.getLogger(__name__)
+
+try:
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    EMBEDDINGS_AVAILABLE = True
+except ImportError:
+    EMBEDDINGS_AVAILABLE = False
+
+EMBEDDING_MODEL = 'models/embedding-001'
+LOCAL_EMBEDDING_MODEL = 'local-hashing'
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Blob layout: one format byte, then either raw float32 values ('f') or a
+# float32 scale followed by int8 values ('q').
+_FLOAT32 = b'f'
+_INT8 = b'q'
+
+
+def get_embedding_settings() -> Dict[str, Any]:
+    options = {
+        'EMBEDDING_BATCH_SIZE': 100,
+        'QUERY_CACHE_SIZE': 512,
+        'EMBEDDING_STORAGE': 'float32',
+    }
+    options.update(getattr(settings, 'KNOWLEDGE_INDEX', {}) or {})
+    return options
+
+
+def to_blob(vector: Sequence[float], storage: Optional[str] = None) -> bytes:
+    """Pack a vector as float32 (4 bytes/dim) or int8 with a scale (1 byte/dim)."""
+    storage = storage or get_embedding_settings()['EMBEDDING_STORAGE']
+    values = np.asarray(vector, dtype=np.float32)
+    if storage == 'int8':
+        scale = float(np.abs(values).max()) / 127 if values.size else 0.0
+        quantized = np.zeros(values.shape, dtype=np.int8) if not scale else \
+            np.clip(np.rint(values / scale), -127, 127).astype(np.int8)
+        return _INT8 + struct.pack('<f', scale) + quantized.tobytes()
+    return _FLOAT32 + values.astype('<f4').tobytes()
+
+
+def from_blob(blob: Optional[bytes]) -> Optional[np.ndarray]:
+    """Unpack a blob written by `to_blob` into a float32 array."""
+    if not blob:
+        return None
+    blob = bytes(blob)
+    kind, body = blob[:1], blob[1:]
+    if kind == _INT8:
+        (scale,) = struct.unpack('<f', body[:4])
+        return np.frombuffer(body[4:], dtype=np.int8).astype(np.float32) * scale
+    if kind == _FLOAT32:
+        return np.frombuffer(body, dtype='<f4').astype(np.float32)
+    raise ValueError('Unknown embedding blob format')
+
+
+class HashingEmbeddings:
+    """
+    Deterministic offline embeddings: feature-hashed word counts, L2-normalized.
+
+    Texts sharing words end up close, which is enough for tests and for running
+    the knowledge base without an API key.
+    """
+
+    model_name = LOCAL_EMBEDDING_MODEL
+
+    def __init__(self, dimensions: Optional[int] = None):
+        if dimensions is None:
+            # Match the pgvector column so local vectors fit the same table
+            from api.models.knowledge import EMBEDDING_DIMENSIONS
+            dimensions = EMBEDDING_DIMENSIONS
+        self.dimensions = dimensions
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for token in _TOKEN_RE.findall((text or '').lower()):
+            digest = hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], 'little') % self.dimensions
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = float(np.linalg.norm(vector))
+        if norm:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class EmbeddingService:
+    """Batched document embeddings and LRU-cached query embeddings over one client."""
+
+    def __init__(self, client, model_name: Optional[str] = None,
+                 batch_size: Optional[int] = None, cache_size: Optional[int] = None):
+        options = get_embedding_settings()
+        self.client = client
+        self.model_name = model_name or getattr(client, 'model_name', None) or type(client).__name__
+        self.batch_size = max(1, int(batch_size or options['EMBEDDING_BATCH_SIZE']))
+        self.cache_size = int(cache_size if cache_size is not None else options['QUERY_CACHE_SIZE'])
+        self._queries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed `texts` in batches; the result keeps the input order."""
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), self.batch_size):
+            vectors.extend(self.client.embed_documents(texts[start:start + self.batch_size]))
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        key = normalize_message(text)
+        with self._lock:
+            vector = self._queries.get(key)
+            if vector is not None:
+                self._queries.move_to_end(key)
+                self.hits += 1
+                return vector
+            self.misses += 1
+
+        vector = self.client.embed_query(text)
+        if self.cache_size > 0:
+            with self._lock:
+                self._queries[key] = vector
+                self._queries.move_to_end(key)
+                while len(self._queries) > self.cache_size:
+                    self._queries.popitem(last=False)
+        return vector
+
+    def clear(self):
+        with self._lock:
+            self._queries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'model': self.model_name,
+                'size': len(self._queries),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+def create_embedding_service() -> EmbeddingService:
+    """Use Google embeddings when configured, otherwise the local stand-in."""
+    api_key = llm_client.get_api_key()
+    if EMBEDDINGS_AVAILABLE and api_key:
+        client = GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL, google_api_key=api_key)
+        return EmbeddingService(client, model_name=EMBEDDING_MODEL)
+    logger.info('No embeddings API key configured; using local hashing embeddings')
+    return EmbeddingService(HashingEmbeddings())
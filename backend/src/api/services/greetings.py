@@ -0,0 +1,126 @@
+"""
+Pool of pre-generated greetings for new conversations.
+
+Creating a conversation used to wait for a full LLM round trip to write the
+assistant's first message. Instead, `Greeting` rows are generated ahead of time
+for each (conversation type, preferred language, profile bucket) and
+`take_greeting()` pops one in a single query. Every take queues a refill job
+(deduplicated per pool key) that tops the pool back up to GREETINGS['POOL_SIZE']
+with one LLM request, so only the first conversation of a pool gets the static
+fallback greeting.
+
+Profile buckets are coarse on purpose ("профіль не заповнено", "є досвід
+керівництва", ...): pooled greetings are shared between users, so they must
+not contain anything personal.
+"""
+from __future__ import annotations
+import logging
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.db import transaction
+
+from api.services import jobs
+
+logger = logging.getLogger(__name__)
+
+REFILL_JOB = 'greetings.refill'
+
+FALLBACK_GREETING = "Вітаю! Я ваш кар'єрний радник. Радий(а), що ви тут. Чим можу допомогти?"
+
+PROFILE_BUCKETS = {
+    'new': 'Користувач ще не заповнив профіль.',
+    'veteran': 'Ветеран, профіль заповнений.',
+    'leader': 'Ветеран з досвідом керівництва людьми, профіль заповнений.',
+}
+
+
+def get_greeting_settings() -> Dict[str, Any]:
+    options = {
+        'ENABLED': True,
+        'POOL_SIZE': 5,
+    }
+    options.update(getattr(settings, 'GREETINGS', {}) or {})
+    return options
+
+
+def profile_bucket(assessment) -> str:
+    """The PROFILE_BUCKETS key describing an assessment (None means an empty profile)."""
+    if not assessment or not assessment.answers:
+        return 'new'
+    if assessment.leadership_experience:
+        return 'leader'
+    return 'veteran'
+
+
+def pool_key(conv_type: str, language: str, bucket: str) -> str:
+    return f'greetings:{conv_type}:{language}:{bucket}'
+
+
+def _pool(conv_type: str, language: str, bucket: str):
+    from api.models.greeting import Greeting
+
+    return Greeting.objects.filter(conv_type=conv_type, language=language, profile_bucket=bucket)
+
+
+def take_greeting(conv_type: str, language: str, bucket: str) -> Optional[str]:
+    """Remove the oldest pooled greeting for the key and return its text, or None if the pool is empty."""
+    with transaction.atomic():
+        greeting = _pool(conv_type, language, bucket).select_for_update(skip_locked=True).order_by('created_at').first()
+        if greeting is None:
+            return None
+        greeting.delete()
+    return greeting.content
+
+
+def schedule_refill(conv_type: str, language: str, bucket: str):
+    """Queue a job topping the pool up to POOL_SIZE, unless one is already waiting or running."""
+    from api.models.job import BackgroundJobStatus
+
+    key = pool_key(conv_type, language, bucket)
+    previous = jobs.find(key)
+    if previous is not None and previous.status in (BackgroundJobStatus.DONE, BackgroundJobStatus.FAILED):
+        # Refills recur, so a finished job must not block the next one
+        previous.delete()
+    return jobs.enqueue(REFILL_JOB, {'conv_type': conv_type, 'language': language, 'bucket': bucket}, key=key)
+
+
+def greeting_for(user, conversation) -> str:
+    """
+    The first assistant message for a new conversation, without calling the LLM.
+
+    Falls back to the static greeting while the matching pool is empty (or
+    when no LLM is configured) and queues a refill either way.
+    """
+    from api.models.user_assesment import DEFAULT_LANGUAGE
+    from api.services import assessments, llm_client
+
+    if not get_greeting_settings()['ENABLED'] or not llm_client.get_api_key():
+        return FALLBACK_GREETING
+
+    assessment = assessments.get_assessment(user, create=False)
+    language = (assessment.preferred_language if assessment else None) or DEFAULT_LANGUAGE
+    bucket = profile_bucket(assessment)
+    text = take_greeting(conversation.conv_type, language, bucket)
+    schedule_refill(conversation.conv_type, language, bucket)
+    if text is None:
+        logger.info('Greeting pool empty', extra={'pool': pool_key(conversation.conv_type, language, bucket)})
+        return FALLBACK_GREETING
+    return text
+
+
+@jobs.register(REFILL_JOB)
+def _run_refill_job(job, report) -> str:
+    """Generate the greetings missing from one pool."""
+    from api.models.greeting import Greeting
+    from api.services.advisor import AdvisorService
+
+    conv_type, language, bucket = job.payload['conv_type'], job.payload['language'], job.payload['bucket']
+    missing = int(get_greeting_settings()['POOL_SIZE']) - _pool(conv_type, language, bucket).count()
+    if missing <= 0:
+        return ''
+    texts = AdvisorService.generate_greetings(conv_type, language, PROFILE_BUCKETS.get(bucket, ''), missing)
+    Greeting.objects.bulk_create(
+        Greeting(conv_type=conv_type, language=language, profile_bucket=bucket, content=text) for text in texts
+    )
+    return f'{len(texts)} greeting(s)'
@@ -0,0 +1,182 @@
+"""
+Token-budgeted conversation history for advisor prompts.
+
+The most recent turns are included verbatim until the history token budget is
+spent. Turns that fall out of that window are folded into a rolling summary
+stored in `Conversation.summary_data['history']`, so the history part of the
+prompt stays bounded however long the conversation gets.
+"""
+from __future__ import annotations
+import math
+import logging
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_KEY = 'history'
+
+# Upper bound on rows pulled per build; the token budget is normally hit much earlier.
+MAX_WINDOW_MESSAGES = 50
+
+
+def get_history_settings() -> Dict[str, Any]:
+    options = {
+        'TOKEN_BUDGET': 1500,
+        'SUMMARY_TOKEN_BUDGET': 400,
+        'MAX_MESSAGE_TOKENS': 500,
+        'SUMMARY_LINE_CHARS': 200,
+        'SUMMARY_MODE': 'extractive',
+    }
+    options.update(getattr(settings, 'ADVISOR_HISTORY', {}) or {})
+    return options
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) that needs no tokenizer."""
+    if not text:
+        return 0
+    return math.ceil(len(text) / 4)
+
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rstrip() + " …[скорочено]"
+
+
+def _role(msg) -> str:
+    return "Користувач" if msg.is_user else "Радник"
+
+
+def _format_line(msg, max_message_tokens: int) -> str:
+    return f"{_role(msg)}: {_truncate_to_tokens(msg.content, max_message_tokens)}\n"
+
+
+def _split_window(messages_desc: List[Any], token_budget: int, max_message_tokens: int):
+    """
+    Split messages (newest first) into the verbatim window and the overflow.
+
+    Returns `(window_lines, overflow)` where `window_lines` are in chronological
+    order and `overflow` holds the older messages that did not fit, newest first.
+    """
+    lines = []
+    used = 0
+    for index, msg in enumerate(messages_desc):
+        line = _format_line(msg, max_message_tokens)
+        cost = estimate_tokens(line)
+        if lines and used + cost > token_budget:
+            return list(reversed(lines)), messages_desc[index:]
+        lines.append(line)
+        used += cost
+    return list(reversed(lines)), []
+
+
+def _unsummarized_messages(conversation, state: Dict[str, Any]):
+    # conversation_id is read by the related manager for every row; deferring it costs a query per message
+    queryset = conversation.messages.only('id', 'conversation_id', 'content', 'is_user', 'created_at')
+    summarized_until = state.get('summarized_until')
+    if summarized_until:
+        queryset = queryset.filter(created_at__gt=summarized_until)
+    return list(queryset.order_by('-created_at')[:MAX_WINDOW_MESSAGES])
+
+
+def build_history_text(conversation) -> str:
+    """Return the history block for the prompt, bounded by the token budget."""
+    options = get_history_settings()
+    state = (conversation.summary_data or {}).get(SUMMARY_KEY) or {}
+    messages_desc = _unsummarized_messages(conversation, state)
+    window_lines, _ = _split_window(
+        messages_desc, int(options['TOKEN_BUDGET']), int(options['MAX_MESSAGE_TOKENS'])
+    )
+
+    history_text = "".join(window_lines)
+    summary = state.get('summary')
+    if summary:
+        history_text = f"ПІДСУМОК ПОПЕРЕДНЬОЇ РОЗМОВИ:\n{summary}\n\nОСТАННІ ПОВІДОМЛЕННЯ:\n{history_text}"
+    return history_text
+
+
+def _extractive_summary(previous: str, overflow_asc: List[Any], options: Dict[str, Any]) -> str:
+    line_chars = int(options['SUMMARY_LINE_CHARS'])
+    lines = [line for line in (previous or '').splitlines() if line.strip()]
+    for msg in overflow_asc:
+        content = " ".join(msg.content.split())
+        if len(content) > line_chars:
+            content = content[:line_chars].rstrip() + "…"
+        lines.append(f"- {_role(msg)}: {content}")
+
+    # Keep the newest lines that fit the summary budget
+    budget = int(options['SUMMARY_TOKEN_BUDGET'])
+    kept = []
+    used = 0
+    for line in reversed(lines):
+        cost = estimate_tokens(line) + 1
+        if kept and used + cost > budget:
+            break
+        kept.append(line)
+        used += cost
+    return "\n".join(reversed(kept))
+
+
+def _llm_summary(previous: str, overflow_asc: List[Any], options: Dict[str, Any]) -> Optional[str]:
+    from api.services import llm_client
+
+    if not llm_client.get_api_key():
+        return None
+    turns = "".join(_format_line(msg, int(options['MAX_MESSAGE_TOKENS'])) for msg in overflow_asc)
+    prompt = f"""Оновіть стислий підсумок розмови кар'єрного радника з ветераном.
+Збережіть факти про користувача, його цілі, домовленості та відкриті питання.
+Максимум {int(options['SUMMARY_TOKEN_BUDGET']) * 3} символів. Поверніть ЛИШЕ текст підсумку.
+
+ПОПЕРЕДНІЙ ПІДСУМОК:
+{previous or '(порожньо)'}
+
+НОВІ ПОВІДОМЛЕННЯ:
+{turns}"""
+    response = llm_client.generate_content(prompt, operation='advisor.history_summary')
+    if not response.parts or not response.text:
+        return None
+    return _truncate_to_tokens(response.text.strip(), int(options['SUMMARY_TOKEN_BUDGET']))
+
+
+def update_rolling_summary(conversation) -> bool:
+    """
+    Fold turns that left the verbatim window into the rolling summary.
+
+    Called after each assistant reply. Only messages newer than the last
+    summarized one are read, so the work per turn stays bounded.
+    Returns True when the summary changed.
+    """
+    options = get_history_settings()
+    summary_data = dict(conversation.summary_data or {})
+    state = dict(summary_data.get(SUMMARY_KEY) or {})
+    messages_desc = _unsummarized_messages(conversation, state)
+    _, overflow = _split_window(
+        messages_desc, int(options['TOKEN_BUDGET']), int(options['MAX_MESSAGE_TOKENS'])
+    )
+    if not overflow:
+        return False
+
+    overflow_asc = list(reversed(overflow))
+    previous = state.get('summary', '')
+    summary = None
+    if options['SUMMARY_MODE'] == 'llm':
+        try:
+            summary = _llm_summary(previous, overflow_asc, options)
+        except Exception:
+            logger.exception('LLM history summary failed; falling back to extractive summary')
+    if summary is None:
+        summary = _extractive_summary(previous, overflow_asc, options)
+
+    state.update({
+        'summary': summary,
+        'summarized_until': overflow_asc[-1].created_at.isoformat(),
+        'summarized_count': state.get('summarized_count', 0) + len(overflow_asc),
+    })
+    summary_data[SUMMARY_KEY] = state
+    conversation.summary_data = summary_data
+    conversation.save(update_fields=['summary_data'])
+    return True
@@ -0,0 +1,343 @@
+"""
+Database-backed background job queue.
+
+Jobs are `BackgroundJob` rows, so the queue needs nothing beyond Postgres. Each
+web process runs a small in-process runner thread (BACKGROUND_JOBS['IN_PROCESS']),
+woken right after a job is committed; `manage.py run_jobs` runs a dedicated
+worker instead. Workers claim jobs with SELECT ... FOR UPDATE SKIP LOCKED, and a
+job whose worker died is reclaimed once its lease expires.
+
+Handlers are registered per job kind with `@register('kind')` and receive the
+job plus a `report(text)` callback that appends partial output, which
+`stream_output()` forwards to readers while the job is still running. Kinds
+registered with `batch=True` get up to BACKGROUND_JOBS['BATCH_SIZE'] runnable
+jobs at once and return an output per job id, so e.g. several conversation
+titles share one LLM request.
+"""
+from __future__ import annotations
+import os
+import socket
+import threading
+import time
+import logging
+from datetime import timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_handlers: Dict[str, Tuple[Callable, bool]] = {}
+
+
+class JobFailed(Exception):
+    """Raised by readers of a job that ended in the failed state."""
+
+
+def get_job_settings() -> Dict[str, Any]:
+    options = {
+        'IN_PROCESS': True,
+        'POLL_SECONDS': 1.0,
+        'MAX_ATTEMPTS': 3,
+        'RETRY_DELAY_SECONDS': 5,
+        'LEASE_SECONDS': 300,
+        'REPORT_INTERVAL_SECONDS': 0.5,
+        'BATCH_SIZE': 10,
+    }
+    options.update(getattr(settings, 'BACKGROUND_JOBS', {}) or {})
+    return options
+
+
+def register(kind: str, batch: bool = False):
+    """
+    Register the decorated function as the handler for `kind` jobs.
+
+    A batch handler is called as `handler(jobs, report)` with a list of claimed
+    jobs and returns a dict mapping job ids to their output.
+    """
+    def decorator(func):
+        _handlers[kind] = (func, batch)
+        return func
+    return decorator
+
+
+def worker_id() -> str:
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+def enqueue(kind: str, payload: Optional[Dict[str, Any]] = None, key: str = '', delay: float = 0):
+    """
+    Add a job and wake the in-process runner once the transaction commits.
+
+    With a `key`, an existing job with the same key is returned instead of
+    creating a duplicate. A `delay` (seconds) holds the job back, e.g. so that
+    batchable jobs can accumulate.
+    """
+    from api.models.job import BackgroundJob
+
+    if key:
+        existing = BackgroundJob.objects.filter(key=key).first()
+        if existing is not None:
+            return existing
+    try:
+        with transaction.atomic():
+            job = BackgroundJob.objects.create(
+                kind=kind, key=key, payload=payload or {},
+                run_after=timezone.now() + timedelta(seconds=delay),
+            )
+    except IntegrityError:
+        # Lost a race with another request enqueuing the same key
+        return BackgroundJob.objects.get(key=key)
+    transaction.on_commit(wake_runner)
+    return job
+
+
+def find(key: str):
+    from api.models.job import BackgroundJob
+
+    return BackgroundJob.objects.filter(key=key).first()
+
+
+def _claimable(now):
+    from api.models.job import BackgroundJob, BackgroundJobStatus
+
+    lease_expired = now - timedelta(seconds=float(get_job_settings()['LEASE_SECONDS']))
+    return BackgroundJob.objects.filter(
+        Q(status=BackgroundJobStatus.PENDING, run_after__lte=now)
+        | Q(status=BackgroundJobStatus.RUNNING, started_at__lt=lease_expired)
+    )
+
+
+def claim(worker: Optional[str] = None, job_id=None):
+    """Mark the oldest runnable job (or the given one) as running and return it, or None."""
+    from api.models.job import BackgroundJobStatus
+
+    now = timezone.now()
+    with transaction.atomic():
+        queryset = _claimable(now).select_for_update(skip_locked=True)
+        if job_id is not None:
+            queryset = queryset.filter(id=job_id)
+        job = queryset.order_by('created_at').first()
+        if job is None:
+            return None
+        job.status = BackgroundJobStatus.RUNNING
+        job.attempts += 1
+        job.locked_by = worker or worker_id()
+        job.started_at = now
+        job.output = ''
+        job.save(update_fields=['status', 'attempts', 'locked_by', 'started_at', 'output', 'updated_at'])
+    return job
+
+
+def claim_batch(kind: str, limit: int, worker: Optional[str] = None) -> List:
+    """Claim up to `limit` runnable jobs of one kind (oldest first)."""
+    from api.models.job import BackgroundJob, BackgroundJobStatus
+
+    if limit <= 0:
+        return []
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            _claimable(now).filter(kind=kind).select_for_update(skip_locked=True).order_by('created_at')[:limit]
+        )
+        for job in batch:
+            job.status = BackgroundJobStatus.RUNNING
+            job.attempts += 1
+            job.locked_by = worker or worker_id()
+            job.started_at = now
+            job.output = ''
+            job.updated_at = now
+        BackgroundJob.objects.bulk_update(
+            batch, ['status', 'attempts', 'locked_by', 'started_at', 'output', 'updated_at']
+        )
+    return batch
+
+
+class _Reporter:
+    """Appends partial output to a running job, writing at most every REPORT_INTERVAL_SECONDS."""
+
+    def __init__(self, job):
+        self.job = job
+        self.parts = []
+        self.interval = float(get_job_settings()['REPORT_INTERVAL_SECONDS'])
+        self.flushed_at = 0.0
+
+    def __call__(self, text: str):
+        if not text:
+            return
+        self.parts.append(text)
+        if time.monotonic() - self.flushed_at >= self.interval:
+            self.flush()
+
+    def flush(self):
+        from api.models.job import BackgroundJob
+
+        self.flushed_at = time.monotonic()
+        BackgroundJob.objects.filter(id=self.job.id).update(output=''.join(self.parts), updated_at=timezone.now())
+
+
+def _fail(job, error: Exception):
+    from api.models.job import BackgroundJobStatus
+
+    job.error = str(error)
+    if job.attempts < int(get_job_settings()['MAX_ATTEMPTS']):
+        job.status = BackgroundJobStatus.PENDING
+        job.run_after = timezone.now() + timedelta(
+            seconds=float(get_job_settings()['RETRY_DELAY_SECONDS']) * job.attempts
+        )
+    else:
+        job.status = BackgroundJobStatus.FAILED
+        job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'run_after', 'finished_at', 'updated_at'])
+
+
+def _complete(job, result: Optional[str]):
+    from api.models.job import BackgroundJobStatus
+
+    job.status = BackgroundJobStatus.DONE
+    job.output = result or ''
+    job.error = ''
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'output', 'error', 'finished_at', 'updated_at'])
+
+
+def execute(job):
+    """
+    Run a claimed job's handler and record the result, scheduling a retry on failure.
+
+    For batch kinds, other runnable jobs of the same kind are claimed and run
+    in the same handler call.
+    """
+    handler, batch = _handlers.get(job.kind, (None, False))
+    started = time.monotonic()
+    claimed = [job]
+    try:
+        if handler is None:
+            raise LookupError(f'No handler registered for job kind {job.kind!r}')
+        if batch:
+            claimed += claim_batch(job.kind, int(get_job_settings()['BATCH_SIZE']) - 1, job.locked_by)
+            results = handler(claimed, _Reporter(job))
+        else:
+            results = {job.id: handler(job, _Reporter(job))}
+    except Exception as e:
+        logger.exception('Background job %s (%s) failed', job.id, job.kind)
+        for each in claimed:
+            _fail(each, e)
+        return job
+
+    for each in claimed:
+        _complete(each, results.get(each.id))
+    logger.info(
+        'Background job %s finished', job.kind,
+        extra={'job_id': str(job.id), 'kind': job.kind, 'batch': len(claimed),
+               'duration_ms': round((time.monotonic() - started) * 1000)},
+    )
+    return job
+
+
+def run_pending(worker: Optional[str] = None, max_jobs: Optional[int] = None) -> int:
+    """Claim and execute runnable jobs until none are left; returns how many ran."""
+    count = 0
+    while max_jobs is None or count < max_jobs:
+        job = claim(worker)
+        if job is None:
+            break
+        execute(job)
+        count += 1
+    return count
+
+
+def run_now(job):
+    """
+    Execute a still-pending job in the calling thread rather than waiting for a worker.
+
+    Returns the refreshed job; if a worker already claimed it, nothing is run here.
+    """
+    from api.models.job import BackgroundJobStatus
+
+    if job.status == BackgroundJobStatus.PENDING:
+        claimed = claim(job_id=job.id)
+        if claimed is not None:
+            return execute(claimed)
+    job.refresh_from_db()
+    return job
+
+
+def cancel(job) -> bool:
+    """Withdraw a job that no worker has claimed yet; returns False if it already started."""
+    from api.models.job import BackgroundJob, BackgroundJobStatus
+
+    deleted, _ = BackgroundJob.objects.filter(id=job.id, status=BackgroundJobStatus.PENDING).delete()
+    if not deleted:
+        job.refresh_from_db()
+    return bool(deleted)
+
+
+def stream_output(job, timeout: Optional[float] = None) -> Iterator[str]:
+    """
+    Yield a job's output as it grows until the job is done.
+
+    Raises JobFailed if the job fails for good, TimeoutError after `timeout` seconds.
+    """
+    from api.models.job import BackgroundJobStatus
+
+    poll = min(float(get_job_settings()['POLL_SECONDS']), 0.25)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    sent = 0
+    while True:
+        job.refresh_from_db(fields=['status', 'output', 'error'])
+        if len(job.output) > sent:
+            yield job.output[sent:]
+            sent = len(job.output)
+        if job.status == BackgroundJobStatus.DONE:
+            return
+        if job.status == BackgroundJobStatus.FAILED:
+            raise JobFailed(job.error)
+        if deadline is not None and time.monotonic() > deadline:
+            raise TimeoutError(f'Background job {job.id} did not finish in {timeout}s')
+        time.sleep(poll)
+
+
+def wait_for(job, timeout: Optional[float] = None) -> str:
+    """Block until the job is done and return its output."""
+    return ''.join(stream_output(job, timeout=timeout))
+
+
+class JobRunner(threading.Thread):
+    """In-process worker thread: drains the queue when woken or every POLL_SECONDS."""
+
+    def __init__(self):
+        super().__init__(name='background-jobs', daemon=True)
+        self.wakeup = threading.Event()
+
+    def run(self):
+        while True:
+            self.wakeup.wait(float(get_job_settings()['POLL_SECONDS']))
+            self.wakeup.clear()
+            try:
+                run_pending()
+            except Exception:
+                logger.exception('Background job runner iteration failed')
+            finally:
+                # Don't hold a connection between polls
+                connection.close()
+
+
+_runner: Optional[JobRunner] = None
+_runner_lock = threading.Lock()
+
+
+def wake_runner():
+    """Start this process's runner thread if needed and make it check the queue now."""
+    global _runner
+    if not get_job_settings()['IN_PROCESS']:
+        return
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                _runner = JobRunner()
+                _runner.start()
+    _runner.wakeup.set()
@@ -0,0 +1,200 @@
+"""
+Incremental indexing of the knowledge base into `KnowledgeChunk` rows.
+
+Each source (KnowledgeDocument or published Article) is hashed; only new or
+changed sources are embedded, and chunks of removed or unpublished sources are
+deleted. Runs from model save/delete signals (see `api.signals.knowledge`) or
+the `index_knowledge` management command.
+"""
+from __future__ import annotations
+import hashlib
+import threading
+import logging
+from typing import Any, Dict, List
+
+import numpy as np
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from api.services.chunking import get_chunk_settings, split_text
+from api.services.embeddings import to_blob
+from api.services.retrieval import get_knowledge_store, iter_knowledge_sources
+from api.services.vector_index import bump_generation
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(source: Dict[str, Any], model_name: str = '') -> str:
+    # Chunking parameters and the embedding model are part of the hash, so
+    # changing either re-embeds every source
+    chunk_size, chunk_overlap = get_chunk_settings()
+    raw = '\x1f'.join([
+        source['title'] or '', source['source_url'] or '', source['content'] or '',
+        f'{chunk_size}:{chunk_overlap}', model_name,
+    ])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class KnowledgeIndexer:
+    """Keeps `knowledge_chunks` in sync with the source tables."""
+
+    def __init__(self, store=None):
+        self.store = store or get_knowledge_store()
+
+    def _hash(self, source: Dict[str, Any]) -> str:
+        return content_hash(source, self.store.get_embeddings().model_name)
+
+    def _indexed_hashes(self) -> Dict[tuple, str]:
+        from api.models.knowledge import KnowledgeChunk
+
+        rows = KnowledgeChunk.objects.values_list('source_type', 'source_id', 'content_hash').distinct()
+        return {(source_type, source_id): digest for source_type, source_id, digest in rows}
+
+    def _write(self, sources: List[Dict[str, Any]]):
+        """Chunk and embed `sources`, then replace their chunks in one transaction."""
+        from api.models.knowledge import KnowledgeChunk, KnowledgeDocument, KnowledgeSourceType
+
+        pending = []
+        for source in sources:
+            digest = self._hash(source)
+            for piece in split_text(source['content']):
+                chunk = KnowledgeChunk(
+                    source_type=source['source_type'],
+                    source_id=source['source_id'],
+                    title=source['title'],
+                    source_url=source['source_url'],
+                    content_hash=digest,
+                    chunk_index=piece.index,
+                    start_offset=piece.start,
+                    end_offset=piece.end,
+                    content=piece.text,
+                )
+                # The title gives short passages the context they lack on their own
+                pending.append((chunk, f"{source['title']}\n\n{piece.text}"))
+
+        # One batched pass over every chunk of every pending source
+        embeddings = self.store.get_embeddings()
+        vectors = embeddings.embed_documents([text for _, text in pending]) if pending else []
+        by_document = {}
+        for (chunk, _), vector in zip(pending, vectors):
+            chunk.embedding = vector
+            if chunk.source_type == KnowledgeSourceType.DOCUMENT:
+                by_document.setdefault(chunk.source_id, []).append(vector)
+
+        with transaction.atomic():
+            for source in sources:
+                KnowledgeChunk.objects.filter(
+                    source_type=source['source_type'], source_id=source['source_id']
+                ).delete()
+            KnowledgeChunk.objects.bulk_create([chunk for chunk, _ in pending])
+            # Whole-document vector: the normalized mean of its chunk vectors
+            for document_id, document_vectors in by_document.items():
+                mean = np.mean(np.asarray(document_vectors, dtype=np.float32), axis=0)
+                norm = float(np.linalg.norm(mean))
+                KnowledgeDocument.objects.filter(id=document_id).update(
+                    embedding=to_blob(mean / norm if norm else mean)
+                )
+        bump_generation()
+
+    def sync(self, full: bool = False) -> Dict[str, int]:
+        """
+        Bring the index up to date and return counts of added/updated/removed/unchanged sources.
+
+        With `full=True` every source is re-embedded regardless of its hash.
+        """
+        from api.models.knowledge import KnowledgeChunk
+
+        stats = {'added': 0, 'updated': 0, 'removed': 0, 'unchanged': 0}
+        indexed = self._indexed_hashes()
+        seen = set()
+        pending = []
+        for source in iter_knowledge_sources():
+            key = (source['source_type'], source['source_id'])
+            if not source['content']:
+                continue
+            seen.add(key)
+            previous = indexed.get(key)
+            if previous is None:
+                stats['added'] += 1
+            elif full or previous != self._hash(source):
+                stats['updated'] += 1
+            else:
+                stats['unchanged'] += 1
+                continue
+            pending.append(source)
+
+        if pending:
+            self._write(pending)
+
+        removed = [key for key in indexed if key not in seen]
+        for source_type, source_id in removed:
+            KnowledgeChunk.objects.filter(source_type=source_type, source_id=source_id).delete()
+        stats['removed'] = len(removed)
+        if removed:
+            bump_generation()
+
+        logger.info('Knowledge index synced', extra=stats)
+        return stats
+
+    def index_source(self, source_type: str, source_id) -> bool:
+        """Re-index one source if its content changed; drop it if it no longer qualifies."""
+        from api.models.knowledge import KnowledgeChunk
+
+        source = next(
+            (s for s in iter_knowledge_sources(source_type=source_type, source_id=source_id) if s['content']),
+            None,
+        )
+        if source is None:
+            return self.remove_source(source_type, source_id)
+        current = KnowledgeChunk.objects.filter(
+            source_type=source_type, source_id=source_id
+        ).values_list('content_hash', flat=True).first()
+        if current == self._hash(source):
+            return False
+        self._write([source])
+        return True
+
+    @staticmethod
+    def remove_source(source_type: str, source_id) -> bool:
+        """Delete all chunks of one source (cheap, needs no embeddings)."""
+        from api.models.knowledge import KnowledgeChunk
+
+        deleted, _ = KnowledgeChunk.objects.filter(source_type=source_type, source_id=source_id).delete()
+        if deleted:
+            bump_generation()
+        return bool(deleted)
+
+
+def _index_source_safely(source_type: str, source_id):
+    try:
+        KnowledgeIndexer().index_source(source_type, source_id)
+    except Exception:
+        logger.exception('Failed to index knowledge source %s %s', source_type, source_id)
+
+
+def _run_index_source_in_thread(source_type: str, source_id):
+    try:
+        _index_source_safely(source_type, source_id)
+    finally:
+        # Background threads get their own connection; don't leak it
+        connection.close()
+
+
+def schedule_source_index(source_type: str, source_id):
+    """
+    Re-index one source after the current transaction commits.
+
+    KNOWLEDGE_INDEX['AUTO_INDEX'] controls the mode: 'async' (default) runs in a
+    background thread so saves never wait on the embeddings API, 'sync' runs
+    inline, and 'off' leaves indexing to the management command.
+    """
+    mode = (getattr(settings, 'KNOWLEDGE_INDEX', {}) or {}).get('AUTO_INDEX', 'async')
+    if mode == 'off':
+        return
+    if mode == 'sync':
+        transaction.on_commit(lambda: _index_source_safely(source_type, source_id))
+        return
+    transaction.on_commit(lambda: threading.Thread(
+        target=_run_index_source_in_thread, args=(source_type, source_id), daemon=True
+    ).start())
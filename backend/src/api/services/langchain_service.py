@@ -1,27 +1,74 @@
 """
 LangChain-based services for advanced AI features.
-Includes multi-step business validation and vector RAG.
+Includes multi-step business validation and vector RAG
+(the RAG index itself lives in `api.services.retrieval`).
 """
 from __future__ import annotations
-import os
-import json
-from typing import List, Dict, Any, Optional
-from django.conf import settings
+import threading
+import time
+from typing import List, Dict, Any, Iterator, Optional
+
+from api.services import llm_client
 
 import logging
 logger = logging.getLogger(__name__)
 try:
-    from langchain.chains import LLMChain, SequentialChain
+    from langchain.chains import LLMChain
     from langchain.prompts import PromptTemplate
     from langchain_google_genai import ChatGoogleGenerativeAI
-    from langchain.schema import Document
-    from langchain_google_genai import GoogleGenerativeAIEmbeddings
-    from langchain_community.vectorstores import Chroma
     LANGCHAIN_AVAILABLE = True
 except ImportError:
     LANGCHAIN_AVAILABLE = False
+
+
+_llm = None
+_llm_key: Optional[tuple] = None
+_chains: Dict[str, Any] = {}
+_chains_lock = threading.Lock()
+
+
+def get_validation_llm():
+    """Return this worker's shared `ChatGoogleGenerativeAI` client, built on first use."""
+    global _llm, _llm_key
+    key = (llm_client.get_api_key(), llm_client.resolve_model_name())
+    if _llm is None or _llm_key != key:
+        with _chains_lock:
+            if _llm is None or _llm_key != key:
+                _llm = ChatGoogleGenerativeAI(
+                    model=key[1],
+                    google_api_key=key[0],
+                    temperature=0.3  # Lower temperature for more consistent analysis
+                )
+                _llm_key = key
+                # Compiled chains hold the previous client
+                _chains.clear()
+    return _llm
+
+
+def clear_chain_cache():
+    """Forget the shared client and compiled chains (tests, key rotation)."""
+    global _llm, _llm_key
+    with _chains_lock:
+        _llm = None
+        _llm_key = None
+        _chains.clear()
+
+
 class BusinessValidationChain:
-    """Multi-step business idea validation using LangChain."""
+    """Multi-step business idea validation using LangChain.
+
+    Creating an instance is cheap: the LLM client and the compiled step chains
+    are built once per worker and shared (see `get_validation_llm`, `_get_chain`).
+    """
+
+    # Chain output key -> builder method
+    STEP_BUILDERS = {
+        "market_analysis": "_create_market_analysis_chain",
+        "financial_analysis": "_create_financial_analysis_chain",
+        "skills_match": "_create_skills_match_chain",
+        "risk_assessment": "_create_risk_assessment_chain",
+        "final_verdict": "_create_final_verdict_chain",
+    }
     
     def __init__(self):
         # If LangChain isn't available, provide a safe non-raising fallback
@@ -30,76 +77,137 @@ class BusinessValidationChain:
             self.available = False
             return
 
-        api_key = getattr(settings, 'GOOGLE_API_KEY', None) or os.environ.get('GOOGLE_API_KEY')
-        if not api_key:
+        if not llm_client.get_api_key():
             logger.error('GOOGLE_API_KEY not configured for BusinessValidationChain')
             # Keep object usable but mark unavailable so callers can decide
             self.available = False
             return
 
-        model_name = getattr(settings, 'GOOGLE_LLM_MODEL', 'gemin-2.5-flash')
-        self.llm = ChatGoogleGenerativeAI(
-            model=model_name,
-            google_api_key=api_key,
-            temperature=0.3  # Lower temperature for more consistent analysis
-        )
         self.available = True
+
+    @property
+    def llm(self):
+        return get_validation_llm()
+
+    def _get_chain(self, output_key: str) -> LLMChain:
+        """Return the compiled chain for one step, building it only the first time per worker."""
+        # Rebuilds the shared client (and drops stale chains) if the key or model changed
+        get_validation_llm()
+        chain = _chains.get(output_key)
+        if chain is None:
+            with _chains_lock:
+                chain = _chains.get(output_key)
+                if chain is None:
+                    chain = getattr(self, self.STEP_BUILDERS[output_key])()
+                    _chains[output_key] = chain
+        return chain
+
+    def _run_step(self, output_key: str, **inputs) -> str:
+        """Run one step's cached chain and log chain setup vs LLM time."""
+        started = time.perf_counter()
+        chain = self._get_chain(output_key)
+        chain_ready = time.perf_counter()
+        result = chain.run(**inputs)
+        finished = time.perf_counter()
+
+        setup_ms = (chain_ready - started) * 1000
+        llm_ms = (finished - chain_ready) * 1000
+        logger.info(
+            'Validation step %s: setup %.1fms llm %.1fms', output_key, setup_ms, llm_ms,
+            extra={'step': output_key, 'setup_ms': round(setup_ms, 1), 'llm_ms': round(llm_ms, 1)},
+        )
+        return result
+
+    # Returned instead of an analysis when LangChain or the API key is missing
+    STEP_UNAVAILABLE = {
+        "market_analysis": "(LangChain not available — market analysis skipped)",
+        "financial_analysis": "(LangChain not available — financial analysis skipped)",
+        "skills_match": "(LangChain not available — skills match skipped)",
+        "risk_assessment": "(LangChain not available — risk assessment skipped)",
+        "final_verdict": "(LangChain not available — final verdict skipped)",
+    }
+
+    def stream_step(self, output_key: str, **inputs) -> Iterator[str]:
+        """
+        Stream one step's analysis token by token.
+
+        `inputs` are the step's prompt variables (business_idea, user_context and
+        the outputs of earlier steps, named by their output keys).
+        """
+        if not getattr(self, 'available', False):
+            yield self.STEP_UNAVAILABLE[output_key]
+            return
+
+        started = time.perf_counter()
+        chain = self._get_chain(output_key)
+        chain_ready = time.perf_counter()
+        first_chunk_at = None
+        for chunk in (chain.prompt | chain.llm).stream(inputs):
+            text = getattr(chunk, 'content', chunk)
+            if not text:
+                continue
+            if first_chunk_at is None:
+                first_chunk_at = time.perf_counter()
+            yield text
+        finished = time.perf_counter()
+
+        setup_ms = (chain_ready - started) * 1000
+        first_chunk_ms = ((first_chunk_at or finished) - chain_ready) * 1000
+        llm_ms = (finished - chain_ready) * 1000
+        logger.info(
+            'Validation step %s (stream): setup %.1fms first chunk %.1fms llm %.1fms',
+            output_key, setup_ms, first_chunk_ms, llm_ms,
+            extra={'step': output_key, 'setup_ms': round(setup_ms, 1),
+                   'first_chunk_ms': round(first_chunk_ms, 1), 'llm_ms': round(llm_ms, 1)},
+        )
     
     def validate_market(self, business_idea: str) -> str:
         """Step 1: Market Analysis"""
         if not getattr(self, 'available', False):
-            return "(LangChain not available — market analysis skipped)"
+            return self.STEP_UNAVAILABLE["market_analysis"]
 
-        chain = self._create_market_analysis_chain()
-        result = chain.run(business_idea=business_idea)
-        return result
+        return self._run_step("market_analysis", business_idea=business_idea)
 
     def validate_financials(self, business_idea: str, market_analysis: str) -> str:
         """Step 2: Financial Analysis"""
         if not getattr(self, 'available', False):
-            return "(LangChain not available — financial analysis skipped)"
+            return self.STEP_UNAVAILABLE["financial_analysis"]
 
-        chain = self._create_financial_analysis_chain()
-        result = chain.run(business_idea=business_idea, market_analysis=market_analysis)
-        return result
+        return self._run_step("financial_analysis", business_idea=business_idea, market_analysis=market_analysis)
 
     def validate_skills(self, business_idea: str, user_context: str) -> str:
         """Step 3: Skills Match"""
         if not getattr(self, 'available', False):
-            return "(LangChain not available — skills match skipped)"
+            return self.STEP_UNAVAILABLE["skills_match"]
 
-        chain = self._create_skills_match_chain()
-        result = chain.run(business_idea=business_idea, user_context=user_context)
-        return result
+        return self._run_step("skills_match", business_idea=business_idea, user_context=user_context)
 
     def validate_risks(self, business_idea: str, market_analysis: str, financial_analysis: str, skills_match: str) -> str:
         """Step 4: Risk Assessment"""
         if not getattr(self, 'available', False):
-            return "(LangChain not available — risk assessment skipped)"
+            return self.STEP_UNAVAILABLE["risk_assessment"]
 
-        chain = self._create_risk_assessment_chain()
-        result = chain.run(
+        return self._run_step(
+            "risk_assessment",
             business_idea=business_idea,
             market_analysis=market_analysis,
             financial_analysis=financial_analysis,
             skills_match=skills_match
         )
-        return result
 
     def validate_verdict(self, business_idea: str, market_analysis: str, financial_analysis: str, skills_match: str, risk_assessment: str) -> str:
         """Step 5: Final Verdict"""
         if not getattr(self, 'available', False):
-            return "(LangChain not available — final verdict skipped)"
+            return self.STEP_UNAVAILABLE["final_verdict"]
 
-        chain = self._create_final_verdict_chain()
-        result = chain.run(
+        return self._run_step(
+            "final_verdict",
             business_idea=business_idea,
             market_analysis=market_analysis,
             financial_analysis=financial_analysis,
             skills_match=skills_match,
             risk_assessment=risk_assessment
         )
-        return result
 
     def validate_idea(self, business_idea: str, user_context: str) -> Dict[str, Any]:
         """
@@ -117,40 +225,10 @@ class BusinessValidationChain:
                 'final_verdict': '(LangChain not available — final verdict skipped)'
             }
 
-        # Step 1: Market Analysis
-        market_chain = self._create_market_analysis_chain()
-        
-        # Step 2: Financial Analysis
-        financial_chain = self._create_financial_analysis_chain()
-        
-        # Step 3: Skills Match
-        skills_chain = self._create_skills_match_chain()
-        
-        # Step 4: Risk Assessment
-        risk_chain = self._create_risk_assessment_chain()
-        
-        # Step 5: Final Verdict
-        verdict_chain = self._create_final_verdict_chain()
-        
-        # Execute sequential chain
-        overall_chain = SequentialChain(
-            chains=[market_chain, financial_chain, skills_chain, risk_chain, verdict_chain],
-            input_variables=["business_idea", "user_context"],
-            output_variables=[
-                "market_analysis",
-                "financial_analysis", 
-                "skills_match",
-                "risk_assessment",
-                "final_verdict"
-            ],
-            verbose=False
-        )
-        
-        result = overall_chain({
-            "business_idea": business_idea,
-            "user_context": user_context
-        })
-        
+        # Independent steps (market, skills) run concurrently; see api.services.business_validation
+        from api.services.business_validation import ValidationDAG
+        result = ValidationDAG(self).run(business_idea, user_context)
+        result.update({"business_idea": business_idea, "user_context": user_context})
         return result
     
     def _create_market_analysis_chain(self) -> LLMChain:
@@ -332,95 +410,30 @@ class BusinessValidationChain:
 
 
 class VectorRAG:
-    """Vector-based Retrieval Augmented Generation for learning mode."""
-    
-    def __init__(self, persist_directory: str = "/tmp/chroma_db"):
-        # If LangChain isn't available, operate in a safe fallback mode
-        if not LANGCHAIN_AVAILABLE:
-            logger.warning('LangChain not available: VectorRAG will operate in fallback mode')
-            self.available = False
-            self.persist_directory = persist_directory
-            self.vectorstore = None
-            self.embeddings = None
-            return
+    """Vector-based Retrieval Augmented Generation for learning mode.
 
-        api_key = getattr(settings, 'GOOGLE_API_KEY', None) or os.environ.get('GOOGLE_API_KEY')
-        if not api_key:
-            logger.error('GOOGLE_API_KEY not configured for VectorRAG')
-            self.available = False
-            self.persist_directory = persist_directory
-            self.vectorstore = None
-            self.embeddings = None
-            return
+    Thin wrapper over the process-wide pgvector store in `api.services.retrieval`;
+    creating an instance is free and nothing is rebuilt per request.
+    """
 
-        self.embeddings = GoogleGenerativeAIEmbeddings(
-            model="models/embedding-001",
-            google_api_key=api_key
-        )
-        self.persist_directory = persist_directory
-        self.vectorstore = None
-    
-    def initialize_vectorstore(self, force_refresh: bool = False):
-        """Initialize or load existing vector store."""
-        if not getattr(self, 'available', True):
-            # Nothing to do in fallback mode
-            return
+    def __init__(self):
+        from api.services.retrieval import get_knowledge_store
+        self.store = get_knowledge_store()
 
-        try:
-            if not force_refresh:
-                # Try to load existing vectorstore
-                self.vectorstore = Chroma(
-                    persist_directory=self.persist_directory,
-                    embedding_function=self.embeddings
-                )
-            else:
-                # Refresh from database
-                self._refresh_vectorstore()
-        except Exception:
-            # Create new if loading fails
+    @property
+    def available(self) -> bool:
+        return self.store.available
+
+    def initialize_vectorstore(self, force_refresh: bool = False):
+        """Rebuild the shared index only when explicitly asked to."""
+        if force_refresh:
             self._refresh_vectorstore()
-    
+
     def _refresh_vectorstore(self):
-        """Refresh vectorstore from database."""
-        from api.models.knowledge import KnowledgeDocument
-        from api.models.article import Article
-        
-        documents = []
-        
-        # Load KnowledgeDocuments
-        knowledge_docs = KnowledgeDocument.objects.all()
-        for doc in knowledge_docs:
-            documents.append(Document(
-                page_content=doc.raw_text_content,
-                metadata={
-                    "title": doc.title,
-                    "source": doc.source_url or "",
-                    "type": "knowledge_document",
-                    "id": str(doc.id)
-                }
-            ))
-        
-        # Load published Articles
-        articles = Article.objects.filter(is_published=True)
-        for article in articles:
-            documents.append(Document(
-                page_content=article.content,
-                metadata={
-                    "title": article.title,
-                    "source": f"/articles/{article.slug}",
-                    "type": "article",
-                    "id": str(article.id)
-                }
-            ))
-        
-        if documents:
-            self.vectorstore = Chroma.from_documents(
-                documents=documents,
-                embedding=self.embeddings,
-                persist_directory=self.persist_directory
-            )
-            self.vectorstore.persist()
-    
+        """Bring the shared index up to date; only new or changed sources are embedded."""
+        from api.services.knowledge_indexer import KnowledgeIndexer
+        return KnowledgeIndexer(self.store).sync()
+
     def search(self, query: str, k: int = 3) -> List[Dict[str, Any]]:
         """
         Semantic search for relevant documents.
@@ -432,43 +445,9 @@ class VectorRAG:
         - type: 'knowledge_document' or 'article'
         - relevance_score: Similarity score
         """
-        if not getattr(self, 'available', True):
-            return []
+        return self.store.search(query, k=k)
 
-        if not self.vectorstore:
-            self.initialize_vectorstore()
-        
-        # Perform similarity search with scores
-        results = self.vectorstore.similarity_search_with_score(query, k=k)
-        
-        formatted_results = []
-        for doc, score in results:
-            # Extract snippet (first 300 chars)
-            content = doc.page_content[:300]
-            if len(doc.page_content) > 300:
-                content += "..."
-            
-            formatted_results.append({
-                'title': doc.metadata.get('title', 'Untitled'),
-                'content': content,
-                'source': doc.metadata.get('source', ''),
-                'type': doc.metadata.get('type', 'unknown'),
-                'relevance_score': float(1 - score)  # Convert distance to similarity
-            })
-        
-        return formatted_results
-    
     def format_rag_context(self, results: List[Dict[str, Any]]) -> str:
         """Format search results for LLM context."""
-        if not results:
-            return ""
-        
-        context = "\n\nРЕЛЕВАНТНІ МАТЕРІАЛИ З БАЗИ ЗНАНЬ:\n"
-        for i, result in enumerate(results, 1):
-            context += f"\n{i}. [{result['type'].upper()}] {result['title']}\n"
-            context += f"   {result['content']}\n"
-            if result['source']:
-                context += f"   Джерело: {result['source']}\n"
-            context += f"   Релевантність: {result['relevance_score']:.2%}\n"
-        
-        return context
+        from api.services.retrieval import format_rag_context
+        return format_rag_context(results)
@@ -0,0 +1,173 @@
+"""
+Process-wide registry of Gemini clients.
+
+`genai.configure()` throws away the SDK's cached transport clients, so calling it
+on every request also throws away the underlying keep-alive gRPC/HTTP channel.
+The registry configures the SDK once per API key and caches `GenerativeModel`
+instances per (model, generation config), so every request in a worker reuses
+the same connection. Each call logs how long was spent on client setup versus
+the LLM call itself.
+
+`astream_content()` is the asyncio counterpart of `stream_content()` for the
+ASGI chat endpoint: it awaits the SDK's async transport, so a streaming reply
+holds no thread while waiting for tokens.
+"""
+from __future__ import annotations
+import json
+import os
+import time
+import threading
+import logging
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Tuple
+
+import google.generativeai as genai
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Single default used by every entry point when GOOGLE_LLM_MODEL is not set.
+DEFAULT_MODEL_NAME = 'models/gemini-2.5-flash'
+
+
+def get_api_key() -> Optional[str]:
+    """Return the Google API key from settings or the environment."""
+    return getattr(settings, 'GOOGLE_API_KEY', None) or os.environ.get('GOOGLE_API_KEY')
+
+
+def resolve_model_name(model_name: Optional[str] = None) -> str:
+    """Resolve the model name once, the same way for every caller."""
+    return model_name or getattr(settings, 'GOOGLE_LLM_MODEL', None) or DEFAULT_MODEL_NAME
+
+
+def _config_key(generation_config: Optional[Dict[str, Any]]) -> str:
+    if not generation_config:
+        return ''
+    return json.dumps(generation_config, sort_keys=True, default=str)
+
+
+class GeminiClientRegistry:
+    """Thread-safe cache of configured `GenerativeModel` instances."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._configured_key: Optional[str] = None
+        self._models: Dict[Tuple[str, str], Any] = {}
+
+    def _ensure_configured(self, api_key: str):
+        # Must be called with the lock held. Reconfiguring drops the SDK's
+        # cached clients, so only do it when the key actually changes.
+        if self._configured_key == api_key:
+            return
+        options = {'api_key': api_key}
+        transport = getattr(settings, 'GOOGLE_LLM_TRANSPORT', None)
+        if transport:
+            options['transport'] = transport
+        genai.configure(**options)
+        self._configured_key = api_key
+        self._models.clear()
+
+    def get_model(self, model_name: Optional[str] = None,
+                  generation_config: Optional[Dict[str, Any]] = None) -> Tuple[Any, float]:
+        """
+        Return `(model, setup_seconds)` for the given model and generation config.
+
+        The fast path is a lock-free dict lookup; the model is only built the
+        first time a worker sees a given (model, config) pair.
+        """
+        started = time.perf_counter()
+        api_key = get_api_key()
+        if not api_key:
+            raise RuntimeError('GOOGLE_API_KEY is not configured')
+
+        name = resolve_model_name(model_name)
+        key = (name, _config_key(generation_config))
+        if self._configured_key == api_key:
+            model = self._models.get(key)
+            if model is not None:
+                return model, time.perf_counter() - started
+
+        with self._lock:
+            self._ensure_configured(api_key)
+            model = self._models.get(key)
+            if model is None:
+                if generation_config:
+                    model = genai.GenerativeModel(name, generation_config=generation_config)
+                else:
+                    model = genai.GenerativeModel(name)
+                self._models[key] = model
+        return model, time.perf_counter() - started
+
+    def clear(self):
+        """Drop all cached clients (used by tests and on key rotation)."""
+        with self._lock:
+            self._models.clear()
+            self._configured_key = None
+
+
+_registry = GeminiClientRegistry()
+
+
+def get_client_registry() -> GeminiClientRegistry:
+    return _registry
+
+
+def _log_timings(operation: str, model_name: str, setup: float, call: float, first_chunk: Optional[float] = None):
+    extra = {
+        'operation': operation,
+        'model': model_name,
+        'setup_ms': round(setup * 1000, 2),
+        'llm_ms': round(call * 1000, 2),
+    }
+    if first_chunk is not None:
+        extra['first_chunk_ms'] = round(first_chunk * 1000, 2)
+    logger.info(
+        'LLM %s: setup %.1f ms, llm %.1f ms', operation, extra['setup_ms'], extra['llm_ms'],
+        extra=extra,
+    )
+
+
+def generate_content(prompt: str, operation: str, model_name: Optional[str] = None,
+                     generation_config: Optional[Dict[str, Any]] = None):
+    """Run a blocking `generate_content` call through the shared registry."""
+    model, setup = _registry.get_model(model_name, generation_config)
+    started = time.perf_counter()
+    response = model.generate_content(prompt)
+    _log_timings(operation, resolve_model_name(model_name), setup, time.perf_counter() - started)
+    return response
+
+
+def stream_content(prompt: str, operation: str, model_name: Optional[str] = None,
+                   generation_config: Optional[Dict[str, Any]] = None) -> Iterator[Any]:
+    """Yield streamed response chunks through the shared registry."""
+    model, setup = _registry.get_model(model_name, generation_config)
+    started = time.perf_counter()
+    first_chunk = None
+    try:
+        for chunk in model.generate_content(prompt, stream=True):
+            if first_chunk is None:
+                first_chunk = time.perf_counter() - started
+            yield chunk
+    finally:
+        _log_timings(
+            operation, resolve_model_name(model_name), setup,
+            time.perf_counter() - started, first_chunk,
+        )
+
+
+async def astream_content(prompt: str, operation: str, model_name: Optional[str] = None,
+                          generation_config: Optional[Dict[str, Any]] = None) -> AsyncIterator[Any]:
+    """Async variant of `stream_content` built on `generate_content_async`."""
+    model, setup = _registry.get_model(model_name, generation_config)
+    started = time.perf_counter()
+    first_chunk = None
+    try:
+        response = await model.generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            if first_chunk is None:
+                first_chunk = time.perf_counter() - started
+            yield chunk
+    finally:
+        _log_timings(
+            operation, resolve_model_name(model_name), setup,
+            time.perf_counter() - started, first_chunk,
+        )
@@ -0,0 +1,128 @@
+"""
+In-process response cache for the advisor chat path.
+
+Replies are keyed on a normalized prompt fingerprint (conversation type,
+language, a hash of the assessment context and the user message), kept for a
+limited time and evicted in LRU order once the cache is full.
+"""
+from __future__ import annotations
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, Optional
+
+from django.conf import settings
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_TRAILING_PUNCT_RE = re.compile(r'[\s.!?,;:…]+$')
+
+
+def normalize_message(text: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    text = _WHITESPACE_RE.sub(' ', (text or '').strip().lower())
+    return _TRAILING_PUNCT_RE.sub('', text)
+
+
+def build_fingerprint(conv_type: str, language: str, assessment_context: str, user_content: str) -> str:
+    """Return a stable cache key for a chat prompt."""
+    context_hash = hashlib.sha256((assessment_context or '').encode('utf-8')).hexdigest()
+    raw = '\x1f'.join([conv_type or '', language or '', context_hash, normalize_message(user_content)])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def iter_chunks(text: str, chunk_size: int = 40) -> Iterator[str]:
+    """Split a cached reply into word-aligned chunks so it can be replayed as a stream."""
+    buffer = ''
+    for word in re.split(r'(\s+)', text):
+        buffer += word
+        if len(buffer) >= chunk_size:
+            yield buffer
+            buffer = ''
+    if buffer:
+        yield buffer
+
+
+class ResponseCache:
+    """Thread-safe TTL + LRU cache with hit/miss counters."""
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: int = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: str):
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+def get_cache_settings() -> Dict[str, Any]:
+    return getattr(settings, 'ADVISOR_RESPONSE_CACHE', {}) or {}
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Return the per-worker response cache, creating it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                options = get_cache_settings()
+                _cache = ResponseCache(
+                    max_entries=int(options.get('MAX_ENTRIES', 512)),
+                    ttl_seconds=int(options.get('TTL_SECONDS', 3600)),
+                )
+    return _cache
+
+
+def is_cacheable(conv_type: str, user_content: str, file_content: Optional[str] = None) -> bool:
+    """Whether a prompt may be served from / stored in the cache."""
+    options = get_cache_settings()
+    if not options.get('ENABLED', False) or not conv_type or file_content:
+        return False
+    if conv_type in options.get('DISABLED_CONV_TYPES', ()):
+        return False
+    # Very short messages ("так", "далі") only make sense with the history, which is not in the key
+    return len(normalize_message(user_content)) >= int(options.get('MIN_MESSAGE_CHARS', 20))
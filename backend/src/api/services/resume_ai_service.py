@@ -1,7 +1,6 @@
 import logging
-import google.generativeai as genai
-from django.conf import settings
-from api.models.user_assesment import UserAssessment, DEFAULT_LANGUAGE
+from api.models.user_assesment import DEFAULT_LANGUAGE
+from api.services import assessments, llm_client
 
 logger = logging.getLogger(__name__)
 
@@ -27,29 +26,23 @@ class ResumeAIService:
             str: The generated summary.
         """
         try:
-            # 1. Configure Gemini
-            api_key = getattr(settings, 'GOOGLE_API_KEY', None)
+            # 1. Check Gemini configuration (the client itself is shared per worker)
+            api_key = llm_client.get_api_key()
             if not api_key:
                 logger.error("GOOGLE_API_KEY not configured")
                 return "Error: AI service not configured."
-                
-            genai.configure(api_key=api_key)
-            model_name = getattr(settings, 'GOOGLE_LLM_MODEL', 'gemini-2.5-flash')
-            model = genai.GenerativeModel(model_name)
 
             # 2. Fetch User Assessment
             assessment_text = "Дані оцінювання відсутні."
             preferred_language = DEFAULT_LANGUAGE
             try:
-                assessment = UserAssessment.objects.filter(user=user).latest('created_at')
+                assessment = assessments.get_assessment(user, create=False)
                 if assessment:
                     if assessment.preferred_language:
                         preferred_language = assessment.preferred_language
                     if assessment.answers:
                         formatted_answers = "\n".join([f"- {k}: {v}" for k, v in assessment.answers.items()])
                         assessment_text = f"Дані оцінювання користувача:\n{formatted_answers}"
-            except UserAssessment.DoesNotExist:
-                pass
             except Exception as e:
                 logger.warning(f"Error fetching assessment: {e}")
             
@@ -91,7 +84,7 @@ class ResumeAIService:
             """
 
             # 5. Call Gemini
-            response = model.generate_content(prompt)
+            response = llm_client.generate_content(prompt, operation='resume.summary')
             return response.text.strip()
 
         except Exception as e:
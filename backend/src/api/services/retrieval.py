@@ -0,0 +1,195 @@
+"""
+Persistent knowledge-base retrieval backed by pgvector.
+
+Chunk embeddings are stored in the `knowledge_chunks` table (HNSW index on the
+`embedding` column), so every worker shares the same index and nothing is rebuilt
+at request time. The store and its embeddings client are created once per
+process and reused by every EDUCATION turn.
+
+Retrieval is hybrid: the vector ranking is fused with a full-text ranking by
+reciprocal rank (see `api.services.text_search`), so exact terms such as program
+names still match when the embedding misses them. By default searches are
+answered from a per-process NumPy copy of the chunks (see
+`api.services.vector_index`); KNOWLEDGE_INDEX['SEARCH_BACKEND'] = 'database'
+runs the same fusion as one pgvector + tsvector query instead.
+"""
+from __future__ import annotations
+import threading
+import logging
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.db import connection
+
+from api.services.embeddings import EmbeddingService, create_embedding_service
+from api.services.text_search import RRF_K, build_tsquery
+from api.services.vector_index import get_vector_index
+
+logger = logging.getLogger(__name__)
+
+# Several chunks of one source can match; fetch extra rows and keep the best per source
+CANDIDATE_MULTIPLIER = 4
+
+# Fused score of a passage ranked first by both rankings; relevance is reported relative to it
+_MAX_FUSED_SCORE = 2.0 / (RRF_K + 1)
+
+
+def iter_knowledge_sources(source_type: Optional[str] = None, source_id=None):
+    """Yield KnowledgeDocuments and published Articles as plain dicts, optionally just one source."""
+    from api.models.knowledge import KnowledgeDocument, KnowledgeSourceType
+    from api.models.article import Article
+
+    if source_type in (None, KnowledgeSourceType.DOCUMENT):
+        docs = KnowledgeDocument.objects.all().only('id', 'title', 'raw_text_content', 'source_url')
+        if source_id is not None:
+            docs = docs.filter(id=source_id)
+        for doc in docs:
+            yield {
+                'source_type': KnowledgeSourceType.DOCUMENT,
+                'source_id': doc.id,
+                'title': doc.title,
+                'source_url': doc.source_url or '',
+                'content': doc.raw_text_content,
+            }
+    if source_type in (None, KnowledgeSourceType.ARTICLE):
+        articles = Article.objects.filter(is_published=True).only('id', 'title', 'content', 'slug')
+        if source_id is not None:
+            articles = articles.filter(id=source_id)
+        for article in articles:
+            yield {
+                'source_type': KnowledgeSourceType.ARTICLE,
+                'source_id': article.id,
+                'title': article.title,
+                'source_url': f'/articles/{article.slug}',
+                'content': article.content,
+            }
+
+
+class PgVectorKnowledgeStore:
+    """Top-k hybrid (semantic + full-text) search over `KnowledgeChunk` rows."""
+
+    def __init__(self, embeddings=None):
+        if embeddings is not None and not isinstance(embeddings, EmbeddingService):
+            embeddings = EmbeddingService(embeddings)
+        self._embeddings = embeddings
+        self._lock = threading.Lock()
+
+    def get_embeddings(self) -> Optional[EmbeddingService]:
+        """Return the shared embedding service (Google, or the local stand-in without a key)."""
+        if self._embeddings is None:
+            with self._lock:
+                if self._embeddings is None:
+                    self._embeddings = create_embedding_service()
+        return self._embeddings
+
+    @property
+    def available(self) -> bool:
+        return self.get_embeddings() is not None
+
+    def search(self, query: str, k: int = 3) -> List[Dict[str, Any]]:
+        """
+        Hybrid search for relevant passages.
+
+        Returns at most one passage per source: dicts with title, content (the
+        matched chunk), source, type, start_offset/end_offset into the source
+        text and relevance_score (fused rank score scaled to 0..1).
+        """
+        embeddings = self.get_embeddings()
+        if embeddings is None or not query:
+            return []
+
+        vector = embeddings.embed_query(query)
+        limit = k * CANDIDATE_MULTIPLIER
+        backend = (getattr(settings, 'KNOWLEDGE_INDEX', {}) or {}).get('SEARCH_BACKEND', 'memory')
+        if backend == 'database' and connection.vendor == 'postgresql':
+            rows = self._search_sql(vector, query, limit)
+        else:
+            rows = get_vector_index().search(vector, query, limit)
+
+        results = []
+        seen = set()
+        for source_type, source_id, title, source_url, content, start, end, score in rows:
+            if (source_type, source_id) in seen:
+                continue
+            seen.add((source_type, source_id))
+            results.append({
+                'title': title,
+                'content': content,
+                'source': source_url,
+                'type': source_type,
+                'start_offset': start,
+                'end_offset': end,
+                'relevance_score': min(float(score) / _MAX_FUSED_SCORE, 1.0),
+            })
+            if len(results) == k:
+                break
+        return results
+
+    def _search_sql(self, vector: List[float], query: str, limit: int):
+        from api.models.fields import VectorField
+
+        literal = VectorField.to_literal(vector)
+        tsquery = build_tsquery(query)
+        with connection.cursor() as cursor:
+            # Both candidate lists come from an index: HNSW for the vector
+            # ranking, GIN on search_vector for the full-text ranking.
+            cursor.execute(
+                """
+                WITH semantic AS (
+                    SELECT id, ROW_NUMBER() OVER (ORDER BY embedding <=> %(vector)s::vector) AS rank
+                    FROM (
+                        SELECT id, embedding FROM knowledge_chunks
+                        WHERE embedding IS NOT NULL
+                        ORDER BY embedding <=> %(vector)s::vector
+                        LIMIT %(limit)s
+                    ) nearest
+                ),
+                lexical AS (
+                    SELECT id, ROW_NUMBER() OVER (ORDER BY ts_rank_cd(search_vector, q) DESC) AS rank
+                    FROM knowledge_chunks, to_tsquery('simple', %(tsquery)s) q
+                    WHERE %(tsquery)s <> '' AND search_vector @@ q
+                    ORDER BY ts_rank_cd(search_vector, q) DESC
+                    LIMIT %(limit)s
+                )
+                SELECT c.source_type, c.source_id, c.title, c.source_url, c.content,
+                       c.start_offset, c.end_offset,
+                       COALESCE(1.0 / (%(rrf_k)s + s.rank), 0) + COALESCE(1.0 / (%(rrf_k)s + l.rank), 0) AS score
+                FROM semantic s
+                FULL OUTER JOIN lexical l ON l.id = s.id
+                JOIN knowledge_chunks c ON c.id = COALESCE(s.id, l.id)
+                ORDER BY score DESC
+                LIMIT %(limit)s
+                """,
+                {'vector': literal, 'tsquery': tsquery, 'limit': limit, 'rrf_k': RRF_K},
+            )
+            return cursor.fetchall()
+
+
+def format_rag_context(results: List[Dict[str, Any]]) -> str:
+    """Format search results for LLM context."""
+    if not results:
+        return ""
+
+    context = "\n\nРЕЛЕВАНТНІ МАТЕРІАЛИ З БАЗИ ЗНАНЬ:\n"
+    for i, result in enumerate(results, 1):
+        context += f"\n{i}. [{result['type'].upper()}] {result['title']}\n"
+        context += f"   {result['content']}\n"
+        if result['source']:
+            context += f"   Джерело: {result['source']}\n"
+        context += f"   Релевантність: {result['relevance_score']:.2%}\n"
+
+    return context
+
+
+_store: Optional[PgVectorKnowledgeStore] = None
+_store_lock = threading.Lock()
+
+
+def get_knowledge_store() -> PgVectorKnowledgeStore:
+    """Return the process-wide knowledge store."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = PgVectorKnowledgeStore()
+    return _store
@@ -0,0 +1,203 @@
+"""
+Single-flight coalescing of identical in-flight LLM generations.
+
+A double-submitted message or a client retry produces exactly the same prompt
+while the first generation is still running. `SingleFlight.stream()` (and its
+async twin `astream()`) runs the generation once per prompt fingerprint: the
+first caller becomes the leader and drives the LLM, later callers attach as
+followers and receive the chunks already produced followed by the rest as they
+arrive. Sync and async callers can follow each other's flights.
+
+If the leader stops early (its client disconnected), a follower that has not
+received anything yet starts the generation itself; one that has re-raises
+`FlightAbandoned`. Flights are per process: identical prompts handled by
+different workers are still generated twice.
+"""
+from __future__ import annotations
+import asyncio
+import hashlib
+import threading
+import logging
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class FlightAbandoned(Exception):
+    """The leader of a flight stopped before the generation finished."""
+
+
+def prompt_key(prompt: str, model_name: str = '') -> str:
+    """Fingerprint of an exact prompt (and model)."""
+    return hashlib.sha256(f'{model_name}\x1f{prompt}'.encode('utf-8')).hexdigest()
+
+
+class Flight:
+    """Chunks of one in-flight generation, shared with its followers."""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._cond = threading.Condition()
+        self._async_waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+
+    def _notify(self):
+        # Must be called with the condition held
+        self._cond.notify_all()
+        for loop, event in self._async_waiters:
+            loop.call_soon_threadsafe(event.set)
+        self._async_waiters.clear()
+
+    def publish(self, chunk: str):
+        with self._cond:
+            self.chunks.append(chunk)
+            self._notify()
+
+    def finish(self, error: Optional[BaseException] = None):
+        with self._cond:
+            self.done = True
+            self.error = error
+            self._notify()
+
+    def _take(self, sent: int) -> Tuple[List[str], bool]:
+        # Must be called with the condition held
+        if sent < len(self.chunks):
+            return self.chunks[sent:], False
+        if self.done:
+            if self.error is not None:
+                raise self.error
+            return [], True
+        return [], False
+
+    def follow(self) -> Iterator[str]:
+        sent = 0
+        while True:
+            with self._cond:
+                new, finished = self._take(sent)
+                while not new and not finished:
+                    self._cond.wait()
+                    new, finished = self._take(sent)
+            sent += len(new)
+            yield from new
+            if finished:
+                return
+
+    async def afollow(self) -> AsyncIterator[str]:
+        sent = 0
+        while True:
+            event = None
+            with self._cond:
+                new, finished = self._take(sent)
+                if not new and not finished:
+                    event = asyncio.Event()
+                    self._async_waiters.append((asyncio.get_running_loop(), event))
+            if event is not None:
+                await event.wait()
+                continue
+            sent += len(new)
+            for chunk in new:
+                yield chunk
+            if finished:
+                return
+
+
+class SingleFlight:
+    """Registry of in-flight generations keyed by prompt fingerprint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[str, Flight] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def _join(self, key: str) -> Tuple[Flight, bool]:
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.followers += 1
+                return flight, False
+            flight = self._flights[key] = Flight(key)
+            self.leaders += 1
+            return flight, True
+
+    def _land(self, flight: Flight, error: Optional[BaseException] = None):
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+        flight.finish(error)
+
+    def stream(self, key: str, generate: Callable[[], Iterator[str]]) -> Iterator[str]:
+        """Yield the chunks of `generate()`, sharing one run among concurrent callers with the same key."""
+        while True:
+            flight, leader = self._join(key)
+            if leader:
+                break
+            logger.info('Joined in-flight LLM generation', extra={'flight': key[:12]})
+            received = False
+            try:
+                for chunk in flight.follow():
+                    received = True
+                    yield chunk
+                return
+            except FlightAbandoned:
+                if received:
+                    raise
+
+        try:
+            for chunk in generate():
+                flight.publish(chunk)
+                yield chunk
+        except GeneratorExit:
+            self._land(flight, FlightAbandoned(key))
+            raise
+        except BaseException as e:
+            self._land(flight, e)
+            raise
+        self._land(flight)
+
+    async def astream(self, key: str, generate: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """Async variant of `stream`; `generate` returns an async iterator."""
+        while True:
+            flight, leader = self._join(key)
+            if leader:
+                break
+            logger.info('Joined in-flight LLM generation', extra={'flight': key[:12]})
+            received = False
+            try:
+                async for chunk in flight.afollow():
+                    received = True
+                    yield chunk
+                return
+            except FlightAbandoned:
+                if received:
+                    raise
+
+        try:
+            async for chunk in generate():
+                flight.publish(chunk)
+                yield chunk
+        except (GeneratorExit, asyncio.CancelledError):
+            self._land(flight, FlightAbandoned(key))
+            raise
+        except BaseException as e:
+            self._land(flight, e)
+            raise
+        self._land(flight)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'in_flight': len(self._flights),
+                'leaders': self.leaders,
+                'followers': self.followers,
+            }
+
+
+_flights = SingleFlight()
+
+
+def get_flights() -> SingleFlight:
+    """Return the process-wide single-flight registry."""
+    return _flights
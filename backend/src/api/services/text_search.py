@@ -0,0 +1,83 @@
+"""
+Lexical ranking helpers for hybrid knowledge retrieval.
+
+Postgres ranks with `ts_rank_cd` over the stored `knowledge_chunks.search_vector`
+column (GIN-indexed, 'simple' configuration, see migration 0021); the in-memory
+index uses `BM25Index` over the same title + content text. Either ranking is
+fused with the vector ranking by reciprocal-rank fusion (`rrf_scores`).
+"""
+from __future__ import annotations
+import math
+import re
+from collections import Counter
+from typing import Dict, Hashable, Iterable, List, Sequence
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Standard reciprocal-rank fusion constant; damps the weight of the very top ranks
+RRF_K = 60
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall((text or '').lower())
+
+
+def build_tsquery(text: str) -> str:
+    """OR together the query words as a `to_tsquery('simple', ...)` expression."""
+    return ' | '.join(dict.fromkeys(tokenize(text)))
+
+
+def build_prefix_tsquery(text: str) -> str:
+    """AND together the query words as prefixes ('word:*'), for search-as-you-type matching."""
+    return ' & '.join(f'{token}:*' for token in dict.fromkeys(tokenize(text)))
+
+
+def rrf_scores(rankings: Iterable[Sequence[Hashable]], k: int = RRF_K) -> Dict[Hashable, float]:
+    """Fuse ranked lists: every item scores the sum of 1 / (k + rank) over the lists it appears in."""
+    scores: Dict[Hashable, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, 1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return scores
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of texts, backed by an inverted index."""
+
+    def __init__(self, texts: Sequence[str], k1: float = 1.2, b: float = 0.75):
+        self.k1, self.b = k1, b
+        self.size = len(texts)
+        self.lengths = np.zeros(self.size, dtype=np.float32)
+        self.postings: Dict[str, List[tuple]] = {}
+        for row, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            self.lengths[row] = sum(counts.values())
+            for token, tf in counts.items():
+                self.postings.setdefault(token, []).append((row, tf))
+        self.average_length = float(self.lengths.mean()) if self.size else 0.0
+
+    def rank(self, query: str, limit: int) -> List[int]:
+        """Return up to `limit` row numbers that match `query`, best first."""
+        if not self.size or limit <= 0:
+            return []
+        scores = np.zeros(self.size, dtype=np.float32)
+        matched = False
+        for token in set(tokenize(query)):
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            matched = True
+            idf = math.log(1 + (self.size - len(postings) + 0.5) / (len(postings) + 0.5))
+            rows = np.fromiter((row for row, _ in postings), dtype=np.int64, count=len(postings))
+            tf = np.fromiter((tf for _, tf in postings), dtype=np.float32, count=len(postings))
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[rows] / (self.average_length or 1.0))
+            scores[rows] += idf * tf * (self.k1 + 1) / (tf + norm)
+        if not matched:
+            return []
+
+        hits = np.flatnonzero(scores)
+        if limit < len(hits):
+            hits = hits[np.argpartition(-scores[hits], limit - 1)[:limit]]
+        return hits[np.argsort(-scores[hits])].tolist()
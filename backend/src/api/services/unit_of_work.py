@@ -0,0 +1,136 @@
+"""
+Grouped database writes for the end of a chat turn.
+
+Saving a reply used to be a string of autocommitted statements: the message
+INSERT, the signal's counter UPDATE, `conv.save(last_active_at)`, and in the
+non-streaming path an `assessment.save()` for profile updates parsed from the
+reply. `UnitOfWork` collects those writes and applies them in one transaction
+when the outermost `begin()` block exits: new rows per model with one
+`bulk_create`, instances queued with `save()` through their own `save()` (so
+model logic such as UserAssessment's field sync still runs), and per-row
+field changes merged into one `update()` each.
+
+Code that may run inside a turn calls the module-level `save()`, which defers
+to the current unit of work and saves immediately otherwise. `after_commit()`
+callbacks (history summary, title scheduling) run once the writes are
+committed, outside the transaction, since they may call the LLM.
+
+`QueryCounter` counts the SQL statements a block issues, so the round trips of
+a turn can be logged without DEBUG.
+"""
+from __future__ import annotations
+import contextvars
+import logging
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+_current: contextvars.ContextVar[Optional['UnitOfWork']] = contextvars.ContextVar('unit_of_work', default=None)
+
+
+class UnitOfWork:
+    """Pending inserts, saves and row updates, written together by `commit()`."""
+
+    def __init__(self):
+        self._inserts: Dict[type, List[Any]] = {}
+        self._saves: Dict[int, Any] = {}
+        self._updates: Dict[Tuple[type, Any], Dict[str, Any]] = {}
+        self._callbacks: List[Callable[[], Any]] = []
+
+    def add(self, obj):
+        """Queue a new model instance for a bulk INSERT (signals are not sent)."""
+        self._inserts.setdefault(type(obj), []).append(obj)
+        return obj
+
+    def save(self, instance):
+        """Queue `instance.save()`; an instance queued twice is saved once."""
+        self._saves[id(instance)] = instance
+
+    def update(self, model, pk, **fields):
+        """
+        Queue field changes for one row; later values for a field win.
+
+        Values may be expressions (F(), subqueries) or callables, which are
+        evaluated after the inserts, e.g. to read a generated `created_at`.
+        """
+        self._updates.setdefault((model, pk), {}).update(fields)
+
+    def after_commit(self, func: Callable[[], Any]):
+        self._callbacks.append(func)
+
+    def commit(self):
+        with transaction.atomic():
+            for model, objs in self._inserts.items():
+                model.objects.bulk_create(objs)
+            for instance in self._saves.values():
+                instance.save()
+            for (model, pk), fields in self._updates.items():
+                values = {name: value() if callable(value) else value for name, value in fields.items()}
+                model.objects.filter(pk=pk).update(**values)
+        self._inserts, self._saves, self._updates = {}, {}, {}
+        callbacks, self._callbacks = self._callbacks, []
+        for func in callbacks:
+            try:
+                func()
+            except Exception:
+                logger.exception('Unit of work after-commit callback failed')
+
+
+def current() -> Optional[UnitOfWork]:
+    return _current.get()
+
+
+@contextmanager
+def begin(label: str = '') -> Iterator[UnitOfWork]:
+    """
+    Collect writes until the block exits, then commit them.
+
+    Nested blocks join the outer unit of work, which commits once. Pending
+    writes are discarded if the outermost block raises. The outermost block
+    logs how many SQL statements it issued, commit and callbacks included.
+    """
+    outer = _current.get()
+    if outer is not None:
+        yield outer
+        return
+    writes = UnitOfWork()
+    token = _current.set(writes)
+    with QueryCounter() as queries:
+        try:
+            yield writes
+        finally:
+            _current.reset(token)
+        writes.commit()
+    logger.info('Unit of work committed', extra={'unit_of_work': label, 'db_queries': queries.count})
+
+
+def save(instance):
+    """Save a model instance, deferred to the current unit of work if there is one."""
+    writes = current()
+    if writes is None:
+        instance.save()
+    else:
+        writes.save(instance)
+
+
+class QueryCounter:
+    """Context manager counting the SQL statements executed on the default connection."""
+
+    def __init__(self):
+        self.count = 0
+        self._wrapper = None
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._wrapper = connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._wrapper.__exit__(*exc_info)
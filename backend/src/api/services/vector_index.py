@@ -0,0 +1,184 @@
+"""
+Per-process NumPy index over knowledge chunk embeddings.
+
+The corpus is small (thousands of passages), so top-k cosine search is one
+matmul over a matrix of L2-normalized vectors plus `argpartition`, with no
+database round trip. A BM25 inverted index over the same passages supplies the
+lexical ranking, and both are fused by reciprocal rank. The index is loaded
+lazily on the first search and rebuilt when the index generation changes:
+
+* the indexer calls `bump_generation()` after every write, which invalidates
+  the index in the writing process immediately;
+* other processes notice changes through a cheap (count, newest chunk)
+  signature query, run at most every KNOWLEDGE_INDEX['INDEX_REFRESH_SECONDS'].
+
+With KNOWLEDGE_INDEX['INDEX_DIR'] set, the matrix is saved as a `.npy` file
+and opened memory-mapped, so workers on one host share its pages.
+"""
+from __future__ import annotations
+import hashlib
+import os
+import threading
+import time
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from api.services.text_search import BM25Index, rrf_scores
+
+logger = logging.getLogger(__name__)
+
+_generation = 0
+_generation_lock = threading.Lock()
+
+
+def bump_generation():
+    """Mark the in-process index stale (called after the knowledge index changes)."""
+    global _generation
+    with _generation_lock:
+        _generation += 1
+
+
+def get_index_settings() -> Dict[str, Any]:
+    options = {
+        'INDEX_REFRESH_SECONDS': 5,
+        'INDEX_DIR': None,
+    }
+    options.update(getattr(settings, 'KNOWLEDGE_INDEX', {}) or {})
+    return options
+
+
+def _database_signature() -> str:
+    from django.db.models import Count, Max
+    from api.models.knowledge import KnowledgeChunk
+
+    state = KnowledgeChunk.objects.exclude(embedding__isnull=True).aggregate(
+        count=Count('id'), newest=Max('created_at')
+    )
+    newest = state['newest'].isoformat() if state['newest'] else ''
+    return f"{state['count']}:{newest}"
+
+
+class InMemoryVectorIndex:
+    """Top-k hybrid (cosine + BM25) search over the embedded knowledge chunks."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._matrix: Optional[np.ndarray] = None
+        self._rows: List[Tuple] = []
+        self._bm25: Optional[BM25Index] = None
+        self._generation = -1
+        self._signature: Optional[str] = None
+        self._checked_at = 0.0
+
+    def _is_stale(self) -> bool:
+        if self._matrix is None or self._generation != _generation:
+            return True
+        refresh = float(get_index_settings()['INDEX_REFRESH_SECONDS'])
+        if time.monotonic() - self._checked_at < refresh:
+            return False
+        self._checked_at = time.monotonic()
+        return _database_signature() != self._signature
+
+    def _load(self):
+        from api.models.knowledge import KnowledgeChunk
+
+        generation = _generation
+        signature = _database_signature()
+        chunks = KnowledgeChunk.objects.exclude(embedding__isnull=True).values_list(
+            'source_type', 'source_id', 'title', 'source_url', 'content',
+            'start_offset', 'end_offset', 'embedding',
+        )
+        rows, vectors = [], []
+        dimensions = None
+        for *meta, embedding in chunks:
+            if dimensions is None:
+                dimensions = len(embedding)
+            if len(embedding) != dimensions:
+                # Left over from a different embedding model; skipped until re-indexed
+                continue
+            rows.append(tuple(meta))
+            vectors.append(embedding)
+
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), dimensions or 0)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix /= norms
+        matrix = self._memory_map(matrix, signature)
+        # rows: (source_type, source_id, title, source_url, content, start, end)
+        bm25 = BM25Index([f'{row[2]}\n{row[4]}' for row in rows])
+
+        self._matrix, self._rows, self._bm25 = matrix, rows, bm25
+        self._generation, self._signature = generation, signature
+        self._checked_at = time.monotonic()
+        logger.info('Knowledge vector index loaded', extra={'rows': len(rows), 'dimensions': dimensions})
+
+    @staticmethod
+    def _memory_map(matrix: np.ndarray, signature: str) -> np.ndarray:
+        index_dir = get_index_settings()['INDEX_DIR']
+        if not index_dir or not matrix.size:
+            return matrix
+        name = hashlib.sha256(signature.encode('utf-8')).hexdigest()[:16]
+        path = os.path.join(index_dir, f'knowledge-{name}.npy')
+        if not os.path.exists(path):
+            os.makedirs(index_dir, exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.tmp.npy'
+            np.save(tmp_path, matrix)
+            os.replace(tmp_path, path)
+        return np.load(path, mmap_mode='r')
+
+    def ensure_loaded(self):
+        if self._is_stale():
+            with self._lock:
+                if self._is_stale():
+                    self._load()
+
+    def _vector_ranking(self, matrix: np.ndarray, vector: Sequence[float], limit: int) -> List[int]:
+        query = np.asarray(vector, dtype=np.float32)
+        if not matrix.size or query.shape[0] != matrix.shape[1]:
+            return []
+        norm = float(np.linalg.norm(query))
+        if norm:
+            query = query / norm
+
+        scores = matrix @ query
+        if limit < len(scores):
+            top = np.argpartition(-scores, limit - 1)[:limit]
+        else:
+            top = np.arange(len(scores))
+        return top[np.argsort(-scores[top])].tolist()
+
+    def search(self, vector: Sequence[float], query: str, limit: int) -> List[Tuple]:
+        """
+        Return up to `limit` rows ranked by fused vector + BM25 rank.
+
+        Rows are (source_type, source_id, title, source_url, content,
+        start_offset, end_offset, score), the same shape the SQL search returns.
+        """
+        self.ensure_loaded()
+        matrix, rows, bm25 = self._matrix, self._rows, self._bm25
+        if not rows or limit <= 0:
+            return []
+
+        scores = rrf_scores([
+            self._vector_ranking(matrix, vector, limit),
+            bm25.rank(query, limit),
+        ])
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [rows[i] + (score,) for i, score in ranked]
+
+
+_index: Optional[InMemoryVectorIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_vector_index() -> InMemoryVectorIndex:
+    """Return the process-wide vector index."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = InMemoryVectorIndex()
+    return _index
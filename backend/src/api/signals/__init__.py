@@ -0,0 +1,6 @@
+"""Signal handlers for the `api` app.
+
+Import submodules here so `ApiConfig.ready()` connects every receiver.
+"""
+
+from . import assessment, conversation, knowledge  # noqa: F401
@@ -0,0 +1,14 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.models.user_assesment import UserAssessment
+from api.services import assessments
+
+
+@receiver(post_save, sender=UserAssessment, dispatch_uid='assessment_cache_save')
+@receiver(post_delete, sender=UserAssessment, dispatch_uid='assessment_cache_delete')
+def invalidate_assessment_cache(sender, instance, **kwargs):
+    assessments.invalidate(instance)
+    # Again once committed, in case another request re-cached the old row meanwhile
+    transaction.on_commit(lambda: assessments.invalidate(instance))
@@ -0,0 +1,32 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.models.conversation import Conversation
+from api.models.message import Message
+from api.services.conversation_stats import preview, snapshot_expressions
+
+
+@receiver(post_save, sender=Message, dispatch_uid='message_count_increment')
+def count_new_message(sender, instance, created, **kwargs):
+    # Runs inside Message.save()'s transaction
+    conversation = Conversation.objects.filter(pk=instance.conversation_id)
+    if created:
+        conversation.update(
+            message_count=F('message_count') + 1,
+            last_message_preview=preview(instance.content),
+            last_message_at=instance.created_at,
+        )
+    else:
+        # An edit only changes the snapshot if it is the latest message
+        conversation.filter(last_message_at=instance.created_at).update(last_message_preview=preview(instance.content))
+
+
+@receiver(post_delete, sender=Message, dispatch_uid='message_count_decrement')
+def count_deleted_message(sender, instance, origin=None, **kwargs):
+    # Nothing to maintain when the whole conversation is being deleted
+    if isinstance(origin, Conversation):
+        return
+    Conversation.objects.filter(pk=instance.conversation_id).update(
+        message_count=F('message_count') - 1, **snapshot_expressions(count=False)
+    )
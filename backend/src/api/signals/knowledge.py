@@ -0,0 +1,30 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.models.article import Article
+from api.models.knowledge import KnowledgeDocument, KnowledgeSourceType
+from api.services.knowledge_indexer import KnowledgeIndexer, schedule_source_index
+
+
+@receiver(post_save, sender=KnowledgeDocument, dispatch_uid='knowledge_document_index')
+def index_knowledge_document(sender, instance, **kwargs):
+    schedule_source_index(KnowledgeSourceType.DOCUMENT, instance.id)
+
+
+@receiver(post_save, sender=Article, dispatch_uid='article_index')
+def index_article(sender, instance, **kwargs):
+    # Unpublishing an article removes its chunks; index_source handles both cases
+    schedule_source_index(KnowledgeSourceType.ARTICLE, instance.id)
+
+
+@receiver(post_delete, sender=KnowledgeDocument, dispatch_uid='knowledge_document_unindex')
+def unindex_knowledge_document(sender, instance, **kwargs):
+    source_id = instance.id
+    transaction.on_commit(lambda: KnowledgeIndexer.remove_source(KnowledgeSourceType.DOCUMENT, source_id))
+
+
+@receiver(post_delete, sender=Article, dispatch_uid='article_unindex')
+def unindex_article(sender, instance, **kwargs):
+    source_id = instance.id
+    transaction.on_commit(lambda: KnowledgeIndexer.remove_source(KnowledgeSourceType.ARTICLE, source_id))
@@ -1,6 +1,7 @@
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from api.services.advisor import AdvisorService
+from api.services.llm_client import get_client_registry
 from api.models.user_assesment import UserAssessment, ASSESSMENT_QUESTIONS
 from api.models.conversation import Conversation, ConversationType
 from api.models.message import Message
@@ -16,6 +17,9 @@ class AdvisorServiceTest(TestCase):
             email='adv@example.com', password='pass', first_name='Adv', last_name='User'
         )
         self.conversation = Conversation.objects.create(user=self.user)
+        # Cached clients would otherwise outlive the genai mocks between tests
+        get_client_registry().clear()
+        self.addCleanup(get_client_registry().clear)
 
     def test_process_response_applies_updates_and_saves(self):
         assessment = UserAssessment.objects.create(user=self.user)
@@ -183,7 +187,7 @@ class AdvisorServiceTest(TestCase):
             def generate_content(self, prompt):
                 return DummyResp()
 
-        with patch('api.services.advisor.genai') as mock_genai:
+        with patch('api.services.llm_client.genai') as mock_genai:
             mock_genai.configure.return_value = None
             mock_genai.GenerativeModel = DummyModel
             # Ensure settings key present so code uses genai path
@@ -211,7 +215,7 @@ class AdvisorServiceTest(TestCase):
             def generate_content(self, prompt):
                 return DummyResp()
 
-        with patch('api.services.advisor.genai') as mock_genai:
+        with patch('api.services.llm_client.genai') as mock_genai:
             mock_genai.configure.return_value = None
             mock_genai.GenerativeModel = DummyModel
             old_key = getattr(settings, 'GOOGLE_API_KEY', None)
@@ -61,3 +61,56 @@ class ConversationListSearchTest(TestCase):
 
         self.assertEqual(len(resp_page1.json()), 20)
         self.assertEqual(len(resp_page2.json()), 5)
+
+    def test_list_pages_with_cursor(self):
+        for i in range(5):
+            Conversation.objects.create(user=self.user, title=f"Chat {i}", conv_type=ConversationType.BUSINESS)
+
+        seen = []
+        resp = self.client.get(self.url, {"limit": 2})
+        while True:
+            self.assertEqual(resp.status_code, 200)
+            seen += [item["id"] for item in resp.json()]
+            cursor = resp.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+            self.assertIn("cursor=", resp.headers["Link"])
+            resp = self.client.get(self.url, {"limit": 2, "cursor": cursor})
+
+        expected = Conversation.objects.filter(user=self.user).order_by("-last_active_at", "-id")
+        self.assertEqual(seen, [str(conv.id) for conv in expected])
+
+    def test_list_rejects_invalid_cursor(self):
+        resp = self.client.get(self.url, {"cursor": "not-a-cursor"})
+        self.assertEqual(resp.status_code, 404)
+
+    def test_list_includes_count_and_last_message_preview(self):
+        conv = Conversation.objects.create(user=self.user, title="Preview", conv_type=ConversationType.HIRING)
+        Message.objects.create(conversation=conv, content="Перше повідомлення", is_user=True)
+        Message.objects.create(conversation=conv, content="Остання відповідь " * 20, is_user=False)
+
+        item = self.client.get(self.url).json()[0]
+        self.assertEqual(item["message_count"], 2)
+        self.assertTrue(item["last_message_preview"].startswith("Остання відповідь"))
+        self.assertEqual(len(item["last_message_preview"]), 120)
+
+        # Retrieving a single conversation still includes its messages
+        detail = self.client.get(reverse("conversation-detail", args=[conv.id])).json()
+        self.assertEqual(len(detail["messages"]), 2)
+
+    def test_search_returns_each_conversation_once(self):
+        conv = Conversation.objects.create(user=self.user, title="Angular hiring", conv_type=ConversationType.HIRING)
+        for i in range(3):
+            Message.objects.create(conversation=conv, content=f"Angular question {i}", is_user=True)
+
+        resp = self.client.get(self.url, {"search": "angular"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([item["id"] for item in resp.json()], [str(conv.id)])
+        self.assertIn("search_headline", resp.json()[0])
+        self.assertIsNone(self.client.get(self.url).json()[0]["search_headline"])
+
+    def test_prefix_tsquery_ands_query_words(self):
+        from api.services.text_search import build_prefix_tsquery
+
+        self.assertEqual(build_prefix_tsquery("Angular dev, angular!"), "angular:* & dev:*")
+        self.assertEqual(build_prefix_tsquery("  ' & | "), "")
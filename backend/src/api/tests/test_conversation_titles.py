@@ -6,6 +6,8 @@ from rest_framework import status
 from unittest.mock import patch, MagicMock
 from api.models.conversation import Conversation, ConversationType
 from api.models.message import Message
+from api.services import jobs
+from api.services.conversation_titles import schedule_title
 
 User = get_user_model()
 
@@ -22,6 +24,9 @@ class ConversationTitleTest(TestCase):
         )
         self.client.force_authenticate(user=self.user)
         self.chat_url = reverse('conversation-chat')
+        patcher = patch.dict('django.conf.settings.CONVERSATION_TITLES', {'DELAY_SECONDS': 0})
+        patcher.start()
+        self.addCleanup(patcher.stop)
 
     @patch('api.services.advisor.AdvisorService.get_ai_response')
     def test_default_title_business(self, mock_ai):
@@ -95,12 +100,20 @@ class ConversationTitleTest(TestCase):
         self.client.post(self.chat_url, data)
         
         # Total messages: 2. Should NOT trigger generation.
+        jobs.run_pending()
         mock_gen_title.assert_not_called()
         
         # 2. Add 2nd user message (total 4 messages)
         self.client.post(self.chat_url, data)
         
-        # Total messages: 4. Should TRIGGER generation.
+        # Total messages: 4. Generation is queued, not run in the request
+        mock_gen_title.assert_not_called()
+        jobs.run_pending()
+        mock_gen_title.assert_called_once_with(conv)
+
+        # Once per conversation, even if the title stays default
+        self.client.post(self.chat_url, data)
+        jobs.run_pending()
         mock_gen_title.assert_called_once_with(conv)
 
     @patch('api.services.advisor.AdvisorService.get_ai_response')
@@ -123,6 +136,39 @@ class ConversationTitleTest(TestCase):
         # Add messages until we reach threshold
         self.client.post(self.chat_url, data) # 2 msgs
         self.client.post(self.chat_url, data) # 4 msgs
+        jobs.run_pending()
         
         # Should NOT trigger because title is not default
         mock_gen_title.assert_not_called()
+
+    def test_message_count_is_maintained(self):
+        """Test that the denormalized message counter follows creates and deletes"""
+        conv = Conversation.objects.create(user=self.user, title='Counted')
+        first = Message.objects.create(conversation=conv, content='Привіт', is_user=True)
+        Message.objects.create(conversation=conv, content='Вітаю!', is_user=False)
+        conv.refresh_from_db()
+        self.assertEqual(conv.message_count, 2)
+
+        first.delete()
+        conv.refresh_from_db()
+        self.assertEqual(conv.message_count, 1)
+
+    @patch('api.services.llm_client.get_api_key', return_value='test-key')
+    @patch('api.services.llm_client.generate_content')
+    def test_pending_titles_are_batched_into_one_request(self, mock_generate, mock_key):
+        """Test that conversations due at the same time are titled by a single LLM call"""
+        mock_generate.return_value = MagicMock(
+            parts=[1], text='```json\n{"1": "Кав\'ярня у Львові", "2": "\'Пошук роботи\'"}\n```'
+        )
+        conversations = []
+        for i in range(2):
+            conv = Conversation.objects.create(user=self.user, title='Загальна - новий чат')
+            for j in range(4):
+                Message.objects.create(conversation=conv, content=f'msg {i}.{j}', is_user=j % 2 == 0)
+            self.assertIsNotNone(schedule_title(conv))
+            conversations.append(conv)
+
+        self.assertEqual(jobs.run_pending(), 1)
+        self.assertEqual(mock_generate.call_count, 1)
+        titles = [Conversation.objects.get(id=conv.id).title for conv in conversations]
+        self.assertEqual(titles, ["Кав'ярня у Львові", 'Пошук роботи'])
@@ -5,6 +5,7 @@ from api.models.conversation import Conversation, ConversationType
 from api.models.message import Message
 from api.models.user_assesment import UserAssessment, ASSESSMENT_QUESTIONS
 from api.services.advisor import AdvisorService
+from api.services.llm_client import get_client_registry
 
 User = get_user_model()
 
@@ -249,6 +250,8 @@ class AdvisorServiceGenerationTest(TestCase):
             user=self.user,
             title='Test Conversation'
         )
+        get_client_registry().clear()
+        self.addCleanup(get_client_registry().clear)
 
     def test_generate_initial_message_no_api_key(self):
         """Test initial message generation without API key"""
@@ -269,7 +272,7 @@ class AdvisorServiceGenerationTest(TestCase):
                 os.environ['GOOGLE_API_KEY'] = old_env
             settings.GOOGLE_API_KEY = old_key
 
-    @patch('api.services.advisor.genai')
+    @patch('api.services.llm_client.genai')
     def test_generate_initial_message_with_mock(self, mock_genai):
         """Test initial message generation with mocked API"""
         mock_response = Mock()
@@ -310,7 +313,7 @@ class AdvisorServiceGenerationTest(TestCase):
                 os.environ['GOOGLE_API_KEY'] = old_env
             settings.GOOGLE_API_KEY = old_key
 
-    @patch('api.services.advisor.genai')
+    @patch('api.services.llm_client.genai')
     def test_generate_conversation_title_with_messages(self, mock_genai):
         """Test title generation with message history"""
         # Create some messages
@@ -459,6 +462,8 @@ class AdvisorServiceErrorHandlingTest(TestCase):
             title='Test'
         )
         self.assessment = UserAssessment.objects.create(user=self.user)
+        get_client_registry().clear()
+        self.addCleanup(get_client_registry().clear)
 
     def test_process_response_handles_malformed_json(self):
         """Test that malformed JSON in response is handled gracefully"""
@@ -474,7 +479,7 @@ class AdvisorServiceErrorHandlingTest(TestCase):
         results = AdvisorService._search_knowledge_base(None)
         self.assertIsInstance(results, list)
 
-    @patch('api.services.advisor.genai')
+    @patch('api.services.llm_client.genai')
     def test_get_ai_response_handles_api_errors(self, mock_genai):
         """Test that API errors are handled gracefully"""
         mock_genai.GenerativeModel.side_effect = Exception('API Error')
@@ -493,3 +498,1372 @@ class AdvisorServiceErrorHandlingTest(TestCase):
             self.assertIsInstance(response, str)
         finally:
             settings.GOOGLE_API_KEY = old_key
+
+
+class GeminiClientRegistryTest(TestCase):
+    """Tests for the shared Gemini client registry"""
+
+    def setUp(self):
+        from django.conf import settings
+        self.old_key = getattr(settings, 'GOOGLE_API_KEY', None)
+        settings.GOOGLE_API_KEY = 'test-key'
+        get_client_registry().clear()
+        self.addCleanup(get_client_registry().clear)
+
+    def tearDown(self):
+        from django.conf import settings
+        settings.GOOGLE_API_KEY = self.old_key
+
+    @patch('api.services.llm_client.genai')
+    def test_model_is_built_once_and_reused(self, mock_genai):
+        """Test that repeated calls reuse the configured client"""
+        registry = get_client_registry()
+        first, _ = registry.get_model()
+        second, _ = registry.get_model()
+
+        self.assertIs(first, second)
+        mock_genai.configure.assert_called_once()
+        mock_genai.GenerativeModel.assert_called_once()
+
+    @patch('api.services.llm_client.genai')
+    def test_generation_config_is_part_of_the_key(self, mock_genai):
+        """Test that different generation configs get separate clients"""
+        mock_genai.GenerativeModel.side_effect = lambda *args, **kwargs: Mock()
+        registry = get_client_registry()
+        default_model, _ = registry.get_model()
+        tuned_model, _ = registry.get_model(generation_config={'temperature': 0.3})
+
+        self.assertIsNot(default_model, tuned_model)
+        self.assertEqual(mock_genai.GenerativeModel.call_count, 2)
+        mock_genai.configure.assert_called_once()
+
+    @patch('api.services.llm_client.genai')
+    def test_generate_content_logs_setup_and_llm_time(self, mock_genai):
+        """Test that each call reports setup vs LLM timings"""
+        from api.services import llm_client
+
+        with self.assertLogs('api.services.llm_client', level='INFO') as logs:
+            llm_client.generate_content('Hello', operation='test.op')
+
+        self.assertEqual(logs.records[0].operation, 'test.op')
+        self.assertTrue(hasattr(logs.records[0], 'setup_ms'))
+        self.assertTrue(hasattr(logs.records[0], 'llm_ms'))
+
+
+class AdvisorResponseCacheTest(TestCase):
+    """Tests for the advisor response cache"""
+
+    def setUp(self):
+        from django.conf import settings
+        from api.services.response_cache import get_response_cache
+        self.user = User.objects.create_user(
+            email='cache@example.com',
+            password='testpass123',
+            first_name='Cache',
+            last_name='User'
+        )
+        self.conversation = Conversation.objects.create(
+            user=self.user,
+            title='Hiring',
+            conv_type=ConversationType.HIRING
+        )
+        self.old_key = getattr(settings, 'GOOGLE_API_KEY', None)
+        settings.GOOGLE_API_KEY = 'test-key'
+        self.cache = get_response_cache()
+        self.cache.clear()
+        self.addCleanup(self.cache.clear)
+        get_client_registry().clear()
+        self.addCleanup(get_client_registry().clear)
+
+    def tearDown(self):
+        from django.conf import settings
+        settings.GOOGLE_API_KEY = self.old_key
+
+    def test_lru_eviction_and_ttl(self):
+        """Test that the cache evicts least recently used and expired entries"""
+        from api.services.response_cache import ResponseCache
+        cache = ResponseCache(max_entries=2, ttl_seconds=60)
+        cache.set('a', '1')
+        cache.set('b', '2')
+        cache.get('a')
+        cache.set('c', '3')
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), '1')
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+        expired = ResponseCache(max_entries=2, ttl_seconds=-1)
+        expired.set('a', '1')
+        self.assertIsNone(expired.get('a'))
+
+    def test_fingerprint_normalizes_message(self):
+        """Test that whitespace, case and trailing punctuation do not change the key"""
+        from api.services.response_cache import build_fingerprint
+        first = build_fingerprint('HIRING', 'uk', 'ctx', 'Як написати резюме?')
+        second = build_fingerprint('HIRING', 'uk', 'ctx', '  як   написати резюме ')
+        other_type = build_fingerprint('EDUCATION', 'uk', 'ctx', 'Як написати резюме?')
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other_type)
+
+    @patch('api.services.llm_client.genai')
+    def test_repeated_question_is_served_from_cache(self, mock_genai):
+        """Test that the second identical question skips the LLM"""
+        mock_response = Mock()
+        mock_response.text = 'Почніть з короткого профілю.'
+        mock_response.parts = [1]
+        mock_genai.GenerativeModel.return_value.generate_content.return_value = mock_response
+
+        question = 'Як написати резюме для IT компанії?'
+        first = AdvisorService.get_ai_response(self.user, self.conversation, question)
+        second = AdvisorService.get_ai_response(self.user, self.conversation, question + '  ')
+
+        self.assertEqual(first, second)
+        self.assertEqual(mock_genai.GenerativeModel.return_value.generate_content.call_count, 1)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+    @patch('api.services.llm_client.genai')
+    def test_cached_reply_is_replayed_as_stream(self, mock_genai):
+        """Test that a cached reply is yielded in chunks by the streaming path"""
+        mock_response = Mock()
+        mock_response.text = 'Слово ' * 30
+        mock_response.parts = [1]
+        mock_genai.GenerativeModel.return_value.generate_content.return_value = mock_response
+
+        question = 'Як підготуватися до співбесіди?'
+        full_text = AdvisorService.get_ai_response(self.user, self.conversation, question)
+        chunks = list(AdvisorService.get_ai_response_stream(self.user, self.conversation, question))
+
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(''.join(chunks), full_text)
+        self.assertEqual(mock_genai.GenerativeModel.return_value.generate_content.call_count, 1)
+
+    def test_business_conversations_are_not_cached(self):
+        """Test the per-conversation-type opt-out"""
+        self.conversation.conv_type = ConversationType.BUSINESS
+        key = AdvisorService._response_cache_key(
+            self.conversation, None, 'Як зареєструвати ФОП у 2025 році?'
+        )
+        self.assertIsNone(key)
+
+
+class ConversationHistoryBudgetTest(TestCase):
+    """Tests for token-budgeted history and rolling summaries"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='history@example.com',
+            password='testpass123',
+            first_name='History',
+            last_name='User'
+        )
+        self.conversation = Conversation.objects.create(
+            user=self.user,
+            title='History',
+            conv_type=ConversationType.HIRING
+        )
+
+    def _add_turns(self, count, size=400):
+        for i in range(count):
+            Message.objects.create(
+                conversation=self.conversation,
+                content=f'Повідомлення {i} ' + 'x' * size,
+                is_user=(i % 2 == 0)
+            )
+
+    @patch('django.conf.settings.ADVISOR_HISTORY', {'TOKEN_BUDGET': 300, 'SUMMARY_TOKEN_BUDGET': 100})
+    def test_history_text_stays_within_budget(self):
+        """Test that a long conversation does not blow up the prompt"""
+        from api.services.history import build_history_text, estimate_tokens
+        self._add_turns(30)
+
+        history_text = build_history_text(self.conversation)
+
+        self.assertLessEqual(estimate_tokens(history_text), 300 + 50)
+        self.assertIn('Повідомлення 29', history_text)
+        self.assertNotIn('Повідомлення 0 ', history_text)
+
+    @patch('django.conf.settings.ADVISOR_HISTORY', {'TOKEN_BUDGET': 300, 'MAX_MESSAGE_TOKENS': 100})
+    def test_long_message_is_truncated(self):
+        """Test that a pasted CV is cut down instead of filling the budget"""
+        from api.services.history import build_history_text
+        Message.objects.create(conversation=self.conversation, content='CV ' + 'y' * 5000, is_user=True)
+
+        history_text = build_history_text(self.conversation)
+
+        self.assertIn('[скорочено]', history_text)
+        self.assertLess(len(history_text), 1000)
+
+    @patch('django.conf.settings.ADVISOR_HISTORY', {'TOKEN_BUDGET': 300, 'SUMMARY_TOKEN_BUDGET': 200})
+    def test_rolling_summary_is_updated_incrementally(self):
+        """Test that turns leaving the window are folded into summary_data"""
+        from api.services.history import build_history_text, estimate_tokens, update_rolling_summary
+        self._add_turns(10)
+
+        self.assertTrue(update_rolling_summary(self.conversation))
+        self.conversation.refresh_from_db()
+        state = self.conversation.summary_data['history']
+        first_count = state['summarized_count']
+        self.assertGreater(first_count, 0)
+        self.assertIn('Повідомлення 7', state['summary'])
+        self.assertLessEqual(estimate_tokens(state['summary']), 200)
+
+        # Nothing new fell out of the window, so nothing to do
+        self.assertFalse(update_rolling_summary(self.conversation))
+
+        self._add_turns(4)
+        self.assertTrue(update_rolling_summary(self.conversation))
+        self.conversation.refresh_from_db()
+        self.assertGreater(self.conversation.summary_data['history']['summarized_count'], first_count)
+        self.assertIn('ПІДСУМОК ПОПЕРЕДНЬОЇ РОЗМОВИ', build_history_text(self.conversation))
+
+
+class FakeEmbeddings:
+    """Deterministic bag-of-words embeddings for retrieval tests"""
+
+    VOCABULARY = ['python', 'курси', 'бізнес', 'грант', 'резюме']
+
+    def __init__(self):
+        self.embedded_documents = []
+
+    def _embed(self, text):
+        text = text.lower()
+        return [float(text.count(word)) + 0.01 for word in self.VOCABULARY]
+
+    def embed_documents(self, texts):
+        self.embedded_documents.extend(texts)
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+class KnowledgeStoreTest(TestCase):
+    """Tests for the shared knowledge retrieval store"""
+
+    def setUp(self):
+        from api.models.knowledge import KnowledgeDocument
+        from api.models.article import Article
+        from api.services.retrieval import PgVectorKnowledgeStore
+        KnowledgeDocument.objects.create(title='Курси Python', raw_text_content='Безкоштовні курси python для ветеранів')
+        KnowledgeDocument.objects.create(title='Гранти', raw_text_content='Грант на бізнес для ветеранів, грант до 250 тис.')
+        Article.objects.create(title='Чернетка', slug='draft', content='резюме резюме', is_published=False)
+        self.store = PgVectorKnowledgeStore(embeddings=FakeEmbeddings())
+
+    def test_rebuild_indexes_documents_and_published_articles(self):
+        """Test that unpublished articles are not indexed"""
+        from api.models.article import Article
+        from api.models.knowledge import KnowledgeChunk
+        from api.services.knowledge_indexer import KnowledgeIndexer
+        published = Article.objects.filter(is_published=True).count()
+        stats = KnowledgeIndexer(self.store).sync()
+        self.assertEqual(stats['added'], 2 + published)
+        self.assertFalse(KnowledgeChunk.objects.filter(title='Чернетка').exists())
+        self.assertEqual(KnowledgeChunk.objects.filter(source_type='knowledge_document').count(), 2)
+
+    def test_search_returns_most_similar_chunk_first(self):
+        """Test top-k ordering by cosine similarity"""
+        from api.services.knowledge_indexer import KnowledgeIndexer
+        KnowledgeIndexer(self.store).sync()
+        results = self.store.search('який грант на бізнес?', k=1)
+
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['title'], 'Гранти')
+        self.assertEqual(results[0]['type'], 'knowledge_document')
+        self.assertGreater(results[0]['relevance_score'], 0.5)
+
+    def test_store_without_api_key_uses_local_embeddings(self):
+        """Test that indexing and search work offline with the hashing stand-in"""
+        from django.conf import settings
+        from api.services.embeddings import LOCAL_EMBEDDING_MODEL
+        from api.services.knowledge_indexer import KnowledgeIndexer
+        from api.services.retrieval import PgVectorKnowledgeStore
+        old_key = getattr(settings, 'GOOGLE_API_KEY', None)
+        settings.GOOGLE_API_KEY = None
+        try:
+            store = PgVectorKnowledgeStore()
+            KnowledgeIndexer(store).sync()
+            results = store.search('курси python', k=1)
+        finally:
+            settings.GOOGLE_API_KEY = old_key
+
+        self.assertEqual(store.get_embeddings().model_name, LOCAL_EMBEDDING_MODEL)
+        self.assertEqual(results[0]['title'], 'Курси Python')
+
+
+class EmbeddingServiceTest(TestCase):
+    """Tests for batched, cached embedding computation"""
+
+    def test_documents_are_embedded_in_batches(self):
+        """Test that texts are sent batch_size at a time and order is kept"""
+        from api.services.embeddings import EmbeddingService
+        client = FakeEmbeddings()
+        client.embed_documents = MagicMock(side_effect=lambda texts: [[float(len(t))] for t in texts])
+        service = EmbeddingService(client, batch_size=2)
+
+        vectors = service.embed_documents(['a', 'bb', 'ccc', 'dddd', 'eeeee'])
+
+        self.assertEqual(vectors, [[1.0], [2.0], [3.0], [4.0], [5.0]])
+        self.assertEqual([len(c.args[0]) for c in client.embed_documents.call_args_list], [2, 2, 1])
+
+    def test_query_embeddings_are_cached_by_normalized_text(self):
+        """Test LRU reuse of query embeddings"""
+        from api.services.embeddings import EmbeddingService
+        client = FakeEmbeddings()
+        client.embed_query = MagicMock(side_effect=lambda text: [1.0])
+        service = EmbeddingService(client, cache_size=1)
+
+        service.embed_query('Курси Python?')
+        service.embed_query('  курси   python ')
+        self.assertEqual(client.embed_query.call_count, 1)
+        self.assertEqual(service.stats()['hits'], 1)
+
+        service.embed_query('гранти')
+        service.embed_query('курси python')
+        self.assertEqual(client.embed_query.call_count, 3)
+
+    def test_blob_round_trip(self):
+        """Test float32 and int8 blob encodings"""
+        from api.services.embeddings import from_blob, to_blob
+        vector = [0.5, -0.25, 0.125, 0.0]
+
+        self.assertEqual(from_blob(to_blob(vector, 'float32')).tolist(), vector)
+        packed = to_blob(vector, 'int8')
+        self.assertLess(len(packed), len(to_blob(vector, 'float32')))
+        for restored, original in zip(from_blob(packed), vector):
+            self.assertAlmostEqual(float(restored), original, delta=0.005)
+
+    def test_hashing_embeddings_are_deterministic(self):
+        """Test that the offline stand-in is stable and similarity-preserving"""
+        import numpy as np
+        from api.services.embeddings import HashingEmbeddings
+        embedder = HashingEmbeddings(dimensions=64)
+        query = np.array(embedder.embed_query('курси python'))
+
+        self.assertEqual(query.tolist(), HashingEmbeddings(64).embed_query('курси python'))
+        self.assertGreater(
+            query @ np.array(embedder.embed_query('python курси онлайн')),
+            query @ np.array(embedder.embed_query('грант на бізнес')),
+        )
+
+    def test_indexing_stores_document_embedding_blob(self):
+        """Test that KnowledgeDocument.embedding is filled from its chunks"""
+        from api.models.knowledge import KnowledgeDocument
+        from api.services.embeddings import from_blob
+        from api.services.knowledge_indexer import KnowledgeIndexer
+        from api.services.retrieval import PgVectorKnowledgeStore
+        doc = KnowledgeDocument.objects.create(title='Курси', raw_text_content='курси python')
+
+        KnowledgeIndexer(PgVectorKnowledgeStore(embeddings=FakeEmbeddings())).sync()
+
+        doc.refresh_from_db()
+        vector = from_blob(doc.embedding)
+        self.assertEqual(len(vector), len(FakeEmbeddings.VOCABULARY))
+        self.assertAlmostEqual(float((vector ** 2).sum()), 1.0, places=5)
+
+
+class KnowledgeChunkingTest(TestCase):
+    """Tests for splitting knowledge sources into overlapping passages"""
+
+    def test_split_text_respects_size_overlap_and_offsets(self):
+        """Test that chunks are bounded, overlap and point back into the source"""
+        from api.services.chunking import split_text
+        text = ' '.join(f'Речення номер {i}.' for i in range(60))
+        chunks = split_text(text, chunk_size=120, chunk_overlap=30)
+
+        self.assertGreater(len(chunks), 5)
+        for chunk in chunks:
+            self.assertLessEqual(len(chunk.text), 120)
+            self.assertEqual(text[chunk.start:chunk.end], chunk.text)
+        for previous, current in zip(chunks, chunks[1:]):
+            self.assertLess(current.start, previous.end)
+        self.assertEqual(chunks[-1].end, len(text))
+
+    def test_short_text_is_a_single_chunk(self):
+        """Test that short sources are not split"""
+        from api.services.chunking import split_text
+        self.assertEqual([c.text for c in split_text('  курси python  ')], ['курси python'])
+        self.assertEqual(split_text(''), [])
+
+    def test_search_returns_matching_passage_of_long_document(self):
+        """Test that a long document is indexed as chunks and the matching one is returned"""
+        from api.models.article import Article
+        from api.models.knowledge import KnowledgeChunk, KnowledgeDocument
+        from api.services.knowledge_indexer import KnowledgeIndexer
+        from api.services.retrieval import PgVectorKnowledgeStore
+        Article.objects.all().delete()
+        filler = 'Загальна інформація для ветеранів. ' * 40
+        text = filler + 'Державний грант на власний бізнес до 250 тисяч. ' + filler
+        KnowledgeDocument.objects.create(title='Довідник', raw_text_content=text)
+        store = PgVectorKnowledgeStore(embeddings=FakeEmbeddings())
+
+        with patch('django.conf.settings.KNOWLEDGE_INDEX', {'CHUNK_SIZE': 400, 'CHUNK_OVERLAP': 50}):
+            KnowledgeIndexer(store).sync()
+        results = store.search('грант на бізнес', k=3)
+
+        self.assertGreater(KnowledgeChunk.objects.count(), 3)
+        self.assertEqual(len(results), 1)
+        self.assertIn('грант на власний бізнес', results[0]['content'])
+        self.assertLessEqual(len(results[0]['content']), 400)
+        self.assertEqual(text[results[0]['start_offset']:results[0]['end_offset']], results[0]['content'])
+
+
+class InMemoryVectorIndexTest(TestCase):
+    """Tests for the per-process NumPy knowledge index"""
+
+    def setUp(self):
+        from api.models.article import Article
+        from api.models.knowledge import KnowledgeDocument
+        from api.services.knowledge_indexer import KnowledgeIndexer
+        from api.services.retrieval import PgVectorKnowledgeStore
+        Article.objects.all().delete()
+        KnowledgeDocument.objects.create(title='Курси', raw_text_content='курси python')
+        KnowledgeDocument.objects.create(title='Гранти', raw_text_content='грант на бізнес')
+        self.store = PgVectorKnowledgeStore(embeddings=FakeEmbeddings())
+        self.indexer = KnowledgeIndexer(self.store)
+        self.indexer.sync()
+
+    def test_search_is_served_from_memory_after_first_load(self):
+        """Test that repeated searches do not query the database"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self.store.search('python', k=1)
+
+        with CaptureQueriesContext(connection) as queries:
+            results = self.store.search('грант', k=1)
+
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(results[0]['title'], 'Гранти')
+
+    def test_index_is_rebuilt_when_generation_changes(self):
+        """Test that indexing a new document invalidates the loaded matrix"""
+        from api.models.knowledge import KnowledgeDocument
+        self.assertNotEqual(self.store.search('резюме', k=1)[0]['title'], 'Резюме')
+
+        KnowledgeDocument.objects.create(title='Резюме', raw_text_content='резюме резюме')
+        self.indexer.sync()
+
+        self.assertEqual(self.store.search('резюме', k=1)[0]['title'], 'Резюме')
+
+    def test_top_k_ordering_and_memory_mapped_matrix(self):
+        """Test top-k ordering with the matrix saved to INDEX_DIR"""
+        import tempfile
+        import numpy as np
+        from api.services.vector_index import InMemoryVectorIndex
+        query = FakeEmbeddings().embed_query('грант бізнес')
+        with tempfile.TemporaryDirectory() as index_dir, \
+                patch('django.conf.settings.KNOWLEDGE_INDEX', {'INDEX_DIR': index_dir}):
+            index = InMemoryVectorIndex()
+            rows = index.search(query, 'грант бізнес', limit=1)
+            all_rows = index.search(query, 'грант бізнес', limit=10)
+
+            self.assertIsInstance(index._matrix, np.memmap)
+        self.assertEqual(rows[0][2], 'Гранти')
+        self.assertEqual(len(all_rows), 2)
+        self.assertGreater(all_rows[0][-1], all_rows[1][-1])
+
+
+class HybridRetrievalTest(TestCase):
+    """Tests for BM25 + vector retrieval fused by reciprocal rank"""
+
+    def test_bm25_ranks_rarer_and_more_frequent_terms_higher(self):
+        """Test BM25 ordering and that non-matching rows are excluded"""
+        from api.services.text_search import BM25Index
+        index = BM25Index(['курси python', 'курси python python', 'грант на бізнес', 'курси дизайну'])
+
+        self.assertEqual(index.rank('python', 10), [1, 0])
+        self.assertEqual(index.rank('курси python', 1), [1])
+        self.assertEqual(index.rank('невідоме', 10), [])
+
+    def test_rrf_rewards_items_ranked_by_both_lists(self):
+        """Test reciprocal-rank fusion"""
+        from api.services.text_search import build_tsquery, rrf_scores
+        scores = rrf_scores([['a', 'b', 'c'], ['b', 'd']])
+
+        self.assertEqual(max(scores, key=scores.get), 'b')
+        self.assertEqual(build_tsquery('Курси, python & курси!'), 'курси | python')
+
+    def test_exact_term_matches_even_when_embedding_misses(self):
+        """Test that the full-text half finds terms unknown to the embeddings"""
+        from api.models.article import Article
+        from api.models.knowledge import KnowledgeDocument
+        from api.services.knowledge_indexer import KnowledgeIndexer
+        from api.services.retrieval import PgVectorKnowledgeStore
+        Article.objects.all().delete()
+        KnowledgeDocument.objects.create(title='Курси', raw_text_content='курси python для ветеранів')
+        KnowledgeDocument.objects.create(title='Програма Прометеус', raw_text_content='навчання на платформі Прометеус')
+        store = PgVectorKnowledgeStore(embeddings=FakeEmbeddings())
+        KnowledgeIndexer(store).sync()
+
+        results = store.search('прометеус', k=1)
+
+        self.assertEqual(results[0]['title'], 'Програма Прометеус')
+
+    def test_advisor_keyword_search_uses_hybrid_store(self):
+        """Test that the advisor fallback goes through the ranked store"""
+        with patch('api.services.retrieval.PgVectorKnowledgeStore.search', return_value=[{'title': 'x'}]) as search:
+            results = AdvisorService._search_knowledge_base('курси python')
+
+        search.assert_called_once_with('курси python', k=3)
+        self.assertEqual(results, [{'title': 'x'}])
+
+
+class KnowledgeIndexerTest(TestCase):
+    """Tests for incremental knowledge indexing"""
+
+    def setUp(self):
+        from api.models.article import Article
+        from api.models.knowledge import KnowledgeDocument
+        from api.services.knowledge_indexer import KnowledgeIndexer
+        from api.services.retrieval import PgVectorKnowledgeStore
+        # Start from an empty article table so counts are predictable
+        Article.objects.all().delete()
+        self.doc = KnowledgeDocument.objects.create(title='Курси', raw_text_content='курси python')
+        self.article = Article.objects.create(title='Гранти', slug='grants', content='грант', is_published=True)
+        self.embeddings = FakeEmbeddings()
+        self.indexer = KnowledgeIndexer(PgVectorKnowledgeStore(embeddings=self.embeddings))
+
+    def test_unchanged_sources_are_not_re_embedded(self):
+        """Test that a second sync embeds nothing"""
+        self.assertEqual(self.indexer.sync()['added'], 2)
+        self.embeddings.embedded_documents.clear()
+
+        stats = self.indexer.sync()
+
+        self.assertEqual(stats['unchanged'], 2)
+        self.assertEqual(self.embeddings.embedded_documents, [])
+
+    def test_only_changed_source_is_re_embedded(self):
+        """Test that editing one document re-embeds just that document"""
+        self.indexer.sync()
+        self.embeddings.embedded_documents.clear()
+        self.doc.raw_text_content = 'курси python та резюме'
+        self.doc.save()
+
+        stats = self.indexer.sync()
+
+        self.assertEqual(stats['updated'], 1)
+        self.assertEqual(self.embeddings.embedded_documents, ['Курси\n\nкурси python та резюме'])
+
+    def test_removed_and_unpublished_sources_are_deleted(self):
+        """Test that vectors for deleted or unpublished rows disappear"""
+        from api.models.knowledge import KnowledgeChunk
+        self.indexer.sync()
+        self.article.is_published = False
+        self.article.save()
+        self.doc.delete()
+
+        stats = self.indexer.sync()
+
+        self.assertEqual(stats['removed'], 2)
+        self.assertEqual(KnowledgeChunk.objects.count(), 0)
+
+    def test_save_signal_reindexes_source(self):
+        """Test that saving a document triggers indexing after commit"""
+        from api.models.knowledge import KnowledgeChunk
+        from api.services import knowledge_indexer
+        with patch('django.conf.settings.KNOWLEDGE_INDEX', {'AUTO_INDEX': 'sync'}), \
+                patch.object(knowledge_indexer, 'KnowledgeIndexer', lambda: self.indexer), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.doc.raw_text_content = 'нові курси'
+            self.doc.save()
+
+        self.assertEqual(
+            KnowledgeChunk.objects.get(source_id=self.doc.id).content, 'нові курси'
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.doc.delete()
+        self.assertFalse(KnowledgeChunk.objects.filter(source_id=self.doc.id).exists())
+
+
+class SlowValidationChain:
+    """Fake BusinessValidationChain that records step start/end times"""
+
+    def __init__(self, delay=0.2):
+        import threading
+        self.delay = delay
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def _step(self, name, *args):
+        import time
+        started = time.monotonic()
+        time.sleep(self.delay)
+        with self.lock:
+            self.calls.append((name, started, time.monotonic()))
+        return f'{name}({len(args)})'
+
+    def validate_market(self, idea):
+        return self._step('market', idea)
+
+    def validate_financials(self, idea, market):
+        return self._step('financial', idea, market)
+
+    def validate_skills(self, idea, user_context):
+        return self._step('skills', idea, user_context)
+
+    def validate_risks(self, idea, market, financial, skills):
+        return self._step('risk', idea, market, financial, skills)
+
+    def validate_verdict(self, idea, market, financial, skills, risk):
+        return self._step('verdict', idea, market, financial, skills, risk)
+
+    def stream_step(self, output_key, **inputs):
+        name = 'verdict' if output_key == 'final_verdict' else output_key.split('_')[0]
+        result = self._step(name, *inputs.values())
+        yield result[:len(name)]
+        yield result[len(name):]
+
+
+class ValidationDAGTest(TestCase):
+    """Tests for dependency-aware parallel business validation"""
+
+    def test_independent_steps_run_concurrently(self):
+        """Test that skills runs alongside market and the critical path sets total time"""
+        import time
+        from api.services.business_validation import ValidationDAG
+        chain = SlowValidationChain(delay=0.2)
+
+        started = time.monotonic()
+        results = ValidationDAG(chain).run('кав\'ярня', 'профіль')
+        elapsed = time.monotonic() - started
+
+        self.assertEqual(results['final_verdict'], 'verdict(5)')
+        self.assertEqual(len(chain.calls), 5)
+        # market -> financial -> risk -> verdict; skills overlaps with market
+        self.assertLess(elapsed, 0.2 * 5 - 0.1)
+        spans = {name: (start, end) for name, start, end in chain.calls}
+        self.assertLess(spans['skills'][0], spans['market'][1])
+        self.assertGreaterEqual(spans['risk'][0], max(spans['financial'][1], spans['skills'][1]))
+
+    def test_known_results_are_not_recomputed(self):
+        """Test that stored steps are reused as inputs"""
+        from api.services.business_validation import ValidationDAG
+        chain = SlowValidationChain(delay=0)
+        results = ValidationDAG(chain).run(
+            'ідея', 'профіль',
+            known={'market_analysis': 'ринок', 'financial_analysis': 'фінанси'},
+            targets=['risk_assessment'],
+        )
+
+        self.assertEqual(sorted(name for name, _, _ in chain.calls), ['risk', 'skills'])
+        self.assertEqual(results['risk_assessment'], 'risk(4)')
+
+    def test_failed_dependency_propagates(self):
+        """Test that a failing step fails its dependents instead of hanging"""
+        from api.services.business_validation import ValidationDAG
+        chain = SlowValidationChain(delay=0)
+        chain.validate_market = MagicMock(side_effect=RuntimeError('LLM down'))
+
+        futures = ValidationDAG(chain).submit('ідея', 'профіль', targets=['financial_analysis'])
+
+        with self.assertRaises(RuntimeError):
+            futures['financial_analysis'].result(timeout=5)
+
+
+class BackgroundJobQueueTest(TestCase):
+    """Tests for the database-backed job queue"""
+
+    def setUp(self):
+        from api.services import jobs
+        patcher = patch.dict('django.conf.settings.BACKGROUND_JOBS', {'IN_PROCESS': False, 'RETRY_DELAY_SECONDS': 0})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.calls = []
+
+        @jobs.register('test.echo')
+        def echo(job, report):
+            self.calls.append(job.payload)
+            if job.payload.get('fail'):
+                raise RuntimeError('boom')
+            report('част')
+            report('ина')
+            return job.payload['text']
+
+        self.addCleanup(jobs._handlers.pop, 'test.echo', None)
+
+    def test_enqueue_deduplicates_by_key(self):
+        """Test that a second enqueue with the same key returns the first job"""
+        from api.models.job import BackgroundJob
+        from api.services import jobs
+        first = jobs.enqueue('test.echo', {'text': 'a'}, key='echo:1')
+        second = jobs.enqueue('test.echo', {'text': 'b'}, key='echo:1')
+
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(BackgroundJob.objects.count(), 1)
+
+    def test_run_pending_executes_and_stores_output(self):
+        """Test claim + execute of queued jobs"""
+        from api.models.job import BackgroundJobStatus
+        from api.services import jobs
+        job = jobs.enqueue('test.echo', {'text': 'готово'})
+
+        self.assertEqual(jobs.run_pending(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, BackgroundJobStatus.DONE)
+        self.assertEqual(job.output, 'готово')
+        self.assertEqual(jobs.wait_for(job, timeout=1), 'готово')
+        self.assertEqual(jobs.run_pending(), 0)
+
+    def test_failed_job_is_retried_then_marked_failed(self):
+        """Test retry with attempts and the final failed state"""
+        from api.models.job import BackgroundJobStatus
+        from api.services import jobs
+        job = jobs.enqueue('test.echo', {'fail': True})
+
+        with patch.dict('django.conf.settings.BACKGROUND_JOBS', {'MAX_ATTEMPTS': 2}):
+            jobs.run_pending()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, BackgroundJobStatus.FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(job.error, 'boom')
+        with self.assertRaises(jobs.JobFailed):
+            jobs.wait_for(job, timeout=1)
+
+    def test_expired_lease_is_reclaimed(self):
+        """Test that a job left running by a dead worker is picked up again"""
+        from datetime import timedelta
+        from django.utils import timezone
+        from api.models.job import BackgroundJob, BackgroundJobStatus
+        from api.services import jobs
+        job = jobs.enqueue('test.echo', {'text': 'x'})
+        BackgroundJob.objects.filter(id=job.id).update(
+            status=BackgroundJobStatus.RUNNING, started_at=timezone.now() - timedelta(hours=1)
+        )
+
+        self.assertEqual(jobs.run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, BackgroundJobStatus.DONE)
+
+    def test_stream_output_yields_partial_output_of_running_job(self):
+        """Test that readers see output reported while the job runs"""
+        from api.models.job import BackgroundJob, BackgroundJobStatus
+        from api.services import jobs
+        job = jobs.enqueue('test.echo', {'text': 'x'})
+        BackgroundJob.objects.filter(id=job.id).update(status=BackgroundJobStatus.RUNNING, output='перша ')
+        stream = jobs.stream_output(job, timeout=5)
+
+        self.assertEqual(next(stream), 'перша ')
+        BackgroundJob.objects.filter(id=job.id).update(status=BackgroundJobStatus.DONE, output='перша друга')
+        self.assertEqual(list(stream), ['друга'])
+
+
+class BusinessValidationFlowTest(TestCase):
+    """Tests for background precomputation in the BUSINESS flow"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='biz@example.com', password='testpass123')
+        self.assessment = UserAssessment.objects.create(user=self.user)
+        self.chain = SlowValidationChain(delay=0)
+        for patcher in (
+            patch('api.services.langchain_service.BusinessValidationChain', return_value=self.chain),
+            patch.dict('django.conf.settings.BACKGROUND_JOBS', {'IN_PROCESS': False}),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _turn(self, text):
+        from api.models.conversation import ConversationType
+        prompt, direct = AdvisorService._build_business_prompt(
+            self.user, AdvisorService.SYSTEM_PROMPTS[ConversationType.BUSINESS],
+            self.assessment, '', text,
+        )
+        return direct if direct is None or isinstance(direct, str) else ''.join(direct)
+
+    def _step_names(self):
+        return sorted(name for name, _, _ in self.chain.calls)
+
+    def test_next_step_is_precomputed_and_reused(self):
+        """Test that 'далі' returns the step computed by the background worker"""
+        from api.models.business import BusinessIdea
+        from api.services import business_validation, jobs
+        response = self._turn('Хочу відкрити власну кав\'ярню у Львові')
+        idea = BusinessIdea.objects.get(user=self.user)
+        self.assertIn('Крок 1', response)
+        self.assertEqual(idea.market_analysis, 'market(1)')
+        self.assertIsNotNone(business_validation.find_step_job(idea, 'financial_analysis'))
+        self.assertIsNotNone(business_validation.find_step_job(idea, 'skills_match'))
+
+        # Worker computes the queued steps between turns
+        self.assertEqual(jobs.run_pending(), 2)
+        calls_before = len(self.chain.calls)
+        self.assertIn('Крок 2', self._turn('далі'))
+        self.assertIn('Крок 3', self._turn('далі'))
+        self.assertEqual(len(self.chain.calls), calls_before)
+
+        jobs.run_pending()
+        self.assertIn('Крок 4', self._turn('далі'))
+        # Not precomputed: the queued job is run inline by the request
+        self.assertIn('Фінальний Вердикт', self._turn('далі'))
+
+        idea.refresh_from_db()
+        self.assertEqual(idea.status, 'VALIDATED')
+        self.assertEqual(self._step_names(), ['financial', 'market', 'risk', 'skills', 'verdict'])
+        self.assertIsNone(business_validation.find_step_job(idea, 'risk_assessment'))
+
+    def test_running_step_is_streamed(self):
+        """Test that a step still running in the background is streamed, then stored"""
+        from api.models.business import BusinessIdea
+        from api.models.job import BackgroundJob, BackgroundJobStatus
+        from api.services import business_validation
+        self._turn('Хочу відкрити власну кав\'ярню у Львові')
+        idea = BusinessIdea.objects.get(user=self.user)
+        job = business_validation.find_step_job(idea, 'financial_analysis')
+        BackgroundJob.objects.filter(id=job.id).update(status=BackgroundJobStatus.RUNNING, output='частковий ')
+
+        _, direct = AdvisorService._build_business_prompt(
+            self.user, AdvisorService.SYSTEM_PROMPTS['BUSINESS'], self.assessment, '', 'далі'
+        )
+        self.assertNotIsInstance(direct, str)
+        self.assertIn('Крок 2', next(direct))
+        self.assertEqual(next(direct), 'частковий ')
+        BackgroundJob.objects.filter(id=job.id).update(status=BackgroundJobStatus.DONE, output='частковий аналіз')
+        rest = ''.join(direct)
+
+        self.assertTrue(rest.startswith('аналіз'))
+        idea.refresh_from_db()
+        self.assertEqual(idea.financial_analysis, 'частковий аналіз')
+
+    def test_step_is_streamed_token_by_token(self):
+        """Test that a new idea's market analysis streams before the step finishes"""
+        from api.models.business import BusinessIdea
+        _, direct = AdvisorService._build_business_prompt(
+            self.user, AdvisorService.SYSTEM_PROMPTS['BUSINESS'], self.assessment, '',
+            'Хочу відкрити власну кав\'ярню у Львові'
+        )
+        self.assertNotIsInstance(direct, str)
+        self.assertIn('Крок 1', next(direct))
+        self.assertEqual(next(direct), 'market')
+        idea = BusinessIdea.objects.get(user=self.user)
+        self.assertEqual(idea.market_analysis, '')
+
+        self.assertIn('фінансового аналізу', ''.join(direct))
+        idea.refresh_from_db()
+        self.assertEqual(idea.market_analysis, 'market(1)')
+
+    def test_queued_step_is_generated_inline(self):
+        """Test that a step still waiting in the queue is withdrawn and streamed by the request"""
+        from api.models.business import BusinessIdea
+        from api.services import business_validation
+        self._turn('Хочу відкрити власну кав\'ярню у Львові')
+        idea = BusinessIdea.objects.get(user=self.user)
+
+        chunks = list(business_validation.stream_step(idea, self.chain, 'financial_analysis', ''))
+        self.assertEqual(chunks, ['financial', '(2)'])
+        self.assertIsNone(business_validation.find_step_job(idea, 'financial_analysis'))
+
+
+class ValidationStepStreamTest(TestCase):
+    """Tests for BusinessValidationChain.stream_step"""
+
+    def test_unavailable_chain_yields_placeholder(self):
+        """Test that a chain without LangChain or an API key streams the placeholder text"""
+        from api.services.langchain_service import BusinessValidationChain
+        chain = BusinessValidationChain()
+        chain.available = False
+        self.assertEqual(
+            list(chain.stream_step('skills_match', business_idea='x', user_context='')),
+            ['(LangChain not available — skills match skipped)'],
+        )
+
+
+class CompiledChainCacheTest(TestCase):
+    """Tests for the per-worker LLM client and compiled validation chains"""
+
+    def setUp(self):
+        from django.conf import settings
+        from api.services.langchain_service import clear_chain_cache
+        self.old_key = getattr(settings, 'GOOGLE_API_KEY', None)
+        settings.GOOGLE_API_KEY = 'test-key'
+        clear_chain_cache()
+        self.addCleanup(clear_chain_cache)
+
+    def tearDown(self):
+        from django.conf import settings
+        settings.GOOGLE_API_KEY = self.old_key
+
+    @patch('api.services.langchain_service.LLMChain')
+    @patch('api.services.langchain_service.ChatGoogleGenerativeAI')
+    def test_client_and_chains_are_built_once(self, mock_llm, mock_chain):
+        """Test that new instances and repeated steps reuse the same client and chain"""
+        from api.services.langchain_service import BusinessValidationChain
+        mock_chain.return_value.run.return_value = 'аналіз'
+
+        with self.assertLogs('api.services.langchain_service', level='INFO') as logs:
+            for _ in range(3):
+                self.assertEqual(BusinessValidationChain().validate_market('кав\'ярня'), 'аналіз')
+            BusinessValidationChain().validate_skills('кав\'ярня', 'профіль')
+
+        mock_llm.assert_called_once()
+        self.assertEqual(mock_chain.call_count, 2)
+        self.assertEqual(mock_chain.return_value.run.call_count, 4)
+        self.assertTrue(any('Validation step market_analysis: setup' in line for line in logs.output))
+
+    @patch('api.services.langchain_service.LLMChain')
+    @patch('api.services.langchain_service.ChatGoogleGenerativeAI')
+    def test_key_change_rebuilds_client_and_chains(self, mock_llm, mock_chain):
+        """Test that rotating the API key drops the cached client and chains"""
+        from django.conf import settings
+        from api.services.langchain_service import BusinessValidationChain
+        BusinessValidationChain().validate_market('ідея')
+        settings.GOOGLE_API_KEY = 'rotated-key'
+        BusinessValidationChain().validate_market('ідея')
+
+        self.assertEqual(mock_llm.call_count, 2)
+        self.assertEqual(mock_chain.call_count, 2)
+
+
+class AsyncUtilsTest(TestCase):
+    """Tests for running blocking service code from async views"""
+
+    async def test_iterate_in_thread_yields_items_in_order(self):
+        """Test that a blocking iterator is drained in a worker thread"""
+        import threading
+        from api.services.async_utils import iterate_in_thread
+        loop_thread = threading.get_ident()
+        threads = []
+
+        def produce():
+            for i in range(3):
+                threads.append(threading.get_ident())
+                yield i
+
+        items = [item async for item in iterate_in_thread(produce())]
+        self.assertEqual(items, [0, 1, 2])
+        self.assertNotIn(loop_thread, threads)
+
+    async def test_iterate_in_thread_reraises(self):
+        """Test that an exception raised by the iterator reaches the consumer"""
+        from api.services.async_utils import iterate_in_thread
+
+        def produce():
+            yield 'partial'
+            raise ValueError('boom')
+
+        items = []
+        with self.assertRaises(ValueError):
+            async for item in iterate_in_thread(produce()):
+                items.append(item)
+        self.assertEqual(items, ['partial'])
+
+    async def test_run_in_thread_returns_result(self):
+        """Test that a blocking call's result is awaited"""
+        from api.services.async_utils import run_in_thread
+        self.assertEqual(await run_in_thread(sum, [1, 2, 3]), 6)
+
+
+class SSEWriterTest(TestCase):
+    """Tests for coalesced server-sent event framing"""
+
+    @staticmethod
+    def _chunks(frames):
+        import json
+        return [json.loads(frame[len('data: '):])['chunk'] for frame in frames if frame.startswith('data: ')]
+
+    def test_first_chunk_is_sent_immediately_and_rest_coalesced(self):
+        """Test that tokens after the first are batched up to the size window"""
+        from api.utils.sse import SSEWriter
+        writer = SSEWriter(coalesce_seconds=60, coalesce_chars=10)
+        frames = list(writer.stream(['При', 'віт', ', як ', 'спр', 'ави?']))
+
+        self.assertEqual(self._chunks(frames), ['При', 'віт, як спр', 'ави?'])
+        self.assertEqual(writer.text, 'Привіт, як справи?')
+
+    def test_events_are_utf8_json(self):
+        """Test that non-ASCII text is sent as-is rather than as \\u escapes"""
+        from api.utils.sse import format_event
+        self.assertEqual(format_event({'chunk': 'Крок'}), 'data: {"chunk": "Крок"}\n\n')
+        self.assertEqual(format_event({'error': 'x'}, event='failed'), 'event: failed\ndata: {"error": "x"}\n\n')
+
+    async def test_async_stream_sends_heartbeats_while_idle(self):
+        """Test that a slow source produces heartbeat comments between events"""
+        import asyncio
+        from api.utils.sse import HEARTBEAT, SSEWriter
+
+        async def slow():
+            yield 'перший'
+            await asyncio.sleep(0.25)
+            yield 'другий'
+
+        writer = SSEWriter(coalesce_seconds=0.01, coalesce_chars=100, heartbeat_seconds=0.05)
+        frames = [frame async for frame in writer.astream(slow())]
+
+        self.assertIn(HEARTBEAT, frames)
+        self.assertEqual(self._chunks(frames), ['перший', 'другий'])
+
+    async def test_async_stream_flushes_after_time_window(self):
+        """Test that buffered tokens are sent once the time window passes, before the next token"""
+        import asyncio
+        from api.utils.sse import SSEWriter
+        arrived = []
+
+        async def tokens():
+            yield 'a'
+            yield 'b'
+            await asyncio.sleep(0.3)
+            arrived.append('c')
+            yield 'c'
+
+        writer = SSEWriter(coalesce_seconds=0.05, coalesce_chars=100, heartbeat_seconds=10)
+        frames = []
+        async for frame in writer.astream(tokens()):
+            frames.append((frame, list(arrived)))
+
+        self.assertEqual(self._chunks(f for f, _ in frames), ['a', 'b', 'c'])
+        # 'b' went out on the timer, not when 'c' arrived
+        self.assertEqual(frames[1][1], [])
+
+
+class ChatLockTest(TestCase):
+    """Tests for the shared per-conversation chat lock"""
+
+    def setUp(self):
+        from api.services.chat_lock import get_lock_stats
+        get_lock_stats().clear()
+
+    def test_second_request_is_rejected_until_release(self):
+        """Test that acquire is exclusive and counted as contention"""
+        from api.services.chat_lock import ChatLock, get_lock_stats
+        first, second = ChatLock('conv-1'), ChatLock('conv-1')
+        self.assertTrue(first.acquire())
+        self.assertFalse(second.acquire())
+        self.assertTrue(ChatLock('conv-2').acquire())
+
+        first.release()
+        self.assertTrue(second.acquire())
+        stats = get_lock_stats().stats()
+        self.assertEqual((stats['acquired'], stats['contended'], stats['released']), (3, 1, 1))
+
+    def test_renewal_extends_own_lease_only(self):
+        """Test that a holder whose lease was taken over neither renews nor releases it"""
+        from django.core.cache import cache
+        from api.services.chat_lock import ChatLock, get_lock_stats
+        lock = ChatLock('conv-1')
+        self.assertTrue(lock.acquire())
+        self.assertTrue(lock.renew())
+
+        # Lease expired and another worker took it
+        cache.set(lock.key, 'other-token', timeout=60)
+        self.assertFalse(lock.renew())
+        lock.release()
+        self.assertEqual(cache.get(lock.key), 'other-token')
+        self.assertEqual(get_lock_stats().stats()['lost'], 1)
+
+    def test_renew_if_due_waits_for_interval(self):
+        """Test that renewals are throttled to RENEW_SECONDS"""
+        from api.services.chat_lock import ChatLock, get_lock_stats
+        with patch.dict('django.conf.settings.CHAT_LOCK', {'RENEW_SECONDS': 0}):
+            eager = ChatLock('conv-1')
+        lazy = ChatLock('conv-2')
+        eager.acquire()
+        lazy.acquire()
+
+        self.assertTrue(eager.renew_if_due())
+        self.assertTrue(lazy.renew_if_due())
+        self.assertEqual(get_lock_stats().stats()['renewed'], 1)
+
+
+class SingleFlightTest(TestCase):
+    """Tests for coalescing identical in-flight LLM generations"""
+
+    def _gated_generation(self, gate, calls):
+        def generate():
+            calls.append(1)
+            yield 'Привіт'
+            gate.wait(5)
+            yield ', світе'
+        return generate
+
+    def test_concurrent_callers_share_one_generation(self):
+        """Test that a second caller with the same key attaches to the running stream"""
+        import threading
+        from api.services.single_flight import SingleFlight
+        flights, gate, calls = SingleFlight(), threading.Event(), []
+        generate = self._gated_generation(gate, calls)
+
+        leader = flights.stream('key', generate)
+        self.assertEqual(next(leader), 'Привіт')
+        results = []
+        follower = threading.Thread(target=lambda: results.append(''.join(flights.stream('key', generate))))
+        follower.start()
+        while flights.stats()['followers'] == 0:
+            follower.join(0.01)
+
+        gate.set()
+        self.assertEqual(''.join(leader), ', світе')
+        follower.join(5)
+        self.assertEqual(results, ['Привіт, світе'])
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flights.stats(), {'in_flight': 0, 'leaders': 1, 'followers': 1})
+
+    def test_different_keys_run_separately(self):
+        """Test that only identical fingerprints are coalesced"""
+        from api.services.single_flight import SingleFlight, prompt_key
+        flights = SingleFlight()
+        self.assertNotEqual(prompt_key('a', 'model-1'), prompt_key('a', 'model-2'))
+        self.assertEqual(''.join(flights.stream(prompt_key('a'), lambda: iter(['x']))), 'x')
+        self.assertEqual(''.join(flights.stream(prompt_key('b'), lambda: iter(['y']))), 'y')
+        self.assertEqual(flights.stats()['leaders'], 2)
+
+    async def test_async_follower_attaches_to_sync_leader(self):
+        """Test that an async caller follows a generation driven by a sync caller"""
+        import asyncio
+        import threading
+        from api.services.single_flight import SingleFlight
+        flights, gate, calls = SingleFlight(), threading.Event(), []
+        generate = self._gated_generation(gate, calls)
+
+        leader = flights.stream('key', generate)
+        self.assertEqual(next(leader), 'Привіт')
+
+        async def never_called():
+            raise AssertionError('follower must not generate')
+            yield
+
+        follower = asyncio.ensure_future(self._collect(flights.astream('key', never_called)))
+        await asyncio.sleep(0.05)
+        finisher = threading.Thread(target=lambda: (gate.set(), list(leader)))
+        finisher.start()
+        self.assertEqual(await asyncio.wait_for(follower, 5), 'Привіт, світе')
+        finisher.join(5)
+
+    @staticmethod
+    async def _collect(stream):
+        return ''.join([chunk async for chunk in stream])
+
+    def test_abandoned_leader_fails_partial_followers(self):
+        """Test that a follower with partial output learns the leader stopped"""
+        from api.services.single_flight import FlightAbandoned, SingleFlight
+        flights = SingleFlight()
+        leader = flights.stream('key', lambda: iter(['a', 'b']))
+        self.assertEqual(next(leader), 'a')
+        follower = flights.stream('key', lambda: iter(['fresh']))
+        self.assertEqual(next(follower), 'a')
+
+        leader.close()
+        with self.assertRaises(FlightAbandoned):
+            next(follower)
+        # Nothing in flight any more: the next caller generates again
+        self.assertEqual(''.join(flights.stream('key', lambda: iter(['fresh']))), 'fresh')
+
+
+@patch('api.services.llm_client.get_api_key', return_value='test-key')
+class GreetingPoolTest(TestCase):
+    """Tests for the pre-generated greeting pool"""
+
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(email='greet@example.com', password='pass')
+        self.conversation = Conversation.objects.create(user=self.user, conv_type=ConversationType.HIRING)
+
+    def test_pool_is_refilled_in_background(self, _):
+        """Test that an empty pool gives the fallback now and pooled greetings afterwards"""
+        from api.models.greeting import Greeting
+        from api.services import jobs
+        from api.services.greetings import FALLBACK_GREETING, greeting_for
+
+        with patch.object(AdvisorService, 'generate_greetings', return_value=['Привіт 1', 'Привіт 2']) as generate:
+            self.assertEqual(greeting_for(self.user, self.conversation), FALLBACK_GREETING)
+            jobs.run_pending()
+            generate.assert_called_once_with(ConversationType.HIRING, 'uk', 'Користувач ще не заповнив профіль.', 5)
+            self.assertEqual(Greeting.objects.count(), 2)
+
+            self.assertEqual(greeting_for(self.user, self.conversation), 'Привіт 1')
+            self.assertEqual(Greeting.objects.count(), 1)
+            # The finished refill job does not block the next one
+            jobs.run_pending()
+            self.assertEqual(generate.call_count, 2)
+            self.assertEqual(generate.call_args.args[3], 4)
+
+    def test_pools_are_keyed_by_language_and_profile(self, _):
+        """Test that greetings are only taken from the matching pool"""
+        from api.models.greeting import Greeting
+        from api.services.greetings import greeting_for, profile_bucket
+
+        self.assertEqual(profile_bucket(None), 'new')
+        assessment = UserAssessment.objects.create(
+            user=self.user, answers={'q': 'a'}, preferred_language='en', leadership_experience=True,
+        )
+        self.assertEqual(profile_bucket(assessment), 'leader')
+        Greeting.objects.create(conv_type=ConversationType.HIRING, language='uk', profile_bucket='leader', content='Вітаю')
+        Greeting.objects.create(conv_type=ConversationType.HIRING, language='en', profile_bucket='leader', content='Hello')
+
+        with patch.object(AdvisorService, 'generate_greetings', return_value=[]):
+            self.assertEqual(greeting_for(self.user, self.conversation), 'Hello')
+        self.assertEqual(list(Greeting.objects.values_list('content', flat=True)), ['Вітаю'])
+
+    @patch('api.services.llm_client.generate_content')
+    def test_generate_greetings_parses_json_list(self, mock_generate, _):
+        """Test that several greetings come from one LLM reply"""
+        mock_generate.return_value = Mock(parts=[1], text='```json\n["Привіт!", " ", "Вітаю!", "Зайвий"]\n```')
+        greetings = AdvisorService.generate_greetings(ConversationType.HIRING, 'uk', 'Профіль', 2)
+        self.assertEqual(greetings, ['Привіт!', 'Вітаю!'])
+        self.assertEqual(mock_generate.call_count, 1)
+
+
+class ConversationStatsTest(TestCase):
+    """Tests for the denormalized message count and last-message snapshot"""
+
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(email='stats@example.com', password='pass')
+        self.conversation = Conversation.objects.create(user=self.user, title='Stats')
+
+    def _snapshot(self):
+        self.conversation.refresh_from_db()
+        return (self.conversation.message_count, self.conversation.last_message_preview,
+                self.conversation.last_message_at)
+
+    def test_snapshot_follows_message_writes(self):
+        """Test that creating, editing and deleting messages keep the snapshot current"""
+        first = Message.objects.create(conversation=self.conversation, content='Питання', is_user=True)
+        last = Message.objects.create(conversation=self.conversation, content='Відповідь ' * 30, is_user=False)
+        count, text, at = self._snapshot()
+        self.assertEqual((count, at), (2, last.created_at))
+        self.assertEqual(text, ('Відповідь ' * 30)[:120])
+
+        first.content = 'Змінене питання'
+        first.save()
+        self.assertEqual(self._snapshot()[1], ('Відповідь ' * 30)[:120])
+        last.content = 'Коротка відповідь'
+        last.save()
+        self.assertEqual(self._snapshot()[1], 'Коротка відповідь')
+
+        last.delete()
+        self.assertEqual(self._snapshot(), (1, 'Змінене питання', first.created_at))
+
+    def test_reconcile_repairs_drift(self):
+        """Test that reconcile recomputes only conversations that are out of date"""
+        from django.core.management import call_command
+        from io import StringIO
+        message = Message.objects.create(conversation=self.conversation, content='Привіт', is_user=True)
+        in_sync = Conversation.objects.create(user=self.user, title='In sync')
+        Conversation.objects.filter(pk=self.conversation.pk).update(
+            message_count=7, last_message_preview='', last_message_at=None
+        )
+
+        out = StringIO()
+        call_command('reconcile_conversations', stdout=out)
+        self.assertIn('Reconciled 1 ', out.getvalue())
+        self.assertEqual(self._snapshot(), (1, 'Привіт', message.created_at))
+        in_sync.refresh_from_db()
+        self.assertEqual((in_sync.message_count, in_sync.last_message_at), (0, None))
+
+
+class UnitOfWorkTest(TestCase):
+    """Tests for the grouped end-of-turn writes"""
+
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(email='uow@example.com', password='pass')
+        self.conversation = Conversation.objects.create(user=self.user, title='Turns')
+
+    def test_profile_update_is_deferred_to_the_turn(self):
+        """Test that profile updates parsed from a reply are written when the turn commits"""
+        from api.services import unit_of_work
+        from api.views.conversation import finish_turn
+        assessment = UserAssessment.objects.create(user=self.user, answers={})
+
+        with unit_of_work.begin():
+            text = AdvisorService._process_response(assessment, 'Дякую!\n```json\n{"updates": {"rank": "сержант"}}\n```')
+            self.assertEqual(UserAssessment.objects.get(pk=assessment.pk).answers, {})
+            ai_msg = finish_turn(self.conversation, text)
+            self.assertFalse(Message.objects.filter(pk=ai_msg.pk).exists())
+
+        self.assertEqual(UserAssessment.objects.get(pk=assessment.pk).answers, {'rank': 'сержант'})
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.message_count, 1)
+        self.assertEqual(self.conversation.last_message_preview, 'Дякую!')
+        self.assertEqual(self.conversation.last_message_at, Message.objects.get(pk=ai_msg.pk).created_at)
+
+    def test_failed_turn_writes_nothing(self):
+        """Test that pending writes are discarded when the turn raises"""
+        from api.services import unit_of_work
+        with self.assertRaises(RuntimeError):
+            with unit_of_work.begin() as writes:
+                writes.add(Message(conversation=self.conversation, content='Втрачено', is_user=False))
+                raise RuntimeError('LLM failed')
+        self.assertFalse(Message.objects.exists())
+
+    def test_turn_round_trips_do_not_grow_with_history(self):
+        """Test that saving a reply costs the same number of queries however long the chat is"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from api.views.conversation import finish_turn
+
+        counts = []
+        for _ in range(2):
+            for i in range(5):
+                Message.objects.create(conversation=self.conversation, content=f'msg {i}', is_user=i % 2 == 0)
+            with CaptureQueriesContext(connection) as queries:
+                finish_turn(self.conversation, 'Відповідь')
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertLessEqual(counts[1], 6)
+
+
+class AssessmentCacheTest(TestCase):
+    """Tests for the cached assessment lookups"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='cache@example.com', password='pass')
+
+    def test_lookup_is_memoized_per_request_user(self):
+        """Test that repeated lookups on the same user object query once"""
+        from api.services import assessments
+        assessment = assessments.get_assessment(self.user)
+        with self.assertNumQueries(0):
+            self.assertIs(assessments.get_assessment(self.user), assessment)
+        self.assertEqual(UserAssessment.objects.filter(user=self.user).count(), 1)
+
+    def test_lookup_without_create(self):
+        """Test that create=False returns None and creates nothing"""
+        from api.services import assessments
+        self.assertIsNone(assessments.get_assessment(self.user, create=False))
+        self.assertFalse(UserAssessment.objects.exists())
+
+    def test_saving_another_copy_drops_request_memo(self):
+        """Test that saving a different instance of the assessment invalidates the memo"""
+        from api.services import assessments
+        memoized = assessments.get_assessment(self.user)
+        other = UserAssessment.objects.get(pk=memoized.pk)
+        other.user = self.user
+        other.preferred_language = 'en'
+        other.save()
+
+        fresh = assessments.get_assessment(self.user)
+        self.assertIsNot(fresh, memoized)
+        self.assertEqual(fresh.preferred_language, 'en')
+
+    def test_shared_cache_between_requests(self):
+        """Test that a new request reuses the cached assessment until it is saved"""
+        from django.test import override_settings
+        from api.services import assessments
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with override_settings(CACHES=locmem, ASSESSMENT_CACHE={'TTL_SECONDS': 30}):
+            assessment = assessments.get_assessment(self.user)
+            with self.assertNumQueries(0):
+                cached = assessments.get_assessment(User(pk=self.user.pk))
+            self.assertEqual(cached.pk, assessment.pk)
+
+            assessment.preferred_language = 'en'
+            assessment.save()
+            with self.assertNumQueries(1):
+                reloaded = assessments.get_assessment(User(pk=self.user.pk))
+            self.assertEqual(reloaded.preferred_language, 'en')
+
+    def test_context_memoized_until_saved(self):
+        """Test that the formatted context is rebuilt only after the assessment is saved"""
+        assessment = UserAssessment.objects.create(user=self.user, answers={'current_goals': 'Робота'})
+        with patch.object(AdvisorService, '_build_assessment_context', return_value='profile v1') as build:
+            AdvisorService._format_assessment_context(assessment)
+            self.assertEqual(AdvisorService._format_assessment_context(assessment), 'profile v1')
+            self.assertEqual(build.call_count, 1)
+
+            assessment.save()
+            build.return_value = 'profile v2'
+            self.assertEqual(AdvisorService._format_assessment_context(assessment), 'profile v2')
+            self.assertEqual(build.call_count, 2)
@@ -1,4 +1,5 @@
-from django.test import TestCase
+from django.test import AsyncClient, TestCase, TransactionTestCase
+from django.db import IntegrityError, transaction
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from rest_framework.test import APIClient
@@ -191,10 +192,39 @@ class ConversationViewsTest(TestCase):
         )
         other_conv = Conversation.objects.create(user=other_user, title='Other Conv')
         url = reverse('conversation-detail', kwargs={'pk': other_conv.id})
-        
+
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
+    def test_messages_are_paged_from_newest(self):
+        """Test that message history loads newest first and pages both ways by cursor"""
+        conv = Conversation.objects.create(user=self.user, title='Long Conv')
+        for i in range(7):
+            Message.objects.create(conversation=conv, content=f'msg {i}', is_user=i % 2 == 0)
+        expected = [str(m.id) for m in conv.messages.order_by('created_at', 'id')]
+        url = reverse('conversation-messages', kwargs={'pk': conv.id})
+
+        response = self.client.get(url, {'limit': 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([m['id'] for m in response.data], expected[-3:])
+        self.assertNotIn('X-Next-Cursor', response.headers)
+
+        older = self.client.get(url, {'limit': 3, 'cursor': response.headers['X-Previous-Cursor']})
+        self.assertEqual([m['id'] for m in older.data], expected[1:4])
+        oldest = self.client.get(url, {'limit': 3, 'cursor': older.headers['X-Previous-Cursor']})
+        self.assertEqual([m['id'] for m in oldest.data], expected[:1])
+        self.assertNotIn('X-Previous-Cursor', oldest.headers)
+
+        newer = self.client.get(url, {'limit': 3, 'cursor': oldest.headers['X-Next-Cursor']})
+        self.assertEqual([m['id'] for m in newer.data], expected[1:4])
+
+    def test_messages_of_other_user_conversation_not_found(self):
+        """Test that another user's message history is not exposed"""
+        other_user = User.objects.create_user(email='other@example.com', password='testpass123')
+        other_conv = Conversation.objects.create(user=other_user, title='Other Conv')
+        response = self.client.get(reverse('conversation-messages', kwargs={'pk': other_conv.id}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_unauthenticated_cannot_access_conversations(self):
         """Test that unauthenticated users cannot access conversations"""
         self.client.force_authenticate(user=None)
@@ -312,6 +342,76 @@ class ConversationChatViewTest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
+class AsyncChatStreamViewTest(TransactionTestCase):
+    """Tests for the async (ASGI) chat streaming endpoint"""
+
+    def setUp(self):
+        from rest_framework_simplejwt.tokens import AccessToken
+        self.user = User.objects.create_user(
+            email='stream@example.com',
+            password='testpass123',
+            first_name='Stream',
+            last_name='User'
+        )
+        self.client = AsyncClient()
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+        self.url = reverse('conversation-chat-stream')
+
+    async def _post(self, data, headers=None):
+        import json
+        return await self.client.post(
+            self.url, json.dumps(data), content_type='application/json',
+            headers=self.headers if headers is None else headers,
+        )
+
+    async def test_requires_authentication(self):
+        """Test that the async stream rejects anonymous requests"""
+        response = await self._post({'content': 'Hello'}, headers={})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_missing_content(self):
+        """Test that content is required"""
+        response = await self._post({})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def test_locked_conversation_is_rejected(self):
+        """Test that a conversation with a reply in progress returns 429"""
+        from api.services.chat_lock import ChatLock
+        conv = await Conversation.objects.acreate(user=self.user, title='Busy Conv')
+        lock = ChatLock(conv.id)
+        self.assertTrue(await lock.aacquire())
+        response = await self._post({'conversation_id': str(conv.id), 'content': 'Hello'})
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        await lock.arelease()
+
+    async def test_other_user_conversation(self):
+        """Test that another user's conversation is not found"""
+        other = await User.objects.acreate(email='other-stream@example.com')
+        conv = await Conversation.objects.acreate(user=other, title='Other Conv')
+        response = await self._post({'conversation_id': str(conv.id), 'content': 'Hello'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @patch('api.services.advisor.AdvisorService.generate_conversation_title')
+    async def test_streams_chunks_and_stores_messages(self, mock_title):
+        """Test that chunks are sent as SSE events and both turns are stored"""
+        async def fake_stream(user, conv, content, file_content=None):
+            yield 'Привіт, '
+            yield 'світе'
+
+        conv = await Conversation.objects.acreate(user=self.user, title='Test Conv')
+        with patch('api.services.advisor.AdvisorService.aget_ai_response_stream', side_effect=fake_stream):
+            response = await self._post({'conversation_id': str(conv.id), 'content': 'Hello, AI!'})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            body = ''.join([chunk.decode('utf-8') async for chunk in response.streaming_content])
+
+        self.assertIn('"chunk"', body)
+        self.assertIn('event: done', body)
+        contents = [m async for m in Message.objects.filter(conversation=conv).order_by('created_at')
+                    .values_list('is_user', 'content')]
+        self.assertEqual(contents, [(True, 'Hello, AI!'), (False, 'Привіт, світе')])
+
+
 class HealthCheckViewTest(TestCase):
     """Tests for the health check view"""
     
@@ -392,12 +492,13 @@ class UserAssessmentIntegrationTest(TestCase):
         self.assertEqual(assessment.user, self.user)
         self.assertIsNotNone(assessment.to_llm_context())
 
-    def test_multiple_assessments_per_user(self):
-        """Test that a user can have multiple assessments"""
-        assessment1 = UserAssessment.objects.create(user=self.user)
-        assessment2 = UserAssessment.objects.create(user=self.user)
-        
-        self.assertEqual(self.user.assessments.count(), 2)
+    def test_one_assessment_per_user(self):
+        """Test that a user cannot have a second assessment"""
+        UserAssessment.objects.create(user=self.user)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            UserAssessment.objects.create(user=self.user)
+
+        self.assertEqual(self.user.assessments.count(), 1)
 
     def test_assessment_cascade_delete(self):
         """Test that deleting a user deletes their assessments"""
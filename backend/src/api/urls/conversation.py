@@ -1,10 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from api.views.conversation import ConversationViewSet
+from api.views.chat_stream import ChatStreamView
 
 router = DefaultRouter()
 router.register(r'conversations', ConversationViewSet, basename='conversation')
 
 urlpatterns = [
+    path('conversations/chat/stream/', ChatStreamView.as_view(), name='conversation-chat-stream'),
     path('', include(router.urls)),
 ]
@@ -0,0 +1,169 @@
+"""
+Keyset (seek) pagination that keeps list responses plain JSON arrays.
+
+DRF's CursorPagination wraps results in an envelope, but the frontend expects
+the list endpoints to return arrays. `KeysetPagination` orders by a unique
+key (e.g. `(-last_active_at, -id)`) and fetches the rows after the last row of
+the previous page with an index range scan (`WHERE (a, b) < (x, y)`) instead
+of an OFFSET that reads and discards every earlier row. Cursors work in both
+directions: the next page's cursor is returned in `X-Next-Cursor`, the
+previous page's in `X-Previous-Cursor`, and both in a `Link` header
+(`rel="next"` / `rel="prev"`).
+
+With `start_from_end`, the first page is the last rows of the ordering (e.g.
+the newest messages of a chat, still returned oldest first), and clients page
+backwards from there.
+
+Without a `cursor`, the legacy `page` parameter still works (as an offset), so
+existing page-numbered clients keep working.
+"""
+from __future__ import annotations
+import base64
+import json
+from typing import Any, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _reversed(ordering: Sequence[str]) -> Tuple[str, ...]:
+    return tuple(term[1:] if term.startswith('-') else f'-{term}' for term in ordering)
+
+
+class KeysetPagination(BasePagination):
+    # Must end with a unique field so the key is a total order; terms may
+    # name annotations (e.g. a search rank) as well as model fields
+    ordering: Sequence[str] = ('-created_at', '-id')
+    start_from_end = False
+    page_size = getattr(settings, 'DEFAULT_PAGE_SIZE', 20)
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    page_query_param = 'page'
+    invalid_cursor_message = 'Invalid cursor'
+
+    @staticmethod
+    def _key_fields(ordering: Sequence[str]) -> List[Tuple[str, bool]]:
+        """(field name, descending) per ordering term."""
+        return [(term.lstrip('-'), term.startswith('-')) for term in ordering]
+
+    def get_page_size(self, request) -> int:
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_page_number(self, request) -> int:
+        try:
+            return max(1, int(request.query_params.get(self.page_query_param, 1)))
+        except ValueError:
+            return 1
+
+    def encode_cursor(self, row, reverse: bool = False) -> str:
+        """Cursor for the rows after `row` (or before it, with `reverse`)."""
+        values = []
+        for name, _ in self._key_fields(self.ordering):
+            value = getattr(row, name)
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            elif not isinstance(value, (int, float)):
+                value = str(value)
+            values.append(value)
+        payload = json.dumps({'key': values, 'reverse': reverse})
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, cursor: str, model) -> Tuple[List[Any], bool]:
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            values = payload['key']
+            fields = self._key_fields(self.ordering)
+            if not isinstance(values, list) or len(values) != len(fields):
+                raise ValueError(cursor)
+            key = [self._to_python(model, name, value) for (name, _), value in zip(fields, values)]
+            return key, bool(payload.get('reverse'))
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def _to_python(model, name: str, value):
+        try:
+            return model._meta.get_field(name).to_python(value)
+        except FieldDoesNotExist:
+            # An annotation (e.g. a search rank); stored in the cursor as JSON
+            return value
+
+    def _after(self, values: Sequence[Any], ordering: Sequence[str]) -> Q:
+        """Rows strictly after the key `values` in `ordering`: a < x OR (a = x AND b < y) ..."""
+        condition = Q()
+        fields = self._key_fields(ordering)
+        for position, (name, descending) in enumerate(fields):
+            terms = {prev: values[i] for i, (prev, _) in enumerate(fields[:position])}
+            terms[f"{name}__{'lt' if descending else 'gt'}"] = values[position]
+            condition |= Q(**terms)
+        return condition
+
+    def _seek(self, queryset, key, reverse: bool, size: int) -> Tuple[List[Any], bool]:
+        """Up to `size` rows after `key` (before it, with `reverse`), in `ordering`, and whether more follow."""
+        ordering = _reversed(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if key is not None:
+            queryset = queryset.filter(self._after(key, ordering))
+        rows = list(queryset[:size + 1])
+        more = len(rows) > size
+        rows = rows[:size]
+        return (rows[::-1] if reverse else rows), more
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        size = self.get_page_size(request)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            key, reverse = self.decode_cursor(cursor, queryset.model)
+            rows, more = self._seek(queryset, key, reverse, size)
+            has_previous, has_next = (more, True) if reverse else (True, more)
+        elif self.start_from_end:
+            rows, has_previous = self._seek(queryset, None, True, size)
+            has_next = False
+        else:
+            offset = (self.get_page_number(request) - 1) * size
+            rows = list(queryset.order_by(*self.ordering)[offset:offset + size + 1])
+            has_previous, has_next = offset > 0, len(rows) > size
+            rows = rows[:size]
+
+        self.next_cursor: Optional[str] = self.encode_cursor(rows[-1]) if rows and has_next else None
+        self.previous_cursor: Optional[str] = self.encode_cursor(rows[0], reverse=True) if rows and has_previous else None
+        return rows
+
+    def _link(self, cursor: Optional[str]) -> Optional[str]:
+        if cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_next_link(self) -> Optional[str]:
+        return self._link(self.next_cursor)
+
+    def get_previous_link(self) -> Optional[str]:
+        return self._link(self.previous_cursor)
+
+    def get_paginated_response(self, data):
+        headers, links = {}, []
+        if self.next_cursor is not None:
+            headers['X-Next-Cursor'] = self.next_cursor
+            links.append(f'<{self.get_next_link()}>; rel="next"')
+        if self.previous_cursor is not None:
+            headers['X-Previous-Cursor'] = self.previous_cursor
+            links.append(f'<{self.get_previous_link()}>; rel="prev"')
+        if links:
+            headers['Link'] = ', '.join(links)
+        return Response(data, headers=headers)
+
+    def get_paginated_response_schema(self, schema):
+        return schema
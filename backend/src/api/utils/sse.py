@@ -0,0 +1,140 @@
+"""
+Server-sent event framing for streamed chat replies.
+
+LLM streams arrive as many tiny tokens. `SSEWriter` keeps the whole reply in a
+list buffer (joined once, at the end) and batches tokens into one
+`data: {"chunk": ...}` event per STREAMING['COALESCE_CHARS'] characters or
+STREAMING['COALESCE_SECONDS'], so a reply costs a handful of `json.dumps` calls
+and socket writes instead of one per token. The first chunk is always sent
+immediately to keep time-to-first-token unchanged.
+
+The async stream (`astream`) also sends a `: ping` comment after
+STREAMING['HEARTBEAT_SECONDS'] without output, so proxies don't drop a
+connection that is waiting on a slow step. A blocking iterator can't be
+interrupted while it waits, so the sync stream (`stream`) only coalesces.
+"""
+from __future__ import annotations
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+
+HEARTBEAT = ': ping\n\n'
+DONE = 'event: done\ndata: {}\n\n'
+
+
+def get_stream_settings() -> Dict[str, Any]:
+    options = {
+        'COALESCE_SECONDS': 0.05,
+        'COALESCE_CHARS': 200,
+        'HEARTBEAT_SECONDS': 15,
+    }
+    options.update(getattr(settings, 'STREAMING', {}) or {})
+    return options
+
+
+def format_event(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    payload = json.dumps(data, ensure_ascii=False)
+    if event:
+        return f'event: {event}\ndata: {payload}\n\n'
+    return f'data: {payload}\n\n'
+
+
+def event_stream_response(stream) -> StreamingHttpResponse:
+    """Wrap an iterator of SSE frames (sync or async) in a non-buffered response."""
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Tell nginx not to buffer the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+class SSEWriter:
+    """Turns a stream of text chunks into coalesced SSE `chunk` events."""
+
+    def __init__(self, coalesce_seconds: Optional[float] = None, coalesce_chars: Optional[int] = None,
+                 heartbeat_seconds: Optional[float] = None):
+        options = get_stream_settings()
+        self.coalesce_seconds = float(options['COALESCE_SECONDS'] if coalesce_seconds is None else coalesce_seconds)
+        self.coalesce_chars = int(options['COALESCE_CHARS'] if coalesce_chars is None else coalesce_chars)
+        self.heartbeat_seconds = float(options['HEARTBEAT_SECONDS'] if heartbeat_seconds is None else heartbeat_seconds)
+        self.parts: List[str] = []
+        self._pending: List[str] = []
+        self._pending_chars = 0
+        self._pending_since = 0.0
+        self._sent_any = False
+
+    @property
+    def text(self) -> str:
+        """Everything pushed so far."""
+        return ''.join(self.parts)
+
+    def push(self, chunk: str) -> Optional[str]:
+        """Buffer a chunk; returns an event when the coalescing window is full."""
+        if not chunk:
+            return None
+        self.parts.append(chunk)
+        if not self._pending:
+            self._pending_since = time.monotonic()
+        self._pending.append(chunk)
+        self._pending_chars += len(chunk)
+        if (not self._sent_any
+                or self._pending_chars >= self.coalesce_chars
+                or time.monotonic() - self._pending_since >= self.coalesce_seconds):
+            return self.flush()
+        return None
+
+    def flush(self) -> Optional[str]:
+        """Return an event with the buffered chunks, or None if nothing is pending."""
+        if not self._pending:
+            return None
+        frame = format_event({'chunk': ''.join(self._pending)})
+        self._pending.clear()
+        self._pending_chars = 0
+        self._sent_any = True
+        return frame
+
+    def _wait_timeout(self) -> float:
+        if self._pending:
+            return max(0.0, self._pending_since + self.coalesce_seconds - time.monotonic())
+        return self.heartbeat_seconds
+
+    def stream(self, chunks: Iterable[str]):
+        """Yield coalesced events for a blocking iterator of chunks."""
+        for chunk in chunks:
+            frame = self.push(chunk)
+            if frame:
+                yield frame
+        frame = self.flush()
+        if frame:
+            yield frame
+
+    async def astream(self, chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+        """Yield coalesced events for an async iterator, flushing on time and sending heartbeats while idle."""
+        iterator = chunks.__aiter__()
+        pending = None
+        try:
+            while True:
+                if pending is None:
+                    pending = asyncio.ensure_future(iterator.__anext__())
+                done, _ = await asyncio.wait({pending}, timeout=self._wait_timeout())
+                if not done:
+                    yield self.flush() or HEARTBEAT
+                    continue
+                next_chunk, pending = pending, None
+                try:
+                    chunk = next_chunk.result()
+                except StopAsyncIteration:
+                    break
+                frame = self.push(chunk)
+                if frame:
+                    yield frame
+        finally:
+            if pending is not None:
+                pending.cancel()
+        frame = self.flush()
+        if frame:
+            yield frame
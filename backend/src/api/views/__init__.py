@@ -1,6 +1,7 @@
 from .auth import SignUpView, LoginView, LogoutView, RefreshView, CreateAdminView, MeView, CsrfView
 from .articles import ArticleViewSet
 from .conversation import ConversationViewSet
+from .chat_stream import ChatStreamView
 from .file import UploadedFileViewSet
 from .resume import ResumeViewSet
 from .business import BusinessIdeaViewSet
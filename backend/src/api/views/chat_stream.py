@@ -0,0 +1,130 @@
+"""
+Async chat endpoint for ASGI deployments (config/asgi.py).
+
+`ConversationViewSet.chat?stream=1` holds a worker thread for the whole LLM
+stream. `ChatStreamView` speaks the same request/SSE contract, but awaits the
+async ORM and the async Gemini client (`AdvisorService.aget_ai_response_stream`),
+so a single event loop can hold many concurrent streams. Blocking work that has
+no async counterpart (prompt building, end-of-turn bookkeeping) runs in the
+thread pool via `api.services.async_utils`.
+"""
+import json
+import logging
+
+from django.core.exceptions import ValidationError
+from django.http import JsonResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.settings import api_settings
+
+from api.models.conversation import Conversation, ConversationType
+from api.models.file import UploadedFile
+from api.services.advisor import AdvisorService
+from api.services.async_utils import run_in_thread
+from api.services.chat_lock import ChatLock
+from api.utils.sse import DONE as SSE_DONE, SSEWriter, event_stream_response, format_event
+from api.views.conversation import finish_turn, record_user_message
+
+logger = logging.getLogger(__name__)
+
+
+def _authenticate(request):
+    """Return the user authenticated by the DRF authentication classes (cookie or header JWT), or None."""
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        result = authentication_class().authenticate(request)
+        if result is not None:
+            return result[0]
+    return None
+
+
+def _read_file(user, file_id):
+    try:
+        uploaded_file = UploadedFile.objects.get(id=file_id, user=user)
+        with uploaded_file.file.open('rb') as f:
+            return f.read().decode('utf-8', errors='ignore')
+    except Exception as e:
+        logger.warning(f"File {file_id} error: {e}")
+        return None
+
+
+class ChatStreamView(View):
+    """POST a user message and stream the AI reply as server-sent events."""
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # Authenticated by JWT like the DRF views, which are CSRF-exempt as well
+        view.csrf_exempt = True
+        return view
+
+    async def post(self, request):
+        try:
+            user = await run_in_thread(_authenticate, request)
+        except AuthenticationFailed as e:
+            return JsonResponse({'detail': str(e.detail)}, status=status.HTTP_401_UNAUTHORIZED)
+        if user is None:
+            return JsonResponse(
+                {'detail': 'Authentication credentials were not provided.'},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse({'detail': 'invalid JSON body'}, status=status.HTTP_400_BAD_REQUEST)
+
+        conversation_id = data.get('conversation_id')
+        content = data.get('content')
+        file_id = data.get('file_id')
+
+        if not content:
+            return JsonResponse({'detail': 'content is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        file_content = await run_in_thread(_read_file, user, file_id) if file_id else None
+
+        if conversation_id:
+            try:
+                conv = await Conversation.objects.aget(id=conversation_id, user=user)
+            except (Conversation.DoesNotExist, ValidationError):
+                return JsonResponse({'detail': 'conversation not found'}, status=status.HTTP_404_NOT_FOUND)
+        else:
+            conv_type = data.get('conv_type', '')
+            type_label = dict(ConversationType.choices).get(conv_type, 'Загальна')
+            conv = await Conversation.objects.acreate(
+                user=user,
+                title=data.get('title') or f"{type_label} - новий чат",
+                conv_type=conv_type,
+            )
+
+        # Locking mechanism
+        lock = ChatLock(conv.id)
+        if not await lock.aacquire():
+            return JsonResponse({'detail': 'Processing previous request'}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+
+        try:
+            regenerate = bool(data.get('regenerate') and conversation_id)
+            content = await run_in_thread(record_user_message, conv, content, regenerate)
+        except Exception as e:
+            await lock.arelease()
+            logger.exception("Unexpected error in async chat view")
+            return JsonResponse({'detail': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        async def event_stream():
+            writer = SSEWriter()
+            try:
+                ai_stream = AdvisorService.aget_ai_response_stream(user, conv, content, file_content)
+                async for frame in writer.astream(ai_stream):
+                    # Heartbeats keep the lease renewed through long silent steps
+                    await lock.arenew_if_due()
+                    yield frame
+                yield SSE_DONE
+            except Exception as e:
+                logger.exception("Error during async streaming")
+                yield (writer.flush() or '') + format_event({"error": str(e)})
+            finally:
+                await lock.arelease()
+                if writer.parts:
+                    await run_in_thread(finish_turn, conv, writer.text)
+
+        return event_stream_response(event_stream())
@@ -4,18 +4,52 @@ from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from django.utils import timezone
 from django.conf import settings
-from django.http import StreamingHttpResponse
+from django.db.models import F
 from api.renderers.event_stream import EventStreamRenderer
-from django.core.cache import cache
 import os
-import json
 import logging
 
 from api.models.conversation import Conversation, ConversationType
 from api.models.message import Message
 from api.models.file import UploadedFile
-from api.serializers.conversation import ConversationSerializer
+from api.serializers.conversation import ConversationListSerializer, ConversationSerializer
 from api.serializers.message import MessageSerializer
+from api.services import conversation_search, conversation_stats, unit_of_work
+from api.services.chat_lock import ChatLock
+from api.utils.pagination import KeysetPagination
+from api.utils.sse import DONE as SSE_DONE, SSEWriter, event_stream_response, format_event
+
+
+class ConversationPagination(KeysetPagination):
+    ordering = ('-last_active_at', '-id')
+
+
+class ConversationSearchPagination(KeysetPagination):
+    """Search results, most relevant first."""
+    ordering = ('-search_rank', '-last_active_at', '-id')
+
+
+class ConversationSearchFilter(filters.BaseFilterBackend):
+    """`?search=` over titles and message contents (see api/services/conversation_search.py)."""
+    search_param = 'search'
+
+    @classmethod
+    def get_search_query(cls, request) -> str:
+        return request.query_params.get(cls.search_param, '').strip()
+
+    def filter_queryset(self, request, queryset, view):
+        query = self.get_search_query(request)
+        if not query:
+            return queryset
+        return conversation_search.search(queryset, query)
+
+
+class MessagePagination(KeysetPagination):
+    """Chronological message pages; the first page is the newest messages."""
+    ordering = ('created_at', 'id')
+    start_from_end = True
+    page_size = 50
+    max_page_size = 200
 
 
 class ConversationViewSet(viewsets.ModelViewSet):
@@ -26,8 +60,8 @@ class ConversationViewSet(viewsets.ModelViewSet):
     """
     serializer_class = ConversationSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['title', 'messages__content']
+    filter_backends = [ConversationSearchFilter]
+    pagination_class = ConversationPagination
 
     def get_queryset(self):
         """Only return conversations owned by the authenticated user."""
@@ -37,11 +71,35 @@ class ConversationViewSet(viewsets.ModelViewSet):
         conv_type = self.request.query_params.get('type')
         if conv_type:
             queryset = queryset.filter(conv_type=conv_type)
-            
+
         return queryset
 
+    @property
+    def paginator(self):
+        """Search results are paged in relevance order, everything else by recent activity."""
+        if not hasattr(self, '_paginator'):
+            searching = self.action == 'list' and ConversationSearchFilter.get_search_query(self.request)
+            self._paginator = ConversationSearchPagination() if searching else self.pagination_class()
+        return self._paginator
+
+    def list(self, request, *args, **kwargs):
+        """List conversations; search results also carry a highlighted matching fragment."""
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        context = self.get_serializer_context()
+        query = ConversationSearchFilter.get_search_query(request)
+        if query:
+            context['headlines'] = conversation_search.headlines([conv.id for conv in page], query)
+        serializer = ConversationListSerializer(page, many=True, context=context)
+        return self.get_paginated_response(serializer.data)
+
+    def get_serializer_class(self):
+        """The list returns lightweight rows; messages are only loaded for a single conversation."""
+        if self.action == 'list':
+            return ConversationListSerializer
+        return ConversationSerializer
+
     def perform_create(self, serializer):
-        """Create a conversation owned by the requesting user with optional initial AI message."""
+        """Create a conversation owned by the requesting user with a pooled initial AI message."""
         conv = serializer.save(user=self.request.user)
         
         # Ensure default title if not set
@@ -50,12 +108,11 @@ class ConversationViewSet(viewsets.ModelViewSet):
             conv.title = f"{type_label} - новий чат"
             conv.save(update_fields=['title'])
 
-        # If the new conversation has no messages, ask the LLM to generate an initial assistant message
+        # Start with a pre-generated greeting instead of waiting for the LLM
         try:
-            from api.services.advisor import AdvisorService
+            from api.services.greetings import greeting_for
 
-            # Generate a starter assistant message
-            initial_text = AdvisorService.generate_initial_message(self.request.user, conv)
+            initial_text = greeting_for(self.request.user, conv)
             if initial_text:
                 Message.objects.create(conversation=conv, content=initial_text, is_user=False)
         except Exception:
@@ -63,6 +120,20 @@ class ConversationViewSet(viewsets.ModelViewSet):
             logger = logging.getLogger(__name__)
             logger.exception('Failed to generate initial assistant message during conversation creation')
 
+    @action(detail=True, methods=['get'])
+    def messages(self, request, pk=None):
+        """
+        Page through a conversation's messages, oldest first.
+
+        Without a cursor, returns the newest `limit` messages; the
+        X-Previous-Cursor header loads older ones (and X-Next-Cursor newer
+        ones), so clients can lazy-load history while scrolling.
+        """
+        conv = self.get_object()
+        paginator = MessagePagination()
+        page = paginator.paginate_queryset(conv.messages.all(), request, view=self)
+        return paginator.get_paginated_response(MessageSerializer(page, many=True).data)
+
     def perform_destroy(self, instance):
         """Delete conversation with logging."""
         logger = logging.getLogger(__name__)
@@ -112,36 +183,13 @@ class ConversationViewSet(viewsets.ModelViewSet):
             )
 
         # Locking mechanism
-        lock_id = f"chat_lock_{conv.id}"
-        if cache.get(lock_id):
+        lock = ChatLock(conv.id)
+        if not lock.acquire():
             return Response({'detail': 'Processing previous request'}, status=status.HTTP_429_TOO_MANY_REQUESTS)
-        
-        cache.set(lock_id, "true", timeout=60)
 
         try:
-            # Regeneration logic
             regenerate = request.data.get('regenerate', False)
-            if regenerate and conversation_id:
-                try:
-                    last_msg = conv.messages.order_by('-created_at').first()
-                    if last_msg and not last_msg.is_user:
-                        last_msg.delete()
-                        last_msg = conv.messages.order_by('-created_at').first()
-                    
-                    if last_msg and last_msg.is_user:
-                        # If content is provided and different, update the message
-                        if content and content != last_msg.content:
-                            last_msg.content = content
-                            last_msg.save(update_fields=['content'])
-                        
-                        # Use the (potentially updated) content
-                        content = last_msg.content
-                    else:
-                        Message.objects.create(conversation=conv, content=content, is_user=True)
-                except Exception:
-                    Message.objects.create(conversation=conv, content=content, is_user=True)
-            else:
-                Message.objects.create(conversation=conv, content=content, is_user=True)
+            content = record_user_message(conv, content, bool(regenerate and conversation_id))
 
             # Streaming check
             stream = request.GET.get('stream') or request.data.get('stream')
@@ -151,63 +199,100 @@ class ConversationViewSet(viewsets.ModelViewSet):
 
             if is_streaming:
                 def event_stream():
-                    full_ai_text = ""
+                    writer = SSEWriter()
                     try:
                         ai_generator = AdvisorService.get_ai_response_stream(user, conv, content, file_content)
-                        for chunk in ai_generator:
-                            full_ai_text += chunk
-                            payload = json.dumps({"chunk": chunk})
-                            yield f"data: {payload}\n\n"
-                        yield "event: done\n"
-                        yield "data: {}\n\n"
+                        for frame in writer.stream(ai_generator):
+                            lock.renew_if_due()
+                            yield frame
+                        yield SSE_DONE
                     except Exception as e:
                         logger.exception("Error during streaming")
-                        payload = json.dumps({"error": str(e)})
-                        yield f"data: {payload}\n\n"
+                        yield (writer.flush() or '') + format_event({"error": str(e)})
                     finally:
-                        cache.delete(lock_id)
-                        if full_ai_text:
-                            ai_msg = Message.objects.create(conversation=conv, content=full_ai_text, is_user=False)
-                            conv.last_active_at = timezone.now()
-                            conv.save(update_fields=('last_active_at',))
-                            self._generate_title_if_needed(conv)
+                        lock.release()
+                        if writer.parts:
+                            finish_turn(conv, writer.text)
                 
-                return StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+                return event_stream_response(event_stream())
 
             else:
-                # Non-streaming
-                try:
-                    ai_text = AdvisorService.get_ai_response(user, conv, content, file_content)
-                except Exception as e:
-                    ai_text = f"(Помилка LLM) {str(e)}"
-                
-                ai_msg = Message.objects.create(conversation=conv, content=ai_text, is_user=False)
-                conv.last_active_at = timezone.now()
-                conv.save(update_fields=('last_active_at',))
-                self._generate_title_if_needed(conv)
+                # Non-streaming; profile updates parsed from the reply are saved with it
+                with unit_of_work.begin('chat.turn'):
+                    try:
+                        ai_text = AdvisorService.get_ai_response(user, conv, content, file_content)
+                    except Exception as e:
+                        ai_text = f"(Помилка LLM) {str(e)}"
+
+                    ai_msg = finish_turn(conv, ai_text)
                 
                 # Release lock before return
-                cache.delete(lock_id)
+                lock.release()
                 
                 serializer = MessageSerializer(ai_msg)
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         except Exception as e:
-            cache.delete(lock_id)
+            lock.release()
             logger.exception("Unexpected error in chat view")
             return Response({'detail': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-    def _generate_title_if_needed(self, conv):
-        try:
-            from api.services.advisor import AdvisorService
-            msg_count = conv.messages.count()
-            is_default_title = (
-                not conv.title or 
-                conv.title == 'Нова розмова' or 
-                conv.title.endswith(' - новий чат')
-            )
-            if msg_count >= 2 and is_default_title:
-                AdvisorService.generate_conversation_title(conv)
-        except Exception:
-            pass
 
+def record_user_message(conv, content, regenerate=False):
+    """
+    Store the user's turn and return the text to answer.
+
+    When regenerating, the last assistant reply is dropped and the last user
+    message is reused (updated if `content` differs).
+    """
+    if not regenerate:
+        Message.objects.create(conversation=conv, content=content, is_user=True)
+        return content
+    try:
+        last_msg = conv.messages.order_by('-created_at').first()
+        if last_msg and not last_msg.is_user:
+            last_msg.delete()
+            last_msg = conv.messages.order_by('-created_at').first()
+        
+        if last_msg and last_msg.is_user:
+            # If content is provided and different, update the message
+            if content and content != last_msg.content:
+                last_msg.content = content
+                last_msg.save(update_fields=['content'])
+            
+            # Use the (potentially updated) content
+            return last_msg.content
+        Message.objects.create(conversation=conv, content=content, is_user=True)
+    except Exception:
+        Message.objects.create(conversation=conv, content=content, is_user=True)
+    return content
+
+
+def finish_turn(conv, ai_text):
+    """
+    Store the assistant reply, refresh the history summary and queue a title if one is due.
+
+    The reply and the conversation's counters are written in one transaction
+    (joining the caller's unit of work, if any); the summary and title run
+    after it commits.
+    """
+    from api.services.advisor import AdvisorService
+    from api.services.conversation_titles import schedule_title
+
+    def after_turn():
+        AdvisorService.update_history_summary(conv)
+        schedule_title(conv)
+
+    with unit_of_work.begin('chat.turn') as writes:
+        conv.last_active_at = timezone.now()
+        ai_msg = writes.add(Message(conversation=conv, content=ai_text, is_user=False))
+        # bulk_create skips the Message signals, so the counters are updated here
+        writes.update(
+            Conversation, conv.pk,
+            message_count=F('message_count') + 1,
+            last_message_preview=conversation_stats.preview(ai_text),
+            last_message_at=lambda: ai_msg.created_at,
+            last_active_at=conv.last_active_at,
+        )
+        writes.after_commit(after_turn)
+    return ai_msg
@@ -1,7 +1,8 @@
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
-from api.models.user_assesment import UserAssessment, LANGUAGE_CHOICES, DEFAULT_LANGUAGE
+from api.models.user_assesment import LANGUAGE_CHOICES
 from api.serializers.user_assessment import UserAssessmentSerializer
+from api.services import assessments
 
 
 # Valid language codes for validation
@@ -15,11 +16,7 @@ class UserAssessmentSettingsView(generics.RetrieveUpdateAPIView):
 
     def get_object(self):
         """Get or create assessment for the current user."""
-        assessment, _ = UserAssessment.objects.get_or_create(
-            user=self.request.user,
-            defaults={'preferred_language': DEFAULT_LANGUAGE}
-        )
-        return assessment
+        return assessments.get_assessment(self.request.user)
 
     def patch(self, request, *args, **kwargs):
         """Update only specific settings fields."""
@@ -176,6 +176,126 @@ GOOGLE_API_KEY = read_secret('GOOGLE_API_KEY', file_path=os.environ.get('GOOGLE_
 # Prefer setting `GOOGLE_LLM_MODEL` in your environment to a supported model
 # from the API's ListModels output. A good default for modern runtimes is:
 GOOGLE_LLM_MODEL = os.environ.get('GOOGLE_LLM_MODEL', 'models/gemini-2.5-flash')
+# Optional transport for the google-generativeai SDK ('grpc' or 'rest'). The client is
+# configured once per worker (see api/services/llm_client.py) so either transport
+# keeps its connection alive between requests.
+GOOGLE_LLM_TRANSPORT = os.environ.get('GOOGLE_LLM_TRANSPORT') or None
+# In-process advisor response cache (see api/services/response_cache.py). Replies are keyed
+# on conversation type, language, assessment context and the normalized user message.
+# BUSINESS is opted out by default because its replies drive the stateful validation flow.
+ADVISOR_RESPONSE_CACHE = {
+    'ENABLED': os.environ.get('ADVISOR_RESPONSE_CACHE_ENABLED', '1') in ('1', 'true', 'True'),
+    'MAX_ENTRIES': int(os.environ.get('ADVISOR_RESPONSE_CACHE_MAX_ENTRIES', 512)),
+    'TTL_SECONDS': int(os.environ.get('ADVISOR_RESPONSE_CACHE_TTL_SECONDS', 3600)),
+    'MIN_MESSAGE_CHARS': int(os.environ.get('ADVISOR_RESPONSE_CACHE_MIN_MESSAGE_CHARS', 20)),
+    'DISABLED_CONV_TYPES': [
+        t for t in os.environ.get('ADVISOR_RESPONSE_CACHE_DISABLED_TYPES', 'BUSINESS').split(',') if t
+    ],
+}
+# Conversation history budget for advisor prompts (see api/services/history.py). Turns that
+# no longer fit TOKEN_BUDGET are folded into a rolling summary in Conversation.summary_data.
+# SUMMARY_MODE is 'extractive' (no extra LLM call) or 'llm'.
+ADVISOR_HISTORY = {
+    'TOKEN_BUDGET': int(os.environ.get('ADVISOR_HISTORY_TOKEN_BUDGET', 1500)),
+    'SUMMARY_TOKEN_BUDGET': int(os.environ.get('ADVISOR_HISTORY_SUMMARY_TOKEN_BUDGET', 400)),
+    'MAX_MESSAGE_TOKENS': int(os.environ.get('ADVISOR_HISTORY_MAX_MESSAGE_TOKENS', 500)),
+    'SUMMARY_MODE': os.environ.get('ADVISOR_HISTORY_SUMMARY_MODE', 'extractive'),
+}
+# Business validation steps (api/services/business_validation.py) run on a pool of
+# MAX_WORKERS threads. With SPECULATE on, the next step is queued as a background
+# job as soon as the current one is saved; a reveal waits at most STEP_TIMEOUT
+# seconds for a running job before computing the step itself.
+BUSINESS_VALIDATION = {
+    'MAX_WORKERS': int(os.environ.get('BUSINESS_VALIDATION_MAX_WORKERS', 4)),
+    'SPECULATE': os.environ.get('BUSINESS_VALIDATION_SPECULATE', '1') in ('1', 'true', 'True'),
+    'STEP_TIMEOUT': int(os.environ.get('BUSINESS_VALIDATION_STEP_TIMEOUT', 120)),
+}
+# Database-backed job queue (api/services/jobs.py). IN_PROCESS runs a worker thread
+# in every web process; set it off when `manage.py run_jobs` workers are deployed.
+# Batch job kinds take up to BATCH_SIZE runnable jobs per handler call.
+BACKGROUND_JOBS = {
+    'IN_PROCESS': os.environ.get('BACKGROUND_JOBS_IN_PROCESS', '1') in ('1', 'true', 'True'),
+    'POLL_SECONDS': float(os.environ.get('BACKGROUND_JOBS_POLL_SECONDS', 1)),
+    'MAX_ATTEMPTS': int(os.environ.get('BACKGROUND_JOBS_MAX_ATTEMPTS', 3)),
+    'LEASE_SECONDS': int(os.environ.get('BACKGROUND_JOBS_LEASE_SECONDS', 300)),
+    'BATCH_SIZE': int(os.environ.get('BACKGROUND_JOBS_BATCH_SIZE', 10)),
+}
+# Conversation titles (api/services/conversation_titles.py) are generated in the
+# background once a conversation has AFTER_MESSAGES messages; jobs wait
+# DELAY_SECONDS so titles that become due together share one LLM request.
+CONVERSATION_TITLES = {
+    'AFTER_MESSAGES': int(os.environ.get('CONVERSATION_TITLES_AFTER_MESSAGES', 4)),
+    'DELAY_SECONDS': float(os.environ.get('CONVERSATION_TITLES_DELAY_SECONDS', 5)),
+}
+# Pool of pre-generated first messages for new conversations
+# (api/services/greetings.py), kept at POOL_SIZE per conversation type,
+# language and profile bucket by background refill jobs.
+GREETINGS = {
+    'ENABLED': os.environ.get('GREETINGS_ENABLED', '1') in ('1', 'true', 'True'),
+    'POOL_SIZE': int(os.environ.get('GREETINGS_POOL_SIZE', 5)),
+}
+# Shared cache, used for the per-conversation chat lock (api/services/chat_lock.py),
+# so it must be visible to every worker: Redis when REDIS_URL is set (needs the
+# `redis` package), otherwise a table in the main database (`createcachetable`).
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+        }
+    }
+# User assessments (api/services/assessments.py) are loaded once per request; with
+# TTL_SECONDS > 0 they are also kept that long in the shared cache. That only saves
+# a query when the cache is Redis, so it is off by default with the database cache.
+# Formatted prompt context is memoized per assessment version, CONTEXT_MAX_ENTRIES
+# entries per worker.
+ASSESSMENT_CACHE = {
+    'TTL_SECONDS': int(os.environ.get('ASSESSMENT_CACHE_TTL_SECONDS', 30 if os.environ.get('REDIS_URL') else 0)),
+    'CONTEXT_MAX_ENTRIES': int(os.environ.get('ASSESSMENT_CACHE_CONTEXT_MAX_ENTRIES', 1024)),
+}
+# A chat request holds its conversation's lock as a TTL_SECONDS lease, renewed
+# every RENEW_SECONDS while the reply streams.
+CHAT_LOCK = {
+    'TTL_SECONDS': int(os.environ.get('CHAT_LOCK_TTL_SECONDS', 60)),
+    'RENEW_SECONDS': float(os.environ.get('CHAT_LOCK_RENEW_SECONDS', 20)),
+}
+# Server-sent event streams of chat replies (api/utils/sse.py). Tokens are batched
+# into one event until COALESCE_CHARS characters or COALESCE_SECONDS have
+# accumulated; idle streams send a comment every HEARTBEAT_SECONDS so proxies keep
+# the connection open.
+STREAMING = {
+    'COALESCE_SECONDS': float(os.environ.get('STREAMING_COALESCE_SECONDS', 0.05)),
+    'COALESCE_CHARS': int(os.environ.get('STREAMING_COALESCE_CHARS', 200)),
+    'HEARTBEAT_SECONDS': float(os.environ.get('STREAMING_HEARTBEAT_SECONDS', 15)),
+}
+# Knowledge-base indexing (api/services/knowledge_indexer.py). AUTO_INDEX controls how
+# KnowledgeDocument/Article saves update the index: 'async' (background thread after
+# commit), 'sync' (inline after commit) or 'off' (only `manage.py index_knowledge`).
+# Sources are split into CHUNK_SIZE-character passages overlapping by CHUNK_OVERLAP.
+# Chunks are embedded EMBEDDING_BATCH_SIZE texts per API call; the last
+# QUERY_CACHE_SIZE query embeddings are reused. Document vectors are stored as
+# 'float32' or 'int8' blobs (EMBEDDING_STORAGE).
+# SEARCH_BACKEND 'memory' answers searches from a per-process NumPy matrix,
+# re-checked against the database every INDEX_REFRESH_SECONDS and memory-mapped
+# from INDEX_DIR when set; 'database' queries pgvector directly.
+KNOWLEDGE_INDEX = {
+    'AUTO_INDEX': os.environ.get('KNOWLEDGE_AUTO_INDEX', 'async'),
+    'CHUNK_SIZE': int(os.environ.get('KNOWLEDGE_CHUNK_SIZE', 1000)),
+    'CHUNK_OVERLAP': int(os.environ.get('KNOWLEDGE_CHUNK_OVERLAP', 150)),
+    'EMBEDDING_BATCH_SIZE': int(os.environ.get('KNOWLEDGE_EMBEDDING_BATCH_SIZE', 100)),
+    'QUERY_CACHE_SIZE': int(os.environ.get('KNOWLEDGE_QUERY_CACHE_SIZE', 512)),
+    'EMBEDDING_STORAGE': os.environ.get('KNOWLEDGE_EMBEDDING_STORAGE', 'float32'),
+    'SEARCH_BACKEND': os.environ.get('KNOWLEDGE_SEARCH_BACKEND', 'memory'),
+    'INDEX_REFRESH_SECONDS': float(os.environ.get('KNOWLEDGE_INDEX_REFRESH_SECONDS', 5)),
+    'INDEX_DIR': os.environ.get('KNOWLEDGE_INDEX_DIR') or None,
+}
 # optional system prompt to include at the start of conversations
 GOOGLE_LLM_SYSTEM_PROMPT = os.environ.get(
     'GOOGLE_LLM_SYSTEM_PROMPT',
@@ -218,6 +338,8 @@ CORS_ALLOWED_ORIGINS = os.environ.get(
     'http://localhost:4200,http://127.0.0.1:4200'
 ).split(',')
 CORS_ALLOW_CREDENTIALS = True
+# Keyset-paginated lists return the next page's cursor in headers (api/utils/pagination.py)
+CORS_EXPOSE_HEADERS = ['X-Next-Cursor', 'X-Previous-Cursor', 'Link']
 
 # CSRF Protection
 CSRF_COOKIE_HTTPONLY = False  # Allow frontend to read CSRF token
@@ -73,6 +73,7 @@ if [ "${SKIP_MIGRATIONS:-0}" != "1" ]; then
   echo "Apply database migrations"
   python manage.py makemigrations || true
   python manage.py migrate --noinput
+  python manage.py createcachetable
 else
   echo "Skipping database migrations (SKIP_MIGRATIONS=1)"
 fi
@@ -112,6 +113,6 @@ if [ "${ENV_NAME:-dev}" = "dev" ]; then
   echo "Running development server"
   exec python manage.py runserver 0.0.0.0:8080
 else
-  echo "Running production server (gunicorn)"
-  exec gunicorn -c gunicorn.conf toxbox_dep.wsgi:application
+  echo "Running production server (uvicorn, ASGI)"
+  exec uvicorn config.asgi:application --host 0.0.0.0 --port 8080 --workers "${WEB_CONCURRENCY:-2}"
 fi
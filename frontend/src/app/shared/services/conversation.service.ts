@@ -235,7 +235,7 @@ export class ConversationService {
                     body.conv_type = convType;
                 }
 
-                const url = environment.serverURL + "/conversations/chat/?stream=1";
+                const url = environment.serverURL + "/conversations/chat/stream/";
 
                 try {
                     await fetchEventSource(url, {